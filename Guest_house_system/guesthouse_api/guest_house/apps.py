@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class GuestHouseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'guest_house'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import instrumentation, signals  # noqa: F401
+
+        if getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            # Before any connection opens, so every connection, in any thread, gets the query timer.
+            instrumentation.install()
@@ -0,0 +1,125 @@
+"""Moves old transactions out of the hot table, and reads history across both.
+
+``archive_before(cutoff)`` moves every ``Transaction`` stamped before
+``cutoff`` to ``ArchivedTransaction`` (kept in ``TRANSACTION_ARCHIVE_DATABASE``),
+oldest first, ``batch_size`` rows at a time: a batch is copied to the archive,
+then deleted from the hot table in one short transaction. The copy skips rows
+the archive already has, so a run that dies between the two steps is finished
+by the next one. Run on a schedule (``manage.py archive_transactions``), this
+keeps the hot table at about ``TRANSACTION_ARCHIVE_AFTER_DAYS`` of history
+however long the full history grows, and with it the size of its indexes and
+the cost of the transactions list and of ``ledger_balance``.
+
+Balances never need archived rows. Before a card's transactions are moved, the
+batch records a ``BalanceCheckpoint`` covering every one of them that the run
+will move (plus an opening checkpoint at zero for a card that had none, so the
+audit still checks the whole history), and ``ledger_balance`` only sums
+transactions after the latest checkpoint.
+
+Readers that walk the whole history, or a date range reaching back before
+``archived_until()``, read both tables and ``merge`` the two streams in key
+order; a row that is briefly in both is read once. The paginated transactions
+list stays on the hot table (the exports reach further back), and
+``GET /api/transactions/<id>/`` falls back to the archive.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from . import signals
+from .models import ArchivedTransaction, BalanceCheckpoint, Transaction
+
+# Rows moved per batch; also the bulk statement size, under SQLite's bound-parameter limit.
+BATCH_SIZE = 500
+
+COLUMNS = ('id', 'debit_card_id', 'amount', 'transaction_type', 'reservation_id', 'timestamp')
+
+
+def get_database():
+    return getattr(settings, 'TRANSACTION_ARCHIVE_DATABASE', DEFAULT_DB_ALIAS)
+
+
+def get_archive_after_days():
+    return getattr(settings, 'TRANSACTION_ARCHIVE_AFTER_DAYS', 365)
+
+
+def default_cutoff(days=None, now=None):
+    return (now or timezone.now()) - timedelta(days=get_archive_after_days() if days is None else days)
+
+
+def archive_before(cutoff, batch_size=BATCH_SIZE):
+    """Move the transactions stamped before ``cutoff`` to the archive; returns how many were moved."""
+    moved = 0
+    while True:
+        rows = list(
+            Transaction.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id')
+            .values_list(*COLUMNS)[:batch_size]
+        )
+        if not rows:
+            return moved
+        ArchivedTransaction.objects.bulk_create(
+            (ArchivedTransaction(**dict(zip(COLUMNS, row))) for row in rows),
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+        with transaction.atomic():
+            _checkpoint(rows, cutoff)
+            with signals.archiving():
+                Transaction.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        moved += len(rows)
+
+
+def _checkpoint(rows, cutoff):
+    """Give every card in ``rows`` a latest checkpoint that covers them."""
+    through = {}
+    for transaction_id, card_id, *_ in rows:
+        through[card_id] = max(through.get(card_id, 0), transaction_id)
+    covered = dict(
+        BalanceCheckpoint.objects.filter(debit_card_id__in=through)
+        .values_list('debit_card_id')
+        .annotate(last=Max('last_transaction_id'))
+        .order_by()
+    )
+    checkpoints = []
+    for card_id in sorted(through):
+        if covered.get(card_id, -1) >= through[card_id]:
+            continue
+        # Usually once per card and run: cover everything this run will move, not just this batch.
+        last_id = Transaction.objects.filter(debit_card_id=card_id, timestamp__lt=cutoff).aggregate(last=Max('pk'))['last']
+        latest = (
+            BalanceCheckpoint.objects.filter(debit_card_id=card_id)
+            .order_by('-last_transaction_id', '-pk')
+            .values_list('balance', 'last_transaction_id')
+            .first()
+        )
+        if latest is None:
+            # The opening balance, so the audit still starts from the first transaction.
+            latest = (0, 0)
+            checkpoints.append(BalanceCheckpoint(debit_card_id=card_id, balance=0, last_transaction_id=0))
+        balance, since = latest
+        delta = Transaction.objects.filter(debit_card_id=card_id, pk__gt=since, pk__lte=last_id).aggregate(total=Sum('amount'))['total']
+        checkpoints.append(BalanceCheckpoint(debit_card_id=card_id, balance=balance + (delta or 0), last_transaction_id=last_id))
+    BalanceCheckpoint.objects.bulk_create(checkpoints, batch_size=BATCH_SIZE)
+
+
+def archived_until():
+    """The newest archived timestamp, or ``None`` while the archive is empty."""
+    return ArchivedTransaction.objects.order_by('-timestamp', '-id').values_list('timestamp', flat=True).first()
+
+
+def merge(archived, hot, key):
+    """Interleave two row streams that are each sorted by ``key``.
+
+    A row present in both (copied by a batch that has not deleted it yet) is
+    yielded once. Rows moved while the streams are being read may be missed.
+    """
+    previous = object()
+    for row in heapq.merge(archived, hot, key=key):
+        current = key(row)
+        if current != previous:
+            previous = current
+            yield row
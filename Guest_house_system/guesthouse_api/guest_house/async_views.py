@@ -0,0 +1,93 @@
+"""Native async counterparts of the payment, deposit and reservation endpoints.
+
+DRF views are sync-only, so under an ASGI server each DRF request occupies a
+worker thread for its whole life. These plain Django async views keep lookups
+on the async ORM and only hop to a thread (``sync_to_async``) for the ledger
+and booking steps that have to run inside ``transaction.atomic``. Request and
+response bodies match the DRF endpoints.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import booking, ledger, pricing
+from .idempotency import aidempotent
+from .throttling import ClientRateThrottle, WRITE_THROTTLES, athrottled
+from .models import Guest, Meal, Reservation, Room
+from .serializers import DepositSerializer, PaymentSerializer, ReservationCreateSerializer
+
+
+def _validated(request, serializer_class):
+    """Returns ``(data, None)`` or ``(None, error_response)``."""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return None, JsonResponse({"error": "Request body must be JSON."}, status=400)
+    serializer = serializer_class(data=payload)
+    if not serializer.is_valid():
+        return None, JsonResponse(serializer.errors, status=400)
+    return serializer.validated_data, None
+
+
+@csrf_exempt
+@require_POST
+@athrottled(*WRITE_THROTTLES)
+@aidempotent
+async def process_payment(request):
+    data, error = _validated(request, PaymentSerializer)
+    if error:
+        return error
+    try:
+        card_id = await ledger.acard_id_for(data['card_number'])
+        await sync_to_async(ledger.apply_debit)(card_id, data['amount'], reservation_id=data['reservation_id'])
+    except ledger.LedgerError as exc:
+        return JsonResponse({"error": exc.message}, status=400)
+    return JsonResponse({"message": f"Payment of {data['amount']} successful."})
+
+
+@csrf_exempt
+@require_POST
+@athrottled(*WRITE_THROTTLES)
+@aidempotent
+async def deposit_funds(request):
+    data, error = _validated(request, DepositSerializer)
+    if error:
+        return error
+    try:
+        card_id = await ledger.acard_id_for(data['card_number'])
+        await sync_to_async(ledger.apply_credit)(card_id, data['amount'])
+    except ledger.LedgerError as exc:
+        return JsonResponse({"error": exc.message}, status=400)
+    return JsonResponse({"message": f"Deposit of {data['amount']} successful."})
+
+
+@csrf_exempt
+@require_POST
+@athrottled(ClientRateThrottle)
+async def create_reservation(request):
+    data, error = _validated(request, ReservationCreateSerializer)
+    if error:
+        return error
+
+    guest, _ = await Guest.objects.aget_or_create(email=data['guest_email'], defaults={'name': data['guest_name']})
+    reservation = Reservation(guest=guest, check_in_date=data['check_in_date'], check_out_date=data['check_out_date'])
+    try:
+        room = meal = rates = None
+        if data.get('room_id'):
+            room = await Room.objects.filter(pk=data['room_id']).afirst()
+            if room is None:
+                raise booking.room_missing(data['room_id'])
+            rates = await pricing.aload([room], reservation.check_in_date, reservation.check_out_date)
+        if data.get('meal_id'):
+            meal = await Meal.objects.filter(pk=data['meal_id']).afirst()
+            if meal is None:
+                raise booking.meal_missing(data['meal_id'])
+        await sync_to_async(booking.confirm)(booking.price(reservation, room=room, meal=meal, rates=rates))
+    except booking.BookingError as exc:
+        return JsonResponse({"error": exc.message}, status=400)
+
+    payment_url = "/api/payments/"  # Simulate redirection URL
+    return JsonResponse({"message": "Reservation created. Redirecting to payment...", "payment_url": payment_url, "reservation_id": reservation.id}, status=201)
@@ -0,0 +1,131 @@
+"""Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks never touch the configured database: they run against a throwaway
+test database that is created on entry and destroyed on exit.
+"""
+import os
+import resource
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from . import replicas
+from .instrumentation import percentile
+
+
+@contextmanager
+def isolated_database(verbosity=0):
+    settings_dict = connection.settings_dict
+    tmp_path = None
+    if connection.vendor == 'sqlite':
+        # A file (rather than the shared in-memory database) lets worker threads open
+        # their own connections and contend for locks the way a real server would.
+        fd, tmp_path = tempfile.mkstemp(prefix='guesthouse-bench-', suffix='.sqlite3')
+        os.close(fd)
+        settings_dict.setdefault('TEST', {})['NAME'] = tmp_path
+    old_name = settings_dict['NAME']
+    # Same environment the test runner uses: DEBUG off (no query log) and the test client allowed.
+    setup_test_environment()
+    # Every benchmark client shares one address, so the write throttles would measure themselves;
+    # bench_throttling turns them back on where it wants them.
+    throttling_off = override_settings(THROTTLING_ENABLED=False)
+    throttling_off.enable()
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        throttling_off.disable()
+        teardown_test_environment()
+        if tmp_path is not None:
+            settings_dict['TEST']['NAME'] = None
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(tmp_path + suffix):
+                    os.remove(tmp_path + suffix)
+
+
+@contextmanager
+def sqlite_replica(alias='bench_replica'):
+    """A snapshot of the isolated SQLite database, registered as ``alias`` and used as the only replica."""
+    fd, path = tempfile.mkstemp(prefix='guesthouse-bench-replica-', suffix='.sqlite3')
+    os.close(fd)
+    replicas.copy_sqlite(connection.settings_dict['NAME'], path)
+    connections.settings[alias] = {**connection.settings_dict, 'NAME': path}
+    try:
+        with override_settings(REPLICA_DATABASES=[alias]):
+            yield alias
+    finally:
+        connections[alias].close()
+        del connections.settings[alias]
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+class QueryCounter:
+    """Counts statements on the default connection without keeping their SQL around."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def current_rss():
+    """Resident set size in bytes (Linux); falls back to the lifetime peak elsewhere."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(fn, iterations):
+    """Call ``fn`` ``iterations`` times and return the per-call durations in seconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+def format_summary(label, summary):
+    return (
+        f"{label}: n={summary['count']} mean={summary['mean_ms']:.3f}ms "
+        f"p50={summary['p50_ms']:.3f}ms p95={summary['p95_ms']:.3f}ms p99={summary['p99_ms']:.3f}ms"
+    )
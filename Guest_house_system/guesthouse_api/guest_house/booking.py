@@ -0,0 +1,137 @@
+"""Single-reservation booking rules shared by the sync and async create paths.
+
+``price`` only reads the room's rates, which async callers load up front with
+``pricing.aload``; ``confirm`` is the part that must be atomic (room lock,
+conflict check, insert, room flag) and is the only piece the async view hands
+to a worker thread. ``amend`` holds an edited reservation to the same rules.
+Live room holds (see ``holds``) block a stay just like reservations do.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache, pricing, rollups, sweeper
+from .models import Reservation, Room, RoomHold
+
+
+class BookingError(Exception):
+    @property
+    def message(self):
+        return self.args[0]
+
+
+class RoomUnavailable(BookingError):
+    pass
+
+
+def room_missing(room_id):
+    return BookingError(f"Room with ID {room_id} is not available or does not exist.")
+
+
+def meal_missing(meal_id):
+    return BookingError(f"Meal with ID {meal_id} does not exist.")
+
+
+def unavailable(room_id):
+    return RoomUnavailable(f"Room with ID {room_id} is not available for those dates.")
+
+
+def lock_room(room_id):
+    """Hold the room's row lock until the transaction ends; ``False`` if there is no such room.
+
+    Every claim on a room's nights takes this lock before checking for
+    conflicts, so the check and the insert that follows cannot interleave with
+    another claim's. It is a no-op UPDATE rather than ``SELECT ... FOR UPDATE``
+    because SQLite ignores the latter: the UPDATE also makes the transaction
+    SQLite's single writer from its first statement.
+    """
+    return Room.objects.filter(pk=room_id).update(is_available=F('is_available')) == 1
+
+
+def lock_rooms(room_ids):
+    """``lock_room`` for many rooms at once, for claims that span several."""
+    return Room.objects.filter(pk__in=room_ids).update(is_available=F('is_available'))
+
+
+def taken(room_ids, check_in_date, check_out_date, now=None, excluding=None):
+    """``(room_id, check_in_date, check_out_date)`` of every active stay and live hold overlapping the range.
+
+    ``excluding`` is the id of a reservation that does not count, the one being edited.
+    """
+    reservations = Reservation.objects.filter(room_id__in=room_ids).overlapping(check_in_date, check_out_date)
+    if excluding is not None:
+        reservations = reservations.exclude(pk=excluding)
+    return (
+        reservations.values_list('room_id', 'check_in_date', 'check_out_date')
+        .union(
+            RoomHold.objects.filter(room_id__in=room_ids).live(now).overlapping(check_in_date, check_out_date)
+            .values_list('room_id', 'check_in_date', 'check_out_date'),
+            all=True,
+        )
+    )
+
+
+def price(reservation, room=None, meal=None, rates=None):
+    """Attach room and meal to an unsaved reservation and set its total_cost.
+
+    ``rates`` must cover the room and stay; it is loaded here when not given.
+    """
+    total_cost = 0
+    if room is not None:
+        if reservation.check_out_date <= reservation.check_in_date:
+            raise BookingError("Check-out date must be after check-in date.")
+        if rates is None:
+            rates = pricing.load([room], reservation.check_in_date, reservation.check_out_date)
+        reservation.room = room
+        total_cost += rates.total(room.pk, reservation.check_in_date, reservation.check_out_date)
+    if meal is not None:
+        reservation.meal = meal
+        total_cost += meal.price
+    if total_cost == 0:
+        raise BookingError("Reservation must include at least a room or a meal.")
+    reservation.total_cost = total_cost
+    return reservation
+
+
+def claim_nights(reservation):
+    """Lock the reservation's room and check that its nights are free; an expired one claims nothing.
+
+    Must run in the transaction that saves the reservation.
+    """
+    if reservation.room_id is None or reservation.status == Reservation.Status.EXPIRED:
+        return
+    if not lock_room(reservation.room_id):
+        raise room_missing(reservation.room_id)
+    if taken([reservation.room_id], reservation.check_in_date, reservation.check_out_date, excluding=reservation.pk).exists():
+        raise unavailable(reservation.room_id)
+
+
+def _mark_booked(reservation):
+    if reservation.room_id is not None:
+        Room.objects.filter(pk=reservation.room_id).update(is_available=False)
+        cache.invalidate_on_commit(Room)
+
+
+def confirm(reservation):
+    with transaction.atomic():
+        claim_nights(reservation)
+        reservation.save()
+        _mark_booked(reservation)
+        rollups.apply(rollups.reservation_deltas([reservation]))
+    return reservation
+
+
+def amend(reservation, previous):
+    """Save edits to a booked reservation: its room and nights are claimed again and it is repriced.
+
+    ``previous`` is the reservation as stored; its nights come out of the rollups.
+    """
+    with transaction.atomic():
+        claim_nights(reservation)
+        price(reservation, room=reservation.room, meal=reservation.meal)
+        reservation.save()
+        if reservation.room_id != previous.room_id:
+            _mark_booked(reservation)
+            sweeper.release_rooms([previous.room_id], timezone.localdate())
+        rollups.apply(rollups.reservation_deltas([previous], sign=-1), rollups.reservation_deltas([reservation]))
+    return reservation
@@ -0,0 +1,151 @@
+"""Read-through cache for the room and meal catalog.
+
+List and detail responses are cached as rendered JSON under a key that embeds
+a per-model generation number. Saving or deleting a row bumps the generation
+(see ``signals.py``), which orphans every cached page of that model at once;
+orphans simply age out. Works with any Django cache backend, but invalidation
+only reaches other processes when the backend is shared between them.
+"""
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from . import replicas
+
+CACHED_ACTIONS = ('list', 'retrieve')
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def _generation_key(label):
+    return f"catalog:{label}:generation"
+
+
+def generation(model):
+    """The model's current generation; embed it in a cache key to have ``invalidate`` orphan the entry."""
+    return get_cache().get(_generation_key(model._meta.label_lower), 0)
+
+
+def invalidate(model):
+    cache = get_cache()
+    key = _generation_key(model._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No generation yet (or it was evicted): any value nobody has cached under will do.
+        cache.set(key, 1, timeout=None)
+
+
+def invalidate_on_commit(model):
+    # Bump now so the writing request reads its own change, and again on commit so a page
+    # another request cached from pre-commit data in between is orphaned too.
+    invalidate(model)
+    transaction.on_commit(lambda: invalidate(model))
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _count(label, outcome):
+    with _stats_lock:
+        _stats[f"{label}.{outcome}"] += 1
+
+
+def _not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    tags = parse_etags(if_none_match)
+    return '*' in tags or etag.strip('"') in (tag.removeprefix('W/').strip('"') for tag in tags)
+
+
+class CatalogCacheMixin:
+    """Caches JSON ``list``/``retrieve`` responses and answers ``If-None-Match`` with 304."""
+
+    def _catalog_cache_key(self, request):
+        if (
+            request.method != 'GET'
+            or self.action not in CACHED_ACTIONS
+            or get_timeout() <= 0
+            or request.accepted_renderer.format != 'json'
+        ):
+            return None
+        label = self.queryset.model._meta.label_lower
+        generation = get_cache().get(_generation_key(label), 0)
+        # The media type too: its parameters (indent=4) change the body for the same path.
+        path = hashlib.sha1(f"{request.get_full_path()}\n{request.accepted_media_type}".encode()).hexdigest()
+        return f"catalog:{label}:{generation}:{path}"
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.catalog_cache_key = self._catalog_cache_key(request)
+
+    def handle_cached(self, request, handler, *args, **kwargs):
+        label = self.queryset.model._meta.label_lower
+        cached = get_cache().get(self.catalog_cache_key) if self.catalog_cache_key else None
+        if cached is None:
+            if not self.catalog_cache_key:
+                return handler(request, *args, **kwargs)
+            _count(label, 'misses')
+            # Read from the primary: cached under the current generation, a lagging
+            # replica's answer would outlive the lag.
+            with replicas.primary():
+                return handler(request, *args, **kwargs)
+
+        _count(label, 'hits')
+        # Served as-is: finalize_response leaves plain HttpResponses alone.
+        self.catalog_cache_key = None
+        etag, content, content_type = cached
+        if _not_modified(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.handle_cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.handle_cached(request, super().retrieve, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'catalog_cache_key', None)
+        if key is None or response.status_code != 200:
+            return response
+
+        response.render()
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        get_cache().set(key, (etag, response.content, response['Content-Type']), timeout=get_timeout())
+        response['ETag'] = etag
+        if _not_modified(request, etag):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = etag
+            patch_vary_headers(not_modified, ['Accept'])
+            return not_modified
+        return response
@@ -0,0 +1,168 @@
+"""Streaming CSV and NDJSON exports of the transaction and reservation history.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and encoded as
+they arrive, so memory stays flat whatever the row count: no model instances,
+no serializers and no list of the whole result. Lines are grouped into
+chunks of ``LINES_PER_CHUNK`` before they are handed to the server to keep the
+per-yield overhead down.
+
+Transaction exports whose range reaches back before ``archive.archived_until()``
+also read the archive, merged into the hot rows in timestamp order.
+"""
+import csv
+import io
+import json
+from datetime import datetime, time
+from itertools import islice
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from . import archive
+from .models import ArchivedTransaction, DebitCard, Reservation, Transaction
+
+CHUNK_SIZE = 5000
+LINES_PER_CHUNK = 500
+# Ids per IN (...) lookup; keeps SQLite under its bound-parameter limit.
+BULK_LOOKUP_SIZE = 500
+
+TRANSACTION_COLUMNS = (
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('debit_card_id', 'debit_card_id'),
+    ('card_number', 'debit_card__card_number'),
+    ('transaction_type', 'transaction_type'),
+    ('amount', 'amount'),
+    ('reservation_id', 'reservation_id'),
+)
+CARD_NUMBER = 'debit_card__card_number'
+
+RESERVATION_COLUMNS = (
+    ('id', 'id'),
+    ('guest_id', 'guest_id'),
+    ('guest_email', 'guest__email'),
+    ('room_id', 'room_id'),
+    ('meal_id', 'meal_id'),
+    ('check_in_date', 'check_in_date'),
+    ('check_out_date', 'check_out_date'),
+    ('total_cost', 'total_cost'),
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def transaction_rows(start=None, end=None, debit_card=None, transaction_type=None):
+    """Transactions stamped on days ``start <= day < end``, oldest first, in history-index order.
+
+    A queryset while the range lies after everything archived; otherwise an
+    iterator over the archived and hot rows together.
+    """
+    fields = [field for _, field in TRANSACTION_COLUMNS]
+    rows = _filter_transactions(Transaction.objects.all(), start, end, debit_card, transaction_type)
+    rows = rows.order_by('timestamp', 'id').values_list(*fields)
+    archived_until = archive.archived_until()
+    if archived_until is None or (start and _midnight(start) > archived_until):
+        return rows
+    # The archive has no card to join; card_number is filled in afterwards.
+    archived = _filter_transactions(ArchivedTransaction.objects.all(), start, end, debit_card, transaction_type)
+    archived = archived.order_by('timestamp', 'id').values_list(*('debit_card_id' if field == CARD_NUMBER else field for field in fields))
+    return archive.merge(
+        _with_card_numbers(archived.iterator(chunk_size=CHUNK_SIZE), fields.index(CARD_NUMBER)),
+        rows.iterator(chunk_size=CHUNK_SIZE),
+        key=lambda row: (row[1], row[0]),
+    )
+
+
+def _filter_transactions(queryset, start, end, debit_card, transaction_type):
+    # Compared as datetimes rather than with __date, so the range stays an index seek.
+    if start:
+        queryset = queryset.filter(timestamp__gte=_midnight(start))
+    if end:
+        queryset = queryset.filter(timestamp__lt=_midnight(end))
+    if debit_card:
+        queryset = queryset.filter(debit_card_id=debit_card)
+    if transaction_type:
+        queryset = queryset.filter(transaction_type=transaction_type)
+    return queryset
+
+
+def _with_card_numbers(rows, position):
+    """Replace the card id at ``position`` with the card's number, looking each card up once."""
+    numbers = {}
+    while chunk := list(islice(rows, CHUNK_SIZE)):
+        missing = list({row[position] for row in chunk} - numbers.keys())
+        for offset in range(0, len(missing), BULK_LOOKUP_SIZE):
+            numbers.update(DebitCard.objects.filter(pk__in=missing[offset:offset + BULK_LOOKUP_SIZE]).values_list('pk', 'card_number'))
+        for row in chunk:
+            yield (*row[:position], numbers.get(row[position]), *row[position + 1:])
+
+
+def reservation_rows(start=None, end=None, room=None):
+    """Reservations with ``start <= check_in_date < end``, by check-in."""
+    queryset = Reservation.objects.all()
+    if start:
+        queryset = queryset.filter(check_in_date__gte=start)
+    if end:
+        queryset = queryset.filter(check_in_date__lt=end)
+    if room:
+        queryset = queryset.filter(room_id=room)
+    return queryset.order_by('check_in_date', 'id').values_list(*(field for _, field in RESERVATION_COLUMNS))
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, str)):
+        return value
+    # Decimals as exact strings; dates and datetimes as ISO 8601.
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def encode_csv(rows, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    pending = 1
+    for row in rows:
+        writer.writerow(['' if value is None else _text(value) for value in row])
+        pending += 1
+        if pending >= LINES_PER_CHUNK:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(rows, header):
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    lines = []
+    for row in rows:
+        lines.append(dumps(dict(zip(header, map(_text, row)))))
+        if len(lines) >= LINES_PER_CHUNK:
+            lines.append('')
+            yield '\n'.join(lines).encode()
+            lines = []
+    if lines:
+        lines.append('')
+        yield '\n'.join(lines).encode()
+
+
+def stream(rows, columns, fmt, filename, chunk_size=CHUNK_SIZE):
+    """``rows`` is a ``values_list`` queryset, read in chunks, or any iterator of row tuples."""
+    header = [name for name, _ in columns]
+    encode = encode_csv if fmt == 'csv' else encode_ndjson
+    if isinstance(rows, QuerySet):
+        rows = rows.iterator(chunk_size=chunk_size)
+    response = StreamingHttpResponse(encode(rows, header), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,111 @@
+"""``?fields=`` sparse fieldsets for the model viewsets.
+
+``?fields=id,name`` keeps only those serializer fields and narrows the SELECT
+to their columns with ``only()``. Writes ignore it, like ``?expand=``.
+
+Lists, with or without ``?fields=``, take a fast path when every field left is
+a plain column and the serializer does not customise its output: rows come
+from ``values()`` and each value goes through its serializer field's
+``to_representation`` (or nothing, where that would be the identity), with no
+model instances or per-row serializer work. The output is the same as the
+serializer's, and ``FastJSONRenderer`` encodes it.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .renderers import FastJSONRenderer
+
+# Fields whose to_representation hands database values back unchanged. Exact
+# types only: a subclass may render differently.
+_IDENTITY = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.EmailField,
+    serializers.IntegerField, serializers.PrimaryKeyRelatedField,
+)
+# Fields whose to_representation works on the raw column value.
+_CONVERTED = (serializers.DateField, serializers.DateTimeField, serializers.DecimalField, serializers.FloatField)
+
+
+class SparseFieldsetMixin:
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_sparse_fields(self):
+        """The requested field names in order, or ``None`` for all of them."""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._parse_sparse_fields()
+        return self._sparse_fields
+
+    def _parse_sparse_fields(self):
+        param = self.request.query_params.get('fields')
+        if param is None or self.request.method not in ('GET', 'HEAD'):
+            return None
+        fields = list(dict.fromkeys(name for name in param.split(',') if name))
+        available = self.get_serializer_class()(context=self.get_serializer_context()).fields
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise ValidationError({"fields": f"Unknown fields: {', '.join(unknown)}."})
+        if not fields:
+            raise ValidationError({"fields": "Name at least one field."})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            child = getattr(serializer, 'child', serializer)
+            for name in set(child.fields) - set(fields):
+                child.fields.pop(name)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        serializer = self.get_serializer()
+        columns = {queryset.model._meta.pk.name}
+        for field in serializer.fields.values():
+            try:
+                model_field = queryset.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                # Computed from something else; load everything rather than guess.
+                return queryset
+            if model_field.concrete:
+                columns.add(model_field.name)
+        return queryset.only(*columns)
+
+    def values_representation(self, serializer):
+        """``(columns, converters)`` to render this serializer from ``values()``, or ``None``."""
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            return None
+        columns, converters = [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if '.' in field.source or field.source == '*':
+                return None
+            if type(field) in _IDENTITY:
+                convert = None
+            elif type(field) in _CONVERTED:
+                convert = field.to_representation
+            else:
+                return None
+            columns.append(field.source)
+            converters.append((name, convert))
+        return columns, converters
+
+    def list(self, request, *args, **kwargs):
+        plan = self.values_representation(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        columns, converters = plan
+        rows = self.filter_queryset(self.get_queryset()).values_list(*columns)
+        page = self.paginate_queryset(rows)
+        data = [
+            {name: value if convert is None or value is None else convert(value) for (name, convert), value in zip(converters, row)}
+            for row in (rows if page is None else page)
+        ]
+        return Response(data) if page is None else self.get_paginated_response(data)
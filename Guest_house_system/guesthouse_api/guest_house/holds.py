@@ -0,0 +1,83 @@
+"""Short-lived room holds: claim a room's nights first, book them after.
+
+When many clients race for the last room, ``claim`` answers each of them at
+once. A plain read turns contenders away as soon as the nights are held;
+otherwise, under the room's lock (``booking.lock_room``), it deletes the room's
+expired holds, checks again for overlapping stays and live holds, and inserts
+a hold with a random token that is good for ``ROOM_HOLD_SECONDS``. Exactly one
+client gets the token; the others are told the room is taken (409) and can
+move on rather than retry. ``confirm`` turns the token into a reservation through
+``booking.confirm``, and ``release`` gives the nights back early.
+
+A hold that is never confirmed simply stops counting once it expires; its row
+is reclaimed the next time someone claims the room.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import booking, cache
+from .models import Reservation, Room, RoomHold
+
+
+class HoldNotFound(booking.BookingError):
+    def __init__(self):
+        super().__init__("Hold not found or expired.")
+
+
+def get_hold_seconds():
+    return getattr(settings, 'ROOM_HOLD_SECONDS', 5 * 60)
+
+
+def claim(room_id, check_in_date, check_out_date, now=None):
+    """Hold the room for ``[check_in_date, check_out_date)``; raises ``BookingError`` if it cannot."""
+    if check_out_date <= check_in_date:
+        raise booking.BookingError("Check-out date must be after check-in date.")
+    now = now or timezone.now()
+    # Lock-free first look: once someone holds the nights, every other contender is
+    # turned away with one read instead of queueing for the room's (on SQLite, the
+    # database's) write lock only to find the same thing.
+    if booking.taken([room_id], check_in_date, check_out_date, now).exists():
+        raise booking.unavailable(room_id)
+    with transaction.atomic():
+        if not booking.lock_room(room_id):
+            raise booking.room_missing(room_id)
+        RoomHold.objects.filter(room_id=room_id, expires_at__lte=now).delete()
+        if booking.taken([room_id], check_in_date, check_out_date, now).exists():
+            raise booking.unavailable(room_id)
+        hold = RoomHold.objects.create(
+            room_id=room_id, check_in_date=check_in_date, check_out_date=check_out_date,
+            token=secrets.token_urlsafe(32), expires_at=now + timedelta(seconds=get_hold_seconds()),
+        )
+        # Quotes and availability answers cached before the hold would still offer these nights.
+        cache.invalidate_on_commit(Room)
+    return hold
+
+
+def confirm(token, guest, meal=None, now=None):
+    """Book the held nights for ``guest``; the hold is used up."""
+    now = now or timezone.now()
+    hold = RoomHold.objects.select_related('room').filter(token=token, expires_at__gt=now).first()
+    if hold is None:
+        raise HoldNotFound
+    reservation = Reservation(guest=guest, check_in_date=hold.check_in_date, check_out_date=hold.check_out_date)
+    booking.price(reservation, room=hold.room, meal=meal)
+    with transaction.atomic():
+        if not booking.lock_room(hold.room_id):
+            raise booking.room_missing(hold.room_id)
+        # Guarded by expiry so a hold that ran out (and may have been reclaimed) is not used.
+        if not RoomHold.objects.filter(pk=hold.pk, expires_at__gt=now).delete()[0]:
+            raise HoldNotFound
+        return booking.confirm(reservation)
+
+
+def release(token):
+    """Give the held nights back; ``False`` if there was no such hold."""
+    with transaction.atomic():
+        released = RoomHold.objects.filter(token=token).delete()[0] > 0
+        if released:
+            cache.invalidate_on_commit(Room)
+    return released
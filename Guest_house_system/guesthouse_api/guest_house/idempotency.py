@@ -0,0 +1,203 @@
+"""``Idempotency-Key`` support for the payment and deposit endpoints.
+
+A request that carries the header runs inside one transaction that first
+inserts an ``IdempotencyKey`` row for the key, then runs the view, then stores
+the response on the row. Because the claim commits or rolls back together with
+the view's own writes:
+
+* a retry after success finds the row and gets the stored response replayed
+  without touching ``DebitCard``;
+* a retry after a failure or crash finds nothing and simply runs again;
+* a duplicate sent while the original is still running blocks on the key's
+  unique index (or, on SQLite, the write lock) until the original commits, and
+  is then answered with the replay.
+
+Replays are served from the cache when possible (no query at all) and from
+the table otherwise. Rows expire after ``IDEMPOTENCY_KEY_TTL`` seconds; an
+expired key can be reused, and ``purge_idempotency_keys`` deletes old rows.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class KeyReused(Exception):
+    """The key was already used for a different request."""
+
+
+class _Discard(Exception):
+    # Raised to roll the claim back when the outcome should not be stored.
+    def __init__(self, response):
+        self.response = response
+
+
+def get_cache():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+
+def get_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def _cache_key(key):
+    # Hashed: client keys may be long or contain characters memcached refuses.
+    return f"idempotency:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def fingerprint(method, path, payload):
+    body = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f"{method} {path}\n{body}".encode()).hexdigest()
+
+
+def _replayable(record_fingerprint, fingerprint_, status_code, data):
+    if record_fingerprint != fingerprint_:
+        raise KeyReused
+    return status_code, data
+
+
+def lookup(key, fingerprint_):
+    """``(status_code, data)`` of a stored outcome from the cache, or ``None``."""
+    cached = get_cache().get(_cache_key(key))
+    if cached is None:
+        return None
+    record_fingerprint, status_code, data = cached
+    return _replayable(record_fingerprint, fingerprint_, status_code, data)
+
+
+def execute(key, fingerprint_, run, data_of):
+    """Run ``run()`` at most once per key.
+
+    Returns ``(response, None)`` for a fresh run or ``(None, (status_code, data))``
+    for a replay. ``data_of(response)`` gives the JSON-serializable body to store.
+    Responses with a 5xx status are not stored, so the client can retry them.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=get_ttl())
+    try:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(key=key, fingerprint=fingerprint_, expires_at=expires_at)
+            except IntegrityError:
+                # Expired: the key is free again. Reclaimed in place and guarded by the expiry, so of
+                # two requests reusing it at once one runs and the other replays.
+                reclaimed = IdempotencyKey.objects.filter(key=key, expires_at__lte=now).update(
+                    fingerprint=fingerprint_, expires_at=expires_at, status_code=None, response=None,
+                )
+                record = IdempotencyKey.objects.get(key=key)
+                if not reclaimed:
+                    return None, _replayable(record.fingerprint, fingerprint_, record.status_code, record.response)
+
+            response = run()
+            if response.status_code >= 500:
+                raise _Discard(response)
+            record.status_code = response.status_code
+            record.response = data_of(response)
+            record.save(update_fields=['status_code', 'response'])
+            stored = (record.fingerprint, record.status_code, record.response)
+            transaction.on_commit(lambda: get_cache().set(_cache_key(key), stored, timeout=get_ttl()))
+    except _Discard as discarded:
+        return discarded.response, None
+    return response, None
+
+
+def _key(request):
+    key = request.headers.get(HEADER)
+    if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise ValueError
+    return key
+
+
+_INVALID_KEY = {"error": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters."}
+_KEY_REUSED = {"error": f"This {HEADER} was already used for a different request."}
+
+
+def idempotent(view):
+    """For DRF function views; goes below ``@api_view``."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            key = _key(request)
+        except ValueError:
+            return Response(_INVALID_KEY, status=status.HTTP_400_BAD_REQUEST)
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        fingerprint_ = fingerprint(request.method, request.path, request.data)
+        try:
+            replay = lookup(key, fingerprint_)
+            if replay is None:
+                response, replay = execute(key, fingerprint_, lambda: view(request, *args, **kwargs), lambda response: response.data)
+                if replay is None:
+                    return response
+        except KeyReused:
+            return Response(_KEY_REUSED, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        status_code, data = replay
+        return Response(data, status=status_code, headers={REPLAY_HEADER: 'true'})
+    return wrapper
+
+
+def aidempotent(view):
+    """For the plain async views in ``async_views``; goes below the method decorators.
+
+    A keyed request runs the whole view in one worker thread so it can share the
+    claim's transaction; requests without the header stay fully async.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            key = _key(request)
+        except ValueError:
+            return JsonResponse(_INVALID_KEY, status=400)
+        if key is None:
+            return await view(request, *args, **kwargs)
+
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            payload = request.body.decode(errors='replace')
+        fingerprint_ = fingerprint(request.method, request.path, payload)
+        try:
+            # Off the event loop: the lookup is a blocking call to the shared cache.
+            replay = await sync_to_async(lookup, thread_sensitive=False)(key, fingerprint_)
+            if replay is None:
+                run = async_to_sync(view)
+                response, replay = await sync_to_async(execute)(
+                    key, fingerprint_, lambda: run(request, *args, **kwargs), lambda response: json.loads(response.content),
+                )
+                if replay is None:
+                    return response
+        except KeyReused:
+            return JsonResponse(_KEY_REUSED, status=422)
+        status_code, data = replay
+        response = JsonResponse(data, status=status_code, safe=False)
+        response[REPLAY_HEADER] = 'true'
+        return response
+    return wrapper
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in batches; returns how many were removed."""
+    removed = 0
+    while True:
+        batch = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return removed
+        removed += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,135 @@
+"""Bulk reservation import.
+
+Applies the same rules as ``ReservationViewSet.create`` to many
+``ReservationCreateSerializer`` payloads at once, but set-wise: rooms and meals
+are fetched once, guests are upserted by email per chunk, the chunk's rooms are
+locked as ``booking.confirm`` locks one, date conflicts are checked in memory
+against the booked and held nights of those rooms, stays
+are priced from one rate load per chunk, and reservations are written with
+``bulk_create``. Each chunk is its own
+transaction, so a long import never holds a write lock for long.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import booking, cache, pricing, rollups
+from .models import Guest, Meal, Reservation, Room
+from .serializers import ReservationCreateSerializer
+
+CHUNK_SIZE = 1000
+
+
+def nights(check_in_date, check_out_date):
+    return [check_in_date + timedelta(days=offset) for offset in range((check_out_date - check_in_date).days)]
+
+
+def booked_nights(room_ids, check_in_date, check_out_date):
+    """Nights already booked or held per room inside the window, read through the interval indexes."""
+    taken = defaultdict(set)
+    existing = booking.taken(room_ids, check_in_date, check_out_date)
+    for room_id, start, end in existing.iterator(chunk_size=2000):
+        taken[room_id].update(nights(start, end))
+    return taken
+
+
+def import_reservations(rows, chunk_size=CHUNK_SIZE):
+    """Import reservation payloads; returns one result dict per row, in order."""
+    rows = list(rows)
+    results = [None] * len(rows)
+    validator = ReservationCreateSerializer()
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, validator.run_validation(row)))
+        except serializers.ValidationError as exc:
+            results[index] = {"index": index, "status": "failed", "errors": exc.detail}
+
+    rooms = Room.objects.in_bulk({data['room_id'] for _, data in valid if data.get('room_id')})
+    meals = Meal.objects.in_bulk({data['meal_id'] for _, data in valid if data.get('meal_id')})
+
+    for start in range(0, len(valid), chunk_size):
+        for index, result in _import_chunk(valid[start:start + chunk_size], rooms, meals):
+            results[index] = result
+    return results
+
+
+def _import_chunk(chunk, rooms, meals):
+    failed = []
+    accepted = []
+    with transaction.atomic():
+        room_rows = [data for _, data in chunk if data.get('room_id') in rooms and data['check_in_date'] < data['check_out_date']]
+        taken = {}
+        rates = None
+        if room_rows:
+            room_ids = {data['room_id'] for data in room_rows}
+            window = (min(data['check_in_date'] for data in room_rows), max(data['check_out_date'] for data in room_rows))
+            # Before reading what is booked, so no booking or hold lands between the read and the insert.
+            booking.lock_rooms(room_ids)
+            taken = booked_nights(room_ids, *window)
+            rates = pricing.load([rooms[room_id] for room_id in room_ids], *window)
+
+        for index, data in chunk:
+            error, reservation = _build(data, rooms, meals, taken, rates)
+            if error:
+                failed.append((index, {"index": index, "status": "failed", "error": error}))
+            else:
+                accepted.append((index, data, reservation))
+
+        Guest.objects.bulk_create(
+            [Guest(name=data['guest_name'], email=data['guest_email']) for _, data, _ in accepted],
+            ignore_conflicts=True,
+        )
+        guests = Guest.objects.in_bulk({data['guest_email'] for _, data, _ in accepted}, field_name='email')
+        for _, data, reservation in accepted:
+            reservation.guest = guests[data['guest_email']]
+        Reservation.objects.bulk_create([reservation for _, _, reservation in accepted], batch_size=500)
+        rollups.apply(rollups.reservation_deltas(reservation for _, _, reservation in accepted))
+
+        booked_rooms = {reservation.room_id for _, _, reservation in accepted if reservation.room_id}
+        if booked_rooms:
+            Room.objects.filter(pk__in=booked_rooms, is_available=True).update(is_available=False)
+            # Queryset updates skip post_save, so the catalog cache is told directly.
+            cache.invalidate_on_commit(Room)
+
+    created = [
+        (index, {"index": index, "status": "created", "reservation_id": reservation.pk})
+        for index, _, reservation in accepted
+    ]
+    return failed + created
+
+
+def _build(data, rooms, meals, taken, rates):
+    # Imported bookings come from elsewhere with no payment flow here, so they are not holds.
+    reservation = Reservation(check_in_date=data['check_in_date'], check_out_date=data['check_out_date'], status=Reservation.Status.CONFIRMED)
+    total_cost = 0
+
+    if data.get('room_id'):
+        room = rooms.get(data['room_id'])
+        if room is None:
+            return booking.room_missing(data['room_id']).message, None
+        stay = nights(data['check_in_date'], data['check_out_date'])
+        if not stay:
+            return "Check-out date must be after check-in date.", None
+        room_nights = taken.setdefault(room.pk, set())
+        if not room_nights.isdisjoint(stay):
+            return booking.unavailable(data['room_id']).message, None
+        # Later rows in the same import see this stay as booked.
+        room_nights.update(stay)
+        reservation.room = room
+        total_cost += rates.total(room.pk, data['check_in_date'], data['check_out_date'])
+
+    if data.get('meal_id'):
+        meal = meals.get(data['meal_id'])
+        if meal is None:
+            return booking.meal_missing(data['meal_id']).message, None
+        reservation.meal = meal
+        total_cost += meal.price
+
+    if total_cost == 0:
+        return "Reservation must include at least a room or a meal.", None
+
+    reservation.total_cost = total_cost
+    return None, reservation
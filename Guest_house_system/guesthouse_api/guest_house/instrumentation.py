@@ -0,0 +1,201 @@
+"""Per-request timing: Server-Timing header, request log and rolling per-route stats.
+
+``ServerTimingMiddleware`` opens a ``RequestTiming`` for each request and keeps
+it in a context variable, which follows the request into ``sync_to_async``
+threads. While a request is open, every query on every connection adds to its
+``db`` time (an execute wrapper attached as connections are created), and every
+``serializer.data`` adds to its ``serialize`` time. ``view`` is what is left:
+view code, DRF dispatch and rendering.
+
+With ``REQUEST_TIMING_ENABLED`` off the middleware removes itself at startup
+and none of the hooks are installed, so the cost is nil.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('guest_house.requests')
+
+_current = ContextVar('guest_house_request_timing', default=None)
+
+_routes = defaultdict(lambda: deque(maxlen=get_window()))
+_routes_lock = threading.Lock()
+
+_installed = False
+_serializer_data = BaseSerializer.data
+
+
+def get_window():
+    return getattr(settings, 'REQUEST_TIMING_WINDOW', 1024)
+
+
+class RequestTiming:
+    __slots__ = ('started', 'queries', 'db', 'serialize')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+
+def current_timing():
+    """The open request's ``RequestTiming``, or ``None`` outside a timed request."""
+    return _current.get()
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db += time.perf_counter() - started
+        timing.queries += 1
+
+
+def _timed_data(self):
+    timing = _current.get()
+    if timing is None:
+        return _serializer_data.fget(self)
+    started = time.perf_counter()
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        timing.serialize += time.perf_counter() - started
+
+
+def _attach(sender, connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        # Outermost: connection.execute_wrapper() blocks pop the last wrapper when they exit.
+        connection.execute_wrappers.insert(0, _timed_execute)
+
+
+def install():
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(_attach, dispatch_uid='guest_house.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _attach(None, connection)
+    # Serializer and ListSerializer both reach to_representation through BaseSerializer.data.
+    BaseSerializer.data = property(_timed_data)
+
+
+def uninstall():
+    global _installed
+    if not _installed:
+        return
+    _installed = False
+    connection_created.disconnect(dispatch_uid='guest_house.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        if _timed_execute in connection.execute_wrappers:
+            connection.execute_wrappers.remove(_timed_execute)
+    BaseSerializer.data = _serializer_data
+
+
+def record(route, total, timing):
+    with _routes_lock:
+        _routes[route].append((total, timing.db, timing.queries, timing.serialize))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def route_stats():
+    with _routes_lock:
+        snapshot = {route: list(samples) for route, samples in _routes.items()}
+    stats = {}
+    for route, samples in sorted(snapshot.items()):
+        totals = [sample[0] for sample in samples]
+        count = len(samples)
+        stats[route] = {
+            'count': count,
+            'p50_ms': percentile(totals, 50) * 1000,
+            'p95_ms': percentile(totals, 95) * 1000,
+            'p99_ms': percentile(totals, 99) * 1000,
+            'mean_db_ms': sum(sample[1] for sample in samples) / count * 1000,
+            'mean_queries': sum(sample[2] for sample in samples) / count,
+            'mean_serialize_ms': sum(sample[3] for sample in samples) / count * 1000,
+        }
+    return stats
+
+
+def reset_stats():
+    with _routes_lock:
+        _routes.clear()
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        total = time.perf_counter() - timing.started
+        view = max(0.0, total - timing.db - timing.serialize)
+        match = request.resolver_match
+        route = match.view_name if match else '<unresolved>'
+        record(route, total, timing)
+        response['Server-Timing'] = (
+            f'db;dur={timing.db * 1000:.2f};desc="{timing.queries} queries", '
+            f'serialize;dur={timing.serialize * 1000:.2f}, '
+            f'view;dur={view * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+        if logger.isEnabledFor(logging.INFO):
+            fields = {
+                'method': request.method, 'path': request.path, 'route': route, 'status': response.status_code,
+                'total_ms': round(total * 1000, 3), 'db_ms': round(timing.db * 1000, 3), 'queries': timing.queries,
+                'serialize_ms': round(timing.serialize * 1000, 3), 'view_ms': round(view * 1000, 3),
+            }
+            logger.info(
+                "%(method)s %(path)s %(status)s total=%(total_ms)sms db=%(db_ms)sms/%(queries)sq", fields,
+                extra={'request_timing': fields},
+            )
+        return response
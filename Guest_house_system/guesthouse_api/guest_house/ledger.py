@@ -0,0 +1,232 @@
+"""Card balance changes.
+
+Every balance change is a single guarded UPDATE (``balance = balance - amount``
+with ``balance >= amount`` in the WHERE clause) followed by the matching
+``Transaction`` row, both inside one ``transaction.atomic`` block. The database
+applies the arithmetic, so concurrent payments on the same card can neither
+lose an update nor overdraw it, and no row is read before it is written.
+Amounts are Decimals end to end; the SQL result is rounded to cents so backends
+that store decimals as floating point (SQLite) cannot accumulate drift.
+"""
+from collections import namedtuple
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Round
+
+from . import archive, rollups
+from .models import ArchivedTransaction, BalanceCheckpoint, DebitCard, Reservation, Transaction
+
+# Rows per bulk statement; keeps SQLite under its bound-parameter limit.
+BATCH_SIZE = 500
+
+
+class LedgerError(Exception):
+    pass
+
+
+class InvalidCard(LedgerError):
+    message = "Invalid card number."
+
+
+class InsufficientFunds(LedgerError):
+    message = "Insufficient funds."
+
+
+class InvalidReservation(LedgerError):
+    message = "Invalid reservation."
+
+
+def card_id_for(card_number):
+    # Looked up outside the write transaction: a card's id never changes, and on SQLite a
+    # read at the start of a transaction would take a shared lock that writers must upgrade.
+    try:
+        return DebitCard.objects.values_list('pk', flat=True).get(card_number=card_number)
+    except DebitCard.DoesNotExist:
+        raise InvalidCard
+
+
+async def acard_id_for(card_number):
+    try:
+        return await DebitCard.objects.values_list('pk', flat=True).aget(card_number=card_number)
+    except DebitCard.DoesNotExist:
+        raise InvalidCard
+
+
+def debit(card_number, amount, reservation_id=None):
+    return apply_debit(card_id_for(card_number), amount, reservation_id=reservation_id)
+
+
+def apply_debit(card_id, amount, reservation_id=None):
+    amount = Decimal(amount)
+    with transaction.atomic():
+        if not DebitCard.objects.filter(pk=card_id, balance__gte=amount).update(balance=Round(F('balance') - amount, 2)):
+            raise InsufficientFunds
+        if reservation_id is not None:
+            # Read after the update, which already holds the write lock; raising rolls the debit back.
+            # Locked so the sweeper cannot expire the hold between this check and the payment.
+            reservation = (
+                Reservation.objects.select_for_update().filter(pk=reservation_id)
+                .exclude(status=Reservation.Status.EXPIRED).values_list('room_id', 'status').first()
+            )
+            if reservation is None:
+                raise InvalidReservation
+            room_id, reservation_status = reservation
+            if reservation_status == Reservation.Status.PENDING:
+                Reservation.objects.filter(pk=reservation_id).update(status=Reservation.Status.CONFIRMED)
+            rollups.record_payments([(room_id, amount)])
+        return Transaction.objects.create(debit_card_id=card_id, amount=-amount, transaction_type='payment', reservation_id=reservation_id)
+
+
+def credit(card_number, amount):
+    return apply_credit(card_id_for(card_number), amount)
+
+
+def apply_credit(card_id, amount):
+    amount = Decimal(amount)
+    with transaction.atomic():
+        if not DebitCard.objects.filter(pk=card_id).update(balance=Round(F('balance') + amount, 2)):
+            raise InvalidCard
+        return Transaction.objects.create(debit_card_id=card_id, amount=amount, transaction_type='deposit')
+
+
+def debit_many(items):
+    """Apply many payments in one transaction.
+
+    Cards are locked and fetched with a single query, debits are applied in item
+    order against the running balance, and the results are written back with one
+    ``bulk_update`` and one ``bulk_create``. Returns one ``(transaction, error)``
+    pair per item, so a declined item does not fail the rest of the batch.
+    """
+    card_numbers = {item['card_number'] for item in items}
+    reservation_ids = {item['reservation_id'] for item in items if item.get('reservation_id') is not None}
+
+    with transaction.atomic():
+        cards = DebitCard.objects.select_for_update().in_bulk(card_numbers, field_name='card_number')
+        known_reservations, pending = {}, set()
+        reservations = Reservation.objects.select_for_update().filter(pk__in=reservation_ids).exclude(status=Reservation.Status.EXPIRED)
+        for pk, room_id, reservation_status in reservations.values_list('pk', 'room_id', 'status'):
+            known_reservations[pk] = room_id
+            if reservation_status == Reservation.Status.PENDING:
+                pending.add(pk)
+        balances = {number: card.balance for number, card in cards.items()}
+
+        results = []
+        for item in items:
+            card = cards.get(item['card_number'])
+            amount = Decimal(item['amount'])
+            reservation_id = item.get('reservation_id')
+            if card is None:
+                results.append((None, InvalidCard()))
+            elif reservation_id is not None and reservation_id not in known_reservations:
+                results.append((None, InvalidReservation()))
+            elif balances[card.card_number] < amount:
+                results.append((None, InsufficientFunds()))
+            else:
+                balances[card.card_number] -= amount
+                results.append((Transaction(debit_card=card, amount=-amount, transaction_type='payment', reservation_id=reservation_id), None))
+
+        changed = []
+        for number, card in cards.items():
+            if balances[number] != card.balance:
+                card.balance = balances[number]
+                changed.append(card)
+        DebitCard.objects.bulk_update(changed, ['balance'], batch_size=BATCH_SIZE)
+        Transaction.objects.bulk_create([row for row, error in results if row is not None], batch_size=BATCH_SIZE)
+        paid = pending.intersection(row.reservation_id for row, error in results if row is not None)
+        if paid:
+            Reservation.objects.filter(pk__in=paid).update(status=Reservation.Status.CONFIRMED)
+        rollups.record_payments(
+            (known_reservations[row.reservation_id], -row.amount)
+            for row, error in results if row is not None and row.reservation_id is not None
+        )
+    return results
+
+
+CardAudit = namedtuple('CardAudit', 'card_id stored computed last_transaction_id checkpointed_through problems')
+
+
+def ledger_balance(card_id):
+    """The card's balance according to the log: latest checkpoint plus the deltas after it."""
+    checkpoint = (
+        BalanceCheckpoint.objects.filter(debit_card_id=card_id)
+        .order_by('-last_transaction_id', '-pk')
+        .values_list('balance', 'last_transaction_id')
+        .first()
+    )
+    balance, since = checkpoint or (Decimal('0.00'), 0)
+    delta = Transaction.objects.filter(debit_card_id=card_id, pk__gt=since).aggregate(total=Sum('amount'))['total']
+    return balance + (delta or 0)
+
+
+def _by_card(rows):
+    """Lets a caller walking cards in id order pull each card's rows from one sorted stream."""
+    groups = groupby(rows, key=itemgetter(0))
+    current = next(groups, None)
+
+    def rows_for(card_id):
+        nonlocal current
+        while current is not None and current[0] < card_id:
+            current = next(groups, None)
+        if current is None or current[0] != card_id:
+            return []
+        return current[1]
+
+    return rows_for
+
+
+def audit_balances(chunk_size=5000):
+    """Recompute every card's balance from the log in one streaming pass.
+
+    Cards, checkpoints and transactions are each read once as an index-ordered
+    stream and merged by card id, so memory stays bounded by a single card's
+    checkpoints no matter how long the log is. Archived transactions are merged
+    into the log stream, so the audit covers the whole history. Yields a
+    ``CardAudit`` per card; ``problems`` lists checkpoints that disagree with
+    the log. Cards written to (or archived) while the pass runs can show up as
+    transient mismatches.
+    """
+    cards = DebitCard.objects.order_by('pk').values_list('pk', 'balance').iterator(chunk_size=chunk_size)
+    checkpoints_for = _by_card(
+        BalanceCheckpoint.objects.order_by('debit_card_id', 'last_transaction_id', 'pk')
+        .values_list('debit_card_id', 'last_transaction_id', 'balance')
+        .iterator(chunk_size=chunk_size)
+    )
+    transactions_for = _by_card(archive.merge(
+        ArchivedTransaction.objects.order_by('debit_card_id', 'pk')
+        .values_list('debit_card_id', 'pk', 'amount')
+        .iterator(chunk_size=chunk_size),
+        Transaction.objects.order_by('debit_card_id', 'pk')
+        .values_list('debit_card_id', 'pk', 'amount')
+        .iterator(chunk_size=chunk_size),
+        key=itemgetter(0, 1),
+    ))
+
+    for card_id, stored in cards:
+        checkpoints = [(last_id, balance) for _, last_id, balance in checkpoints_for(card_id)]
+        # The earliest checkpoint is the opening balance; every later one is checked against the log.
+        checkpointed_through = checkpoints[-1][0] if checkpoints else None
+        last_id, computed = checkpoints.pop(0) if checkpoints else (0, Decimal('0.00'))
+        problems = []
+        for _, transaction_id, amount in transactions_for(card_id):
+            if transaction_id <= last_id:
+                continue
+            while checkpoints and checkpoints[0][0] < transaction_id:
+                problems.extend(_check(checkpoints.pop(0), computed))
+            computed += amount
+            last_id = transaction_id
+        for checkpoint in checkpoints:
+            problems.extend(_check(checkpoint, computed))
+        if stored != computed:
+            problems.append(f"stored balance {stored}, log says {computed}")
+        yield CardAudit(card_id, stored, computed, last_id, checkpointed_through, problems)
+
+
+def _check(checkpoint, computed):
+    last_id, balance = checkpoint
+    if balance != computed:
+        return [f"checkpoint at transaction {last_id} says {balance}, log says {computed}"]
+    return []
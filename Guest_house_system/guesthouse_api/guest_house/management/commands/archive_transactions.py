@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from guest_house import archive
+
+
+class Command(BaseCommand):
+    help = "Move transactions older than TRANSACTION_ARCHIVE_AFTER_DAYS out of the hot table into the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, help="Archive transactions older than this; default TRANSACTION_ARCHIVE_AFTER_DAYS.")
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        cutoff = archive.default_cutoff(days=options['older_than_days'])
+        moved = archive.archive_before(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(f"archived {moved} transactions stamped before {cutoff.isoformat()}")
@@ -0,0 +1,217 @@
+import json
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from guest_house import rollups
+from guest_house.benchmarking import chunked, count_queries, isolated_database, summarize
+from guest_house.models import DebitCard, Guest, Meal, Reservation, Room, Transaction
+
+# ``path`` and ``body`` are called with the iteration number, so writes never collide.
+Scenario = namedtuple('Scenario', 'name method path body expected')
+
+# Rows seeded per unit of --scale.
+VOLUMES = {'rooms': 100, 'meals': 20, 'guests': 1000, 'cards': 500, 'reservations': 2000, 'transactions': 20000}
+
+# Fractional allowance on query averages, so a one-off extra query (a cache refill) is not a regression.
+QUERY_SLACK = 0.5
+# Latency regressions below this many milliseconds are noise.
+LATENCY_FLOOR_MS = 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, drive every API route through the test client and report "
+        "p50/p95/p99 latency, requests/s and queries per request. --save-baseline writes the "
+        "results as JSON; --baseline compares against such a file and fails on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiplier for the seeded row counts.")
+        parser.add_argument('--iterations', type=int, default=50, help="Measured requests per route.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per route before measuring.")
+        parser.add_argument('--only', action='append', default=[], help="Run only routes whose name contains this (repeatable).")
+        parser.add_argument('--save-baseline', metavar='PATH')
+        parser.add_argument('--baseline', metavar='PATH')
+        parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed p95 slowdown against the baseline, as a fraction.")
+
+    def handle(self, *args, **options):
+        volumes = {key: max(1, int(count * options['scale'])) for key, count in VOLUMES.items()}
+        runs = options['warmup'] + options['iterations']
+        with isolated_database():
+            fixtures = self.seed(volumes, runs)
+            scenarios = [
+                scenario for scenario in self.scenarios(fixtures, runs)
+                if not options['only'] or any(part in scenario.name for part in options['only'])
+            ]
+            client = APIClient()
+            results = {}
+            for scenario in scenarios:
+                results[scenario.name] = self.run(client, scenario, options['warmup'], options['iterations'])
+                self.stdout.write(self.format_result(scenario.name, results[scenario.name]))
+
+        report = {'volumes': volumes, 'iterations': options['iterations'], 'routes': results}
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"baseline written to {options['save_baseline']}")
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+            regressions = self.compare(baseline['routes'], results, options['tolerance'])
+            for line in regressions:
+                self.stderr.write(line)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+            self.stdout.write(f"no regressions against {options['baseline']}")
+
+    def seed(self, volumes, runs):
+        rooms = Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=40 + i % 160) for i in range(volumes['rooms']))
+        # Rooms the delete route can consume, one per request.
+        spare_rooms = Room.objects.bulk_create(Room(name=f"Spare {i}", price_per_night=50) for i in range(runs))
+        meals = Meal.objects.bulk_create(Meal(name=f"Meal {i}", price=5 + i % 30) for i in range(volumes['meals']))
+        guests = Guest.objects.bulk_create(Guest(name=f"Guest {i}", email=f"guest{i}@example.com") for i in range(volumes['guests']))
+        cards = DebitCard.objects.bulk_create(
+            DebitCard(card_number=f"46000000{i:08d}", balance=1_000_000) for i in range(volumes['cards'])
+        )
+        for chunk in chunked(range(volumes['reservations']), 5000):
+            # One-night stays packed back to back per room, all before the dates the routes book.
+            Reservation.objects.bulk_create(
+                Reservation(
+                    guest=guests[i % len(guests)], room=rooms[i % len(rooms)], meal=meals[i % len(meals)] if i % 2 else None,
+                    check_in_date=date(2024, 1, 1) + timedelta(days=i // len(rooms)),
+                    check_out_date=date(2024, 1, 2) + timedelta(days=i // len(rooms)),
+                    total_cost=100,
+                )
+                for i in chunk
+            )
+        reservation_ids = list(Reservation.objects.values_list('pk', flat=True)[:100])
+        for chunk in chunked(range(volumes['transactions']), 5000):
+            Transaction.objects.bulk_create(
+                Transaction(
+                    debit_card=cards[i % len(cards)], amount=25 if i % 3 else -10,
+                    transaction_type='deposit' if i % 3 else 'payment',
+                    reservation_id=None if i % 3 else reservation_ids[i % len(reservation_ids)],
+                )
+                for i in chunk
+            )
+        rollups.rebuild()
+        return {
+            'room': rooms[0].pk, 'rooms': [room.pk for room in rooms], 'spare_rooms': [room.pk for room in spare_rooms],
+            'meal': meals[0].pk, 'guest': guests[0].pk, 'card': cards[0], 'cards': cards,
+            'reservation': reservation_ids[0], 'transaction': Transaction.objects.values_list('pk', flat=True).first(),
+        }
+
+    def scenarios(self, f, runs):
+        def booking(base, i, offset=0):
+            # Each request books its own night, so creates never clash with each other or the seed.
+            check_in = base + timedelta(days=i * 10 + offset)
+            return {
+                'guest_name': f"Bench {i}", 'guest_email': f"bench{i % 50}@example.com",
+                'room_id': f['rooms'][i % len(f['rooms'])], 'meal_id': f['meal'],
+                'check_in_date': check_in.isoformat(), 'check_out_date': (check_in + timedelta(days=1)).isoformat(),
+            }
+
+        def payment(i):
+            return {'card_number': f['cards'][i % len(f['cards'])].card_number, 'amount': '1.00', 'reservation_id': f['reservation']}
+
+        def quote(i):
+            # A different first range per iteration, so every request misses the quote cache.
+            start = date(2024, 1, 1) + timedelta(days=i % 300)
+            ranges = [(start + timedelta(days=7 * week), start + timedelta(days=7 * week + 3)) for week in range(3)]
+            rooms = '&'.join(f"room={room}" for room in f['rooms'][:10])
+            return f"/api/quotes/?{rooms}&meal={f['meal']}&" + '&'.join(f"range={a}/{b}" for a, b in ranges)
+
+        def deposit(i):
+            return {'card_number': f['cards'][i % len(f['cards'])].card_number, 'amount': '1.00'}
+
+        fixed = lambda value: lambda i: value
+        return [
+            Scenario('rooms.list', 'get', fixed('/api/rooms/'), None, 200),
+            Scenario('rooms.retrieve', 'get', fixed(f"/api/rooms/{f['room']}/"), None, 200),
+            Scenario('rooms.create', 'post', fixed('/api/rooms/'), lambda i: {'name': f"New {i}", 'price_per_night': '75.00'}, 201),
+            Scenario('rooms.update', 'patch', fixed(f"/api/rooms/{f['room']}/"), lambda i: {'price_per_night': f"{60 + i % 40}.00"}, 200),
+            # Leaves the price alone, so the rate calendar is not rewritten.
+            Scenario('rooms.rename', 'patch', fixed(f"/api/rooms/{f['room']}/"), lambda i: {'name': f"Renamed {i}"}, 200),
+            Scenario('rooms.delete', 'delete', lambda i: f"/api/rooms/{f['spare_rooms'][i]}/", None, 204),
+            Scenario('rooms.availability', 'get', fixed('/api/rooms/availability/?from=2024-01-05&to=2024-01-09'), None, 200),
+            Scenario('meals.list', 'get', fixed('/api/meals/'), None, 200),
+            Scenario('meals.retrieve', 'get', fixed(f"/api/meals/{f['meal']}/"), None, 200),
+            Scenario('meals.create', 'post', fixed('/api/meals/'), lambda i: {'name': f"Meal new {i}", 'price': '12.50'}, 201),
+            Scenario('guests.list', 'get', fixed('/api/guests/'), None, 200),
+            Scenario('guests.retrieve', 'get', fixed(f"/api/guests/{f['guest']}/"), None, 200),
+            Scenario('guests.search', 'get', fixed('/api/guests/search/?q=guest1'), None, 200),
+            Scenario('guests.create', 'post', fixed('/api/guests/'), lambda i: {'name': f"New {i}", 'email': f"new{i}@example.com"}, 201),
+            Scenario('debitcards.list', 'get', fixed('/api/debitcards/'), None, 200),
+            Scenario('debitcards.retrieve', 'get', fixed(f"/api/debitcards/{f['card'].pk}/"), None, 200),
+            Scenario('debitcards.create', 'post', fixed('/api/debitcards/'), lambda i: {'card_number': f"47000000{i:08d}"}, 201),
+            Scenario('reservations.list', 'get', fixed('/api/reservations/'), None, 200),
+            Scenario('reservations.list_expanded', 'get', fixed('/api/reservations/?expand=guest,room,meal'), None, 200),
+            Scenario('reservations.retrieve', 'get', fixed(f"/api/reservations/{f['reservation']}/"), None, 200),
+            Scenario('reservations.create', 'post', fixed('/api/reservations/'), lambda i: booking(date(2030, 1, 1), i), 201),
+            Scenario('reservations.import', 'post', fixed('/api/reservations/import/'),
+                     lambda i: [booking(date(2030, 1, 1), i, offset) for offset in range(2, 10)], 200),
+            Scenario('transactions.list', 'get', fixed('/api/transactions/'), None, 200),
+            Scenario('transactions.list_by_card', 'get', fixed(f"/api/transactions/?debit_card={f['card'].pk}"), None, 200),
+            Scenario('transactions.retrieve', 'get', fixed(f"/api/transactions/{f['transaction']}/"), None, 200),
+            Scenario('payments', 'post', fixed('/api/payments/'), payment, 200),
+            Scenario('payments.batch', 'post', fixed('/api/payments/batch/'), lambda i: [payment(i * 10 + n) for n in range(10)], 200),
+            Scenario('deposit_funds', 'post', fixed('/api/deposit_funds/'), deposit, 200),
+            Scenario('cache_stats', 'get', fixed('/api/cache_stats/'), None, 200),
+            Scenario('metrics', 'get', fixed('/api/metrics/'), None, 200),
+            Scenario('exports.transactions_csv', 'get', fixed(f"/api/exports/transactions.csv?debit_card={f['card'].pk}"), None, 200),
+            Scenario('exports.reservations_ndjson', 'get', fixed('/api/exports/reservations.ndjson?from=2024-01-01&to=2024-01-08'), None, 200),
+            Scenario('quotes', 'get', quote, None, 200),
+            Scenario('reports.occupancy', 'get', fixed('/api/reports/occupancy/?from=2024-01-01&to=2025-01-01'), None, 200),
+            Scenario('reports.occupancy_by_day', 'get', fixed('/api/reports/occupancy/?from=2024-01-01&to=2025-01-01&group_by=day'), None, 200),
+            Scenario('async.payments', 'post', fixed('/api/async/payments/'), payment, 200),
+            Scenario('async.deposit_funds', 'post', fixed('/api/async/deposit_funds/'), deposit, 200),
+            Scenario('async.reservations', 'post', fixed('/api/async/reservations/'), lambda i: booking(date(2035, 1, 1), i), 201),
+        ]
+
+    def run(self, client, scenario, warmup, iterations):
+        samples, queries = [], 0
+        for i in range(warmup + iterations):
+            kwargs = {'format': 'json'} if scenario.body else {}
+            body = scenario.body(i) if scenario.body else None
+            with count_queries() as counter:
+                started = time.perf_counter()
+                response = getattr(client, scenario.method)(scenario.path(i), body, **kwargs)
+                if response.streaming:
+                    # Streamed bodies do their queries and work as they are consumed.
+                    for _ in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - started
+            if response.status_code != scenario.expected:
+                raise CommandError(f"{scenario.name}: expected {scenario.expected}, got {response.status_code}: {response.content[:200]!r}")
+            if i >= warmup:
+                samples.append(elapsed)
+                queries += counter.count
+        result = summarize(samples)
+        result['rps'] = len(samples) / sum(samples)
+        result['queries_per_request'] = queries / len(samples)
+        return result
+
+    def format_result(self, name, result):
+        return (
+            f"{name:<28} p50={result['p50_ms']:8.3f}ms p95={result['p95_ms']:8.3f}ms p99={result['p99_ms']:8.3f}ms "
+            f"rps={result['rps']:8.0f} queries/req={result['queries_per_request']:.1f}"
+        )
+
+    def compare(self, baseline, results, tolerance):
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if result['queries_per_request'] > expected['queries_per_request'] + QUERY_SLACK:
+                regressions.append(
+                    f"{name}: queries/request {expected['queries_per_request']:.1f} -> {result['queries_per_request']:.1f}"
+                )
+            limit = max(expected['p95_ms'] * (1 + tolerance), expected['p95_ms'] + LATENCY_FLOOR_MS)
+            if result['p95_ms'] > limit:
+                regressions.append(f"{name}: p95 {expected['p95_ms']:.3f}ms -> {result['p95_ms']:.3f}ms (limit {limit:.3f}ms)")
+        return regressions
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+
+from guest_house.benchmarking import format_summary, isolated_database, summarize
+from guest_house.models import DebitCard
+
+
+class Command(BaseCommand):
+    help = "Compare concurrent deposits through the async views under ASGI with the DRF views under WSGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50, help="Concurrent clients (requests in flight).")
+        parser.add_argument('--requests', type=int, default=20, help="Requests per client.")
+
+    def handle(self, *args, **options):
+        clients, per_client = options['clients'], options['requests']
+        with isolated_database():
+            DebitCard.objects.bulk_create(DebitCard(card_number=f"44000000{i:08d}") for i in range(clients))
+            self.report('WSGI sync DRF', clients, *self.run_wsgi(clients, per_client))
+            self.report('ASGI async view', clients, *self.run_asgi(clients, per_client))
+
+    def payload(self, index):
+        return {'card_number': f"44000000{index:08d}", 'amount': '1.00'}
+
+    def run_wsgi(self, clients, per_client):
+        samples, failures, peak_threads = [], [0], [0]
+        lock = threading.Lock()
+
+        def worker(index):
+            client = Client()
+            local = []
+            try:
+                for _ in range(per_client):
+                    started = time.perf_counter()
+                    response = client.post('/api/deposit_funds/', self.payload(index), content_type='application/json')
+                    local.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        with lock:
+                            failures[0] += 1
+            finally:
+                connection.close()
+                with lock:
+                    samples.extend(local)
+                    peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+        tracemalloc.start()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return samples, failures[0], elapsed, peak, peak_threads[0]
+
+    def run_asgi(self, clients, per_client):
+        samples, failures = [], [0]
+
+        async def worker(index):
+            client = AsyncClient()
+            for _ in range(per_client):
+                started = time.perf_counter()
+                response = await client.post('/api/async/deposit_funds/', self.payload(index), content_type='application/json')
+                samples.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures[0] += 1
+
+        async def main():
+            await asyncio.gather(*(worker(i) for i in range(clients)))
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return samples, failures[0], elapsed, peak, threading.active_count()
+
+    def report(self, label, clients, samples, failures, elapsed, peak, threads):
+        self.stdout.write(format_summary(label, summarize(samples)))
+        # tracemalloc sees Python allocations only; each WSGI thread also reserves its own C stack.
+        self.stdout.write(
+            f"  rps={len(samples) / elapsed:.0f} failures={failures} peak_threads={threads} "
+            f"peak_python_memory={peak / 1024:.0f}KiB per_in_flight_request={peak / clients / 1024:.1f}KiB"
+        )
@@ -0,0 +1,62 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from guest_house.benchmarking import chunked, count_queries, format_summary, isolated_database, measure, summarize
+from guest_house.models import Guest, Reservation, Room
+
+
+class Command(BaseCommand):
+    help = "Benchmark /api/rooms/availability/ against a seeded reservation table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--reservations', type=int, default=100_000)
+        parser.add_argument('--iterations', type=int, default=300)
+        parser.add_argument('--budget-ms', type=float, default=10.0, help="Fail if p95 exceeds this.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with isolated_database():
+            horizon = self.seed(rng, options['rooms'], options['reservations'])
+            client = APIClient()
+
+            def query():
+                start = horizon[0] + timedelta(days=rng.randrange((horizon[1] - horizon[0]).days))
+                end = start + timedelta(days=rng.randint(1, 14))
+                response = client.get('/api/rooms/availability/', {'from': start.isoformat(), 'to': end.isoformat()})
+                assert response.status_code == 200, response.content
+
+            query()
+            with count_queries() as queries:
+                query()
+            summary = summarize(measure(query, options['iterations']))
+
+        self.stdout.write(f"rooms={options['rooms']} reservations={options['reservations']} queries/request={queries.count}")
+        self.stdout.write(format_summary('availability', summary))
+        if summary['p95_ms'] > options['budget_ms']:
+            raise CommandError(f"p95 {summary['p95_ms']:.3f}ms exceeds budget of {options['budget_ms']}ms")
+
+    def seed(self, rng, room_count, reservation_count):
+        Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=50 + i % 100) for i in range(room_count))
+        room_ids = list(Room.objects.values_list('pk', flat=True))
+        guest = Guest.objects.create(name="Bench Guest", email="bench@example.com")
+
+        # Back-to-back stays per room, so the table looks like years of real history.
+        first_day = date(2020, 1, 1)
+        cursors = {room_id: first_day for room_id in room_ids}
+
+        def rows():
+            for i in range(reservation_count):
+                room_id = room_ids[i % len(room_ids)]
+                check_in = cursors[room_id] + timedelta(days=rng.randint(0, 3))
+                check_out = check_in + timedelta(days=rng.randint(1, 5))
+                cursors[room_id] = check_out
+                yield Reservation(guest=guest, room_id=room_id, check_in_date=check_in, check_out_date=check_out, total_cost=100)
+
+        for chunk in chunked(rows(), 5000):
+            Reservation.objects.bulk_create(chunk)
+        return first_day, max(cursors.values())
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from guest_house import cache
+from guest_house.benchmarking import isolated_database
+from guest_house.models import Meal, Room
+
+
+class Command(BaseCommand):
+    help = "Compare requests/s on the room and meal catalog with the cache on and off."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--meals', type=int, default=30)
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=50 + i % 100) for i in range(options['rooms']))
+            Meal.objects.bulk_create(Meal(name=f"Meal {i}", price=5 + i) for i in range(options['meals']))
+            room_id = Room.objects.values_list('pk', flat=True).first()
+            urls = ['/api/rooms/', '/api/meals/', f'/api/rooms/{room_id}/']
+            client = APIClient()
+
+            for label, timeout in (('uncached', 0), ('cached', 300)):
+                cache.get_cache().clear()
+                cache.reset_stats()
+                with override_settings(CATALOG_CACHE_TIMEOUT=timeout):
+                    started = time.perf_counter()
+                    for i in range(options['requests']):
+                        client.get(urls[i % len(urls)])
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(f"{label}: requests={options['requests']} rps={options['requests'] / elapsed:.0f} stats={cache.stats()}")
+
+            etag = client.get(urls[0])['ETag']
+            started = time.perf_counter()
+            for _ in range(options['requests']):
+                client.get(urls[0], HTTP_IF_NONE_MATCH=etag)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"conditional (304): requests={options['requests']} rps={options['requests'] / elapsed:.0f}")
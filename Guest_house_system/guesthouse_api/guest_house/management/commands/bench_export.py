@@ -0,0 +1,49 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from guest_house.benchmarking import chunked, current_rss, isolated_database
+from guest_house.models import DebitCard, Transaction
+
+
+class Command(BaseCommand):
+    help = "Stream the transaction export at growing row counts and report throughput and peak RSS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='500000,5000000', help="Comma-separated transaction counts.")
+        parser.add_argument('--cards', type=int, default=10000)
+        parser.add_argument('--format', choices=('csv', 'ndjson'), action='append', help="Format to export (repeatable); default both.")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        formats = options['format'] or ['csv', 'ndjson']
+        with isolated_database():
+            DebitCard.objects.bulk_create(DebitCard(card_number=f"44100000{i:08d}") for i in range(options['cards']))
+            card_ids = list(DebitCard.objects.values_list('pk', flat=True))
+            client = Client()
+            seeded = 0
+            for size in sizes:
+                for chunk in chunked(range(seeded, size), 10000):
+                    Transaction.objects.bulk_create(
+                        Transaction(debit_card_id=card_ids[i % len(card_ids)], amount=Decimal('12.34'), transaction_type='deposit' if i % 4 else 'payment')
+                        for i in chunk
+                    )
+                seeded = size
+
+                for fmt in formats:
+                    baseline = peak = current_rss()
+                    total_bytes = 0
+                    started = time.perf_counter()
+                    response = client.get(f'/api/exports/transactions.{fmt}')
+                    for part in response.streaming_content:
+                        total_bytes += len(part)
+                        # statm is cheap to read; sampling once per chunk catches the peak.
+                        peak = max(peak, current_rss())
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{fmt}: rows={size} elapsed={elapsed:.2f}s rows/s={size / elapsed:.0f} "
+                        f"MB/s={total_bytes / elapsed / 1e6:.1f} size={total_bytes / 1e6:.0f}MB "
+                        f"peak_rss={peak / 1e6:.0f}MB rss_growth={(peak - baseline) / 1e6:.1f}MB"
+                    )
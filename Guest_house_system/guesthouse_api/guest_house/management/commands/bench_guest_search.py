@@ -0,0 +1,38 @@
+import random
+import string
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from guest_house.benchmarking import chunked, format_summary, isolated_database, measure, summarize
+from guest_house.models import Guest
+
+
+class Command(BaseCommand):
+    help = "Time /api/guests/search/ for common and rare prefixes as the guest table grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000', help="Comma-separated guest counts.")
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with isolated_database():
+            client = Client()
+            seeded = 0
+            for size in sizes:
+                for chunk in chunked(range(seeded, size), 10000):
+                    Guest.objects.bulk_create(
+                        Guest(name=f"{''.join(rng.choices(string.ascii_letters, k=8))} {i}", email=f"guest{i}@example.com")
+                        for i in chunk
+                    )
+                seeded = size
+                for label, term in (('common prefix', 'A'), ('rare prefix', 'Qx'), ('email', 'guest12')):
+                    self.stdout.write(format_summary(
+                        f"guests={size} {label}",
+                        summarize(measure(lambda: client.get('/api/guests/search/', {'q': term}), options['iterations'])),
+                    ))
+
+            explain = Guest.objects.filter(name_search__gte='a', name_search__lt='b', name_search__startswith='a').order_by('name_search', 'pk')[:10].explain()
+            self.stdout.write(f"plan: {explain}")
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client
+
+from guest_house import idempotency
+from guest_house.benchmarking import format_summary, isolated_database, summarize
+from guest_house.models import DebitCard, Transaction
+
+AMOUNT = Decimal('5.00')
+
+
+class Command(BaseCommand):
+    help = "Fire concurrent duplicate deposits per Idempotency-Key, check each key is applied once, and time replays."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=50)
+        parser.add_argument('--duplicates', type=int, default=8, help="Concurrent submissions per key.")
+        parser.add_argument('--replays', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Locked requests are counted below; their tracebacks from django.request would drown the report.
+        logging.disable(logging.ERROR)
+        try:
+            with isolated_database():
+                card = DebitCard.objects.create(card_number="4600000000000000", balance=0)
+                outcomes = self.duplicates(card, options['keys'], options['duplicates'])
+                self.stdout.write(f"duplicates: keys={options['keys']} per_key={options['duplicates']} outcomes={dict(outcomes)}")
+
+                card.refresh_from_db()
+                applied = Transaction.objects.filter(debit_card=card).count()
+                self.stdout.write(f"  transactions={applied} balance={card.balance}")
+                if applied != options['keys'] - outcomes['locked_all'] or card.balance != AMOUNT * applied:
+                    raise CommandError("A key was applied more than once.")
+
+                self.replays(card, options['replays'])
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def duplicates(self, card, keys, per_key):
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def worker(key, barrier, statuses):
+            client = Client(raise_request_exception=False)
+            barrier.wait()
+            try:
+                response = client.post('/api/deposit_funds/', {'card_number': card.card_number, 'amount': str(AMOUNT)}, content_type='application/json', headers={'Idempotency-Key': key})
+                outcome = 'replayed' if response.has_header(idempotency.REPLAY_HEADER) else f'http_{response.status_code}'
+            except OperationalError:
+                outcome = 'locked'
+            finally:
+                connection.close()
+            with lock:
+                statuses.append(outcome)
+
+        for index in range(keys):
+            barrier, statuses = threading.Barrier(per_key), []
+            threads = [threading.Thread(target=worker, args=(f"bench-{index}", barrier, statuses)) for _ in range(per_key)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            outcomes.update(statuses)
+            if 'http_200' not in statuses:
+                outcomes['locked_all'] += 1
+        return outcomes
+
+    def replays(self, card, count):
+        client = Client()
+        data = {'card_number': card.card_number, 'amount': str(AMOUNT)}
+
+        def post(key):
+            started = time.perf_counter()
+            client.post('/api/deposit_funds/', data, content_type='application/json', headers={'Idempotency-Key': key})
+            return time.perf_counter() - started
+
+        fresh = [post(f"replay-{i}") for i in range(count)]
+        cached = [post(f"replay-{i}") for i in range(count)]
+        idempotency.get_cache().clear()
+        stored = [post(f"replay-{i}") for i in range(count)]
+        self.stdout.write(format_summary("first submission", summarize(fresh)))
+        self.stdout.write(format_summary("replay (cache)", summarize(cached)))
+        self.stdout.write(format_summary("replay (table)", summarize(stored)))
@@ -0,0 +1,96 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from guest_house import instrumentation
+from guest_house.benchmarking import isolated_database
+from guest_house.models import DebitCard, Guest, Reservation, Room, Transaction
+
+
+class Command(BaseCommand):
+    help = "Measure the request overhead of ServerTimingMiddleware by alternating rounds with it off and on."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=500, help="Requests per round.")
+        parser.add_argument('--log', action='store_true', help="Also emit the per-request log lines (to a null handler).")
+
+    def handle(self, *args, **options):
+        requests_logger = logging.getLogger('guest_house.requests')
+        if options['log']:
+            requests_logger.addHandler(logging.NullHandler())
+            requests_logger.setLevel(logging.INFO)
+
+        with isolated_database(), override_settings(CATALOG_CACHE_TIMEOUT=0):
+            rooms = Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=80) for i in range(50))
+            guest = Guest.objects.create(name="Bench", email="bench@example.com")
+            reservation = Reservation.objects.create(guest=guest, room=rooms[0], check_in_date='2030-01-01', check_out_date='2030-01-02', total_cost=80)
+            card = DebitCard.objects.create(card_number="4800000000000000", balance=100)
+            Transaction.objects.bulk_create(Transaction(debit_card=card, amount=1, transaction_type='deposit') for _ in range(100))
+            urls = ['/api/rooms/', f'/api/reservations/{reservation.pk}/', '/api/transactions/?page_size=20']
+
+            best = {'off': float('inf'), 'on': float('inf')}
+            try:
+                for round_number in range(options['rounds']):
+                    # Alternate which mode goes first so warm-up and drift do not favour either.
+                    for mode in ('off', 'on') if round_number % 2 else ('on', 'off'):
+                        enabled = mode == 'on'
+                        if enabled:
+                            instrumentation.install()
+                        else:
+                            instrumentation.uninstall()
+                        # A fresh client loads the middleware stack again under the current setting.
+                        with override_settings(REQUEST_TIMING_ENABLED=enabled):
+                            client = APIClient()
+                            started = time.perf_counter()
+                            for i in range(options['requests']):
+                                client.get(urls[i % len(urls)])
+                            best[mode] = min(best[mode], (time.perf_counter() - started) / options['requests'])
+            finally:
+                if settings.REQUEST_TIMING_ENABLED:
+                    instrumentation.install()
+                requests_logger.setLevel(logging.NOTSET)
+
+        overhead = (best['on'] - best['off']) / best['off']
+        self.stdout.write(
+            f"end to end: off={best['off'] * 1e6:.1f}us/request on={best['on'] * 1e6:.1f}us/request "
+            f"overhead={overhead:+.2%} (best of {options['rounds']} rounds)"
+        )
+        # End-to-end differences this small drown in run-to-run noise, so also time the hooks
+        # alone: the middleware around a trivial view, plus the wrapper around a no-op query.
+        hooks = self.hook_cost(queries_per_request=2)
+        self.stdout.write(f"hooks alone: {hooks * 1e6:.1f}us/request = {hooks / best['off']:.2%} of a request")
+
+    def hook_cost(self, queries_per_request, iterations=20000):
+        request = RequestFactory().get('/api/rooms/')
+        request.resolver_match = None
+        response = HttpResponse()
+        execute = lambda sql, params, many, context: None
+
+        def view(request, wrap=instrumentation._timed_execute):
+            for _ in range(queries_per_request):
+                wrap(execute, '', (), False, {})
+            return response
+
+        def bare_view(request):
+            for _ in range(queries_per_request):
+                execute('', (), False, {})
+            return response
+
+        with override_settings(REQUEST_TIMING_ENABLED=True):
+            middleware = instrumentation.ServerTimingMiddleware(view)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            middleware(request)
+        instrumented = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(iterations):
+            bare_view(request)
+        baseline = time.perf_counter() - started
+        return max(0.0, instrumented - baseline) / iterations
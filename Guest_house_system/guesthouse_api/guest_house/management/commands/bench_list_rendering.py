@@ -0,0 +1,60 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework import viewsets
+from rest_framework.test import APIRequestFactory
+
+from guest_house import renderers
+from guest_house.benchmarking import chunked, isolated_database
+from guest_house.models import Guest, Reservation, Room
+from guest_house.serializers import GuestSerializer, ReservationSerializer
+from guest_house.views import GuestViewSet, ReservationViewSet
+
+
+def plain(viewset):
+    # The same route as DRF serves it out of the box: serializer instances and the stock renderer.
+    return type(f"Plain{viewset.__name__}", (viewsets.ModelViewSet,), {'queryset': viewset.queryset, 'serializer_class': viewset.serializer_class})
+
+
+class Command(BaseCommand):
+    help = "CPU time per 1k rows for list responses: stock DRF, the values() fast path, and ?fields= subsets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with isolated_database():
+            rooms = Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=90) for i in range(50))
+            for chunk in chunked(range(rows), 5000):
+                Guest.objects.bulk_create(Guest(name=f"Guest {i}", email=f"guest{i}@example.com") for i in chunk)
+            guest_ids = list(Guest.objects.values_list('pk', flat=True))
+            for chunk in chunked(range(rows), 5000):
+                Reservation.objects.bulk_create(
+                    Reservation(guest_id=guest_ids[i], room=rooms[i % len(rooms)], check_in_date=date(2024, 1, 1) + timedelta(days=i % 365),
+                                check_out_date=date(2024, 1, 3) + timedelta(days=i % 365), total_cost=180)
+                    for i in chunk
+                )
+            self.stdout.write(f"seeded {rows} guests and {rows} reservations; orjson {'on' if renderers.orjson else 'not installed'}")
+
+            factory = APIRequestFactory()
+            for name, viewset, serializer, subset in (
+                ('guests', GuestViewSet, GuestSerializer, 'id,name'),
+                ('reservations', ReservationViewSet, ReservationSerializer, 'id,room,total_cost'),
+            ):
+                for label, view, query in (
+                    ('stock DRF', plain(viewset).as_view({'get': 'list'}), {}),
+                    ('fast path', viewset.as_view({'get': 'list'}), {}),
+                    (f"fields={subset}", viewset.as_view({'get': 'list'}), {'fields': subset}),
+                ):
+                    samples, size = [], 0
+                    for _ in range(options['iterations']):
+                        started = time.process_time()
+                        response = view(factory.get(f'/api/{name}/', query))
+                        response.render()
+                        samples.append(time.process_time() - started)
+                        size = len(response.content)
+                    per_1k = min(samples) / rows * 1000 * 1000
+                    self.stdout.write(f"{name:<13} {label:<26} cpu/1k rows={per_1k:7.2f}ms bytes={size}")
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from guest_house.benchmarking import count_queries, isolated_database
+from guest_house.models import DebitCard, Guest, Reservation
+
+
+class Command(BaseCommand):
+    help = "Compare N single /api/payments/ calls with one /api/payments/batch/ call."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=2000)
+        parser.add_argument('--cards', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            guest = Guest.objects.create(name="Bench Guest", email="bench@example.com")
+            reservation = Reservation.objects.create(guest=guest, check_in_date='2025-01-01', check_out_date='2025-01-02')
+            DebitCard.objects.bulk_create(
+                DebitCard(card_number=f"41000000{i:08d}", balance=1_000_000) for i in range(options['cards'])
+            )
+            payload = [
+                {'card_number': f"41000000{i % options['cards']:08d}", 'amount': '1.25', 'reservation_id': reservation.pk}
+                for i in range(options['items'])
+            ]
+            client = APIClient()
+
+            def single():
+                for item in payload:
+                    client.post('/api/payments/', item, format='json')
+
+            def batch():
+                response = client.post('/api/payments/batch/', payload, format='json')
+                assert response.data['succeeded'] == len(payload), response.data
+
+            for label, run in (('single', single), ('batch', batch)):
+                with count_queries() as queries:
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label}: items={len(payload)} elapsed={elapsed:.3f}s "
+                    f"items/s={len(payload) / elapsed:.0f} queries={queries.count}"
+                )
@@ -0,0 +1,86 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from guest_house import ledger
+from guest_house.benchmarking import isolated_database
+from guest_house.models import DebitCard, Transaction
+
+
+def naive_debit(card_number, amount, reservation_id=None):
+    # The pre-ledger read-modify-write path, kept only to show the lost updates it causes.
+    card = DebitCard.objects.get(card_number=card_number)
+    if card.balance >= amount:
+        card.balance -= amount
+        card.save()
+        Transaction.objects.create(debit_card=card, amount=-amount, transaction_type='payment')
+    else:
+        raise ledger.InsufficientFunds
+
+
+class Command(BaseCommand):
+    help = "Hammer a few hot cards from many threads and check that no payment is lost."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--payments', type=int, default=200, help="Payments per thread.")
+        parser.add_argument('--cards', type=int, default=1, help="Number of hot cards shared by all threads.")
+        parser.add_argument('--amount', default='0.10')
+        parser.add_argument('--naive', action='store_true', help="Use the unguarded read-modify-write path.")
+
+    def handle(self, *args, **options):
+        amount = Decimal(options['amount'])
+        debit = naive_debit if options['naive'] else ledger.debit
+        card_numbers = [f"40000000{i:08d}" for i in range(options['cards'])]
+        total = options['threads'] * options['payments']
+        # Enough for every payment to succeed, so any shortfall is a lost update.
+        opening = amount * total
+
+        with isolated_database():
+            DebitCard.objects.bulk_create(DebitCard(card_number=number, balance=opening) for number in card_numbers)
+            counts = {'ok': 0, 'declined': 0, 'locked': 0}
+            lock = threading.Lock()
+
+            def worker(index):
+                local = {'ok': 0, 'declined': 0, 'locked': 0}
+                try:
+                    for i in range(options['payments']):
+                        try:
+                            debit(card_numbers[(index + i) % len(card_numbers)], amount)
+                            local['ok'] += 1
+                        except ledger.InsufficientFunds:
+                            local['declined'] += 1
+                        except OperationalError:
+                            local['locked'] += 1
+                finally:
+                    connection.close()
+                    with lock:
+                        for key, value in local.items():
+                            counts[key] += value
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            balances = sum(DebitCard.objects.values_list('balance', flat=True))
+            logged = Transaction.objects.count()
+
+        expected = opening * len(card_numbers) - amount * counts['ok']
+        lost = (balances - expected) / amount
+        self.stdout.write(
+            f"threads={options['threads']} cards={len(card_numbers)} attempted={total} ok={counts['ok']} "
+            f"declined={counts['declined']} locked={counts['locked']} transactions={logged}"
+        )
+        self.stdout.write(
+            f"elapsed={elapsed:.3f}s payments/s={counts['ok'] / elapsed:.1f} "
+            f"payments/s per hot card={counts['ok'] / elapsed / len(card_numbers):.1f} lost_updates={lost}"
+        )
+        if lost or logged != counts['ok']:
+            raise CommandError("Balances do not match the transaction log: updates were lost.")
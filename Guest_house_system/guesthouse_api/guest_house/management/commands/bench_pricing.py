@@ -0,0 +1,63 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from guest_house import pricing
+from guest_house.benchmarking import format_summary, isolated_database, measure, summarize
+from guest_house.models import RateRule, Room
+
+
+class Command(BaseCommand):
+    help = "Time calendar regeneration and stay quotes from the calendar against pricing every night from the rules."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--days', type=int, default=730, help="Calendar horizon.")
+        parser.add_argument('--quotes', type=int, default=2000)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        today = timezone.localdate()
+        end = today + timedelta(days=options['days'])
+        with isolated_database():
+            rooms = Room.objects.bulk_create(
+                Room(name=f"Bench Room {i}", price_per_night=Decimal(rng.randint(50, 300))) for i in range(options['rooms'])
+            )
+            RateRule.objects.bulk_create([
+                RateRule(name="Weekend", weekdays='45', multiplier=Decimal('1.25')),
+                RateRule(name="Summer", start_date=today + timedelta(days=180), end_date=today + timedelta(days=270), multiplier=Decimal('1.5')),
+                RateRule(name="Weekly", min_nights=7, multiplier=Decimal('0.9')),
+            ])
+
+            started = time.perf_counter()
+            written = pricing.regenerate(start=today, days=options['days'])
+            self.stdout.write(f"regenerate: rows={written} seconds={time.perf_counter() - started:.2f}")
+
+            stays = []
+            for _ in range(options['quotes']):
+                nights = rng.randint(1, 60)
+                check_in = today + timedelta(days=rng.randrange(options['days'] - nights))
+                stays.append((rng.choice(rooms), check_in, check_in + timedelta(days=nights)))
+            rules = list(RateRule.objects.order_by('pk'))
+
+            def naive():
+                totals = []
+                for room, check_in, check_out in stays:
+                    rates = pricing.Rates([room], check_in, check_out, {}, rules)
+                    totals.append(rates.total(room.pk, check_in, check_out))
+                return totals
+
+            def calendar():
+                rates = pricing.load(rooms, today, end)
+                return [rates.total(room.pk, check_in, check_out) for room, check_in, check_out in stays]
+
+            if naive() != calendar():
+                raise CommandError("Calendar totals differ from totals priced from the rules.")
+            label = f"rooms={options['rooms']} quotes={options['quotes']}"
+            self.stdout.write(format_summary(f"{label} rules per night", summarize(measure(naive, options['iterations']))))
+            self.stdout.write(format_summary(f"{label} calendar", summarize(measure(calendar, options['iterations']))))
@@ -0,0 +1,95 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+
+from guest_house.benchmarking import chunked, format_summary, isolated_database, sqlite_replica, summarize
+from guest_house.models import DebitCard, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Run reader and writer threads against the API for a fixed time, first with every query on "
+        "the primary and then with reads on a SQLite replica, and compare throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--cards', type=int, default=200)
+        parser.add_argument('--transactions', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark copies the database as a SQLite file; run it under a SQLite profile.")
+        # Locked requests are counted below; their tracebacks from django.request would drown the report.
+        logging.disable(logging.ERROR)
+        try:
+            with isolated_database():
+                cards = self.seed(options['cards'], options['transactions'])
+                self.report('primary only', *self.run(cards, options))
+                with sqlite_replica():
+                    self.report('reads on a replica', *self.run(cards, options))
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def seed(self, cards, transactions):
+        DebitCard.objects.bulk_create(DebitCard(card_number=f"46000000{i:08d}", balance=1000) for i in range(cards))
+        cards = list(DebitCard.objects.order_by('pk'))
+        for chunk in chunked(range(transactions), 10000):
+            Transaction.objects.bulk_create(
+                Transaction(debit_card_id=cards[i % len(cards)].pk, amount=1, transaction_type='deposit') for i in chunk
+            )
+        return cards
+
+    def run(self, cards, options):
+        samples = {'read': [], 'write': []}
+        outcomes = Counter()
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+
+        def worker(kind, seed):
+            # Readers never write, so no pin cookie keeps them on the primary.
+            client = Client(raise_request_exception=False)
+            rng = random.Random(seed)
+            local_samples, local = [], Counter()
+            try:
+                while time.perf_counter() < deadline:
+                    card = rng.choice(cards)
+                    started = time.perf_counter()
+                    try:
+                        if kind == 'read':
+                            response = client.get('/api/transactions/', {'debit_card': card.pk})
+                        else:
+                            response = client.post('/api/deposit_funds/', {'card_number': card.card_number, 'amount': '1.00'}, content_type='application/json')
+                        local[f"{kind}_{'ok' if response.status_code < 400 else response.status_code}"] += 1
+                    except OperationalError:
+                        local[f'{kind}_locked'] += 1
+                    local_samples.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+                with lock:
+                    samples[kind].extend(local_samples)
+                    outcomes.update(local)
+
+        threads = [threading.Thread(target=worker, args=('read', i)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=('write', -i)) for i in range(1, options['writers'] + 1)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, outcomes, time.perf_counter() - started
+
+    def report(self, name, samples, outcomes, elapsed):
+        self.stdout.write(f"{name}:")
+        for kind in ('read', 'write'):
+            self.stdout.write(format_summary(f"  {kind}", summarize(samples[kind])))
+            self.stdout.write(f"    ok/s={outcomes[f'{kind}_ok'] / elapsed:.0f}")
+        self.stdout.write(f"  outcomes={dict(outcomes)}")
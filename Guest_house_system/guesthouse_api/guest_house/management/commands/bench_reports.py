@@ -0,0 +1,83 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from guest_house import rollups
+from guest_house.benchmarking import chunked, format_summary, isolated_database, measure, summarize
+from guest_house.models import DebitCard, Guest, Reservation, Room, Transaction
+
+YEAR_START = date(2025, 1, 1)
+YEAR_END = date(2026, 1, 1)
+
+
+def naive_report(start, end):
+    # What a report cost before the rollups: pull every stay and payment and expand them in Python.
+    nights, revenue = Counter(), Counter()
+    for room_id, check_in, check_out, total_cost in Reservation.objects.filter(room__isnull=False).values_list('room_id', 'check_in_date', 'check_out_date', 'total_cost'):
+        for day, share in rollups.stay_revenue(total_cost, check_in, check_out):
+            if start <= day < end:
+                nights[room_id] += 1
+                revenue[room_id] += share
+    payments = Counter()
+    for room_id, amount in Transaction.objects.filter(transaction_type='payment', reservation__room__isnull=False).values_list('reservation__room_id', 'amount'):
+        payments[room_id] -= amount
+    return nights, revenue, payments
+
+
+class Command(BaseCommand):
+    help = "Time a year-long occupancy report from the daily rollups against expanding the raw reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--years', type=int, default=3, help="Years of booking history to seed.")
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with isolated_database():
+            rooms = Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=60 + i % 90) for i in range(options['rooms']))
+            guest = Guest.objects.create(name="Bench", email="bench@example.com")
+            card = DebitCard.objects.create(card_number="4900000000000000", balance=0)
+
+            stays = []
+            first_day = YEAR_END - timedelta(days=365 * options['years'])
+            for room in rooms:
+                day = first_day
+                while day < YEAR_END:
+                    day += timedelta(days=rng.randint(0, 3))
+                    length = rng.randint(1, 7)
+                    stays.append(Reservation(
+                        guest=guest, room=room, check_in_date=day, check_out_date=day + timedelta(days=length),
+                        total_cost=room.price_per_night * length,
+                    ))
+                    day += timedelta(days=length)
+            for chunk in chunked(stays, 5000):
+                Reservation.objects.bulk_create(chunk)
+            reservation_ids = Reservation.objects.values_list('pk', 'total_cost')
+            for chunk in chunked(reservation_ids.iterator(), 5000):
+                Transaction.objects.bulk_create(
+                    Transaction(debit_card=card, amount=-total_cost, transaction_type='payment', reservation_id=pk) for pk, total_cost in chunk
+                )
+            rows = rollups.rebuild()
+            self.stdout.write(f"seeded {len(stays)} reservations over {options['years']} years, {rows} rollup rows")
+
+            self.stdout.write(format_summary(
+                "year report by room (rollups)",
+                summarize(measure(lambda: rollups.occupancy_report(YEAR_START, YEAR_END), options['iterations'])),
+            ))
+            self.stdout.write(format_summary(
+                "year report by day (rollups)",
+                summarize(measure(lambda: rollups.occupancy_report(YEAR_START, YEAR_END, group_by='day'), options['iterations'])),
+            ))
+            self.stdout.write(format_summary(
+                "year report by room (raw tables)",
+                summarize(measure(lambda: naive_report(YEAR_START, YEAR_END), max(1, options['iterations'] // 10))),
+            ))
+
+            report = rollups.occupancy_report(YEAR_START, YEAR_END)
+            nights, revenue, _ = naive_report(YEAR_START, YEAR_END)
+            assert report['totals']['nights_sold'] == sum(nights.values())
+            assert Decimal(report['totals']['revenue']) == sum(revenue.values())
@@ -0,0 +1,68 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from guest_house.benchmarking import count_queries, isolated_database
+from guest_house.imports import import_reservations
+from guest_house.models import Meal, Room
+
+
+class Command(BaseCommand):
+    help = "Compare reservation import throughput with the single-create endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--single-rows', type=int, default=1000, help="Rows sent through POST /api/reservations/.")
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with isolated_database():
+            Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=60 + i % 40) for i in range(options['rooms']))
+            Meal.objects.bulk_create(Meal(name=f"Meal {i}", price=8 + i) for i in range(5))
+            room_ids = list(Room.objects.values_list('pk', flat=True))
+            meal_ids = list(Meal.objects.values_list('pk', flat=True))
+            cursors = {room_id: date(2030, 1, 1) for room_id in room_ids}
+
+            def rows(count, prefix):
+                for i in range(count):
+                    room_id = room_ids[i % len(room_ids)]
+                    check_in = cursors[room_id] + timedelta(days=rng.randint(0, 2))
+                    check_out = check_in + timedelta(days=rng.randint(1, 4))
+                    cursors[room_id] = check_out
+                    yield {
+                        'guest_name': f"{prefix} {i}",
+                        'guest_email': f"{prefix}{i % (count // 2 or 1)}@example.com",
+                        'room_id': room_id,
+                        'meal_id': rng.choice(meal_ids),
+                        'check_in_date': check_in.isoformat(),
+                        'check_out_date': check_out.isoformat(),
+                    }
+
+            client = APIClient()
+            single_rows = list(rows(options['single_rows'], 'single'))
+            with count_queries() as queries:
+                started = time.perf_counter()
+                for row in single_rows:
+                    client.post('/api/reservations/', row, format='json')
+                elapsed = time.perf_counter() - started
+            self.report('single create', len(single_rows), elapsed, queries.count)
+
+            import_rows = list(rows(options['rows'], 'import'))
+            with count_queries() as queries:
+                started = time.perf_counter()
+                results = import_reservations(import_rows)
+                elapsed = time.perf_counter() - started
+            created = sum(1 for result in results if result['status'] == 'created')
+            self.report('bulk import', len(import_rows), elapsed, queries.count, created=created)
+
+    def report(self, label, rows, elapsed, queries, created=None):
+        extra = f" created={created}" if created is not None else ""
+        self.stdout.write(
+            f"{label}: rows={rows}{extra} elapsed={elapsed:.3f}s rows/s={rows / elapsed:.0f} "
+            f"queries={queries} queries/row={queries / rows:.3f}"
+        )
@@ -0,0 +1,89 @@
+import datetime
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client
+
+from guest_house.benchmarking import format_summary, isolated_database, summarize
+from guest_house.models import Reservation, Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Race hundreds of clients per room for the same nights through /api/holds/, confirm the "
+        "winners, and check that no night is booked twice. On SQLite run it under "
+        "GUESTHOUSE_DB_PROFILE=sqlite-tuned; the dev profile fails writers with 'database is locked'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=4)
+        parser.add_argument('--clients', type=int, default=200, help="Concurrent clients per room.")
+        parser.add_argument('--rounds', type=int, default=3, help="Each round races for a new date range.")
+
+    def handle(self, *args, **options):
+        # Locked requests are counted below; their tracebacks from django.request would drown the report.
+        logging.disable(logging.ERROR)
+        try:
+            with isolated_database():
+                rooms = Room.objects.bulk_create(Room(name=f"Last Room {i}", price_per_night=120) for i in range(options['rooms']))
+                for round_ in range(options['rounds']):
+                    check_in = datetime.date(2030, 1, 1) + datetime.timedelta(days=7 * round_)
+                    claims, confirms, outcomes, elapsed = self.race(rooms, options['clients'], check_in, check_in + datetime.timedelta(days=3))
+                    self.stdout.write(format_summary(f"round {round_} claim", summarize(claims)))
+                    self.stdout.write(format_summary(f"round {round_} confirm", summarize(confirms)))
+                    self.stdout.write(f"  clients={len(rooms) * options['clients']} seconds={elapsed:.2f} outcomes={dict(outcomes)}")
+                self.check_no_double_booking(rooms, options['rounds'])
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def race(self, rooms, per_room, check_in, check_out):
+        claims, confirms, outcomes = [], [], Counter()
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(rooms) * per_room)
+
+        def worker(room, index):
+            client = Client(raise_request_exception=False)
+            outcome, claim_time, confirm_time = None, None, None
+            barrier.wait()
+            try:
+                started = time.perf_counter()
+                response = client.post('/api/holds/', {'room_id': room.pk, 'check_in_date': check_in.isoformat(), 'check_out_date': check_out.isoformat()}, content_type='application/json')
+                claim_time = time.perf_counter() - started
+                outcome = {201: 'held', 409: 'taken'}.get(response.status_code, f'http_{response.status_code}')
+                if response.status_code == 201:
+                    started = time.perf_counter()
+                    confirmed = client.post(f"/api/holds/{response.json()['token']}/confirm/", {'guest_name': f"Racer {index}", 'guest_email': f"racer{index}@example.com"}, content_type='application/json')
+                    confirm_time = time.perf_counter() - started
+                    outcome = 'booked' if confirmed.status_code == 201 else f'confirm_http_{confirmed.status_code}'
+            except OperationalError:
+                outcome = 'locked'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+                if claim_time is not None:
+                    claims.append(claim_time)
+                if confirm_time is not None:
+                    confirms.append(confirm_time)
+
+        threads = [threading.Thread(target=worker, args=(room, i)) for room in rooms for i in range(per_room)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return claims, confirms, outcomes, time.perf_counter() - started
+
+    def check_no_double_booking(self, rooms, rounds):
+        stays = sorted(Reservation.objects.values_list('room_id', 'check_in_date', 'check_out_date'))
+        doubled = sum(
+            1 for (room, _, end), (next_room, next_start, _) in zip(stays, stays[1:])
+            if room == next_room and next_start < end
+        )
+        self.stdout.write(f"reservations={len(stays)} expected={len(rooms) * rounds} double_bookings={doubled}")
+        if doubled:
+            raise CommandError("A room was booked twice for the same nights.")
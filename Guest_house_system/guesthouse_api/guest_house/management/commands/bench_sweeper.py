@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from guest_house import rollups, sweeper
+from guest_house.benchmarking import chunked, current_rss, isolated_database
+from guest_house.models import Guest, Reservation, Room
+
+
+class Command(BaseCommand):
+    help = "Seed a large reservation history, sweep it, and report elapsed time and RSS growth."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--rooms', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=sweeper.BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1, help="Concurrent sweepers, as on several nodes.")
+
+    def handle(self, *args, **options):
+        immediate = connection.settings_dict['OPTIONS'].get('transaction_mode') == 'IMMEDIATE'
+        if options['workers'] > 1 and connection.vendor == 'sqlite' and not immediate:
+            # Without IMMEDIATE transactions SQLite fails a second writer with "database is locked" instead of making it wait.
+            raise CommandError("Concurrent sweepers need GUESTHOUSE_DB_PROFILE=sqlite-tuned or server.")
+        rng = random.Random(42)
+        now = timezone.now()
+        today = timezone.localdate(now)
+        with isolated_database():
+            rooms = Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=80, is_available=False) for i in range(options['rooms']))
+            guest = Guest.objects.create(name="Bench", email="bench@example.com")
+            old = now - timedelta(days=1)
+            expected = {'expired': 0, 'checked_out': 0}
+            held_rooms = set()
+            # Per room: back-to-back past stays, then (on nine rooms in ten) a few future ones.
+            # A quarter of the rows are stale unpaid holds; everything that ended is due for
+            # check-out, and a room is released once no paid stay on it is still to come.
+            per_room = options['reservations'] // len(rooms)
+
+            def stays():
+                for index, room in enumerate(rooms):
+                    future = 0 if index % 10 == 0 else min(per_room // 10, 30)
+                    day = today - timedelta(days=(per_room - future) * 2)
+                    for i in range(per_room):
+                        status = Reservation.Status.PENDING if rng.random() < 0.25 else Reservation.Status.CONFIRMED
+                        stay = Reservation(
+                            guest=guest, room=room, check_in_date=day, check_out_date=day + timedelta(days=2),
+                            total_cost=160, status=status, created_at=old,
+                        )
+                        if status == Reservation.Status.PENDING:
+                            expected['expired'] += 1
+                        elif stay.check_out_date <= today:
+                            expected['checked_out'] += 1
+                        else:
+                            held_rooms.add(room.pk)
+                        day += timedelta(days=2)
+                        yield stay
+
+            for chunk in chunked(stays(), 10000):
+                Reservation.objects.bulk_create(chunk)
+            rollups.rebuild()
+            self.stdout.write(f"seeded {Reservation.objects.count()} reservations on {len(rooms)} rooms")
+
+            baseline = peak = current_rss()
+            results, failures, stop = [], [], threading.Event()
+
+            def sample():
+                nonlocal peak
+                while not stop.wait(0.05):
+                    peak = max(peak, current_rss())
+
+            def work():
+                try:
+                    results.append(sweeper.sweep(now=now, batch_size=options['batch_size']))
+                except Exception as exc:
+                    # Kept for the report: the other sweepers would finish the rows and hide it.
+                    failures.append(exc)
+                finally:
+                    connection.close()
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            started = time.perf_counter()
+            # One sweeper runs here, so a single-worker run is not charged for a thread's fresh malloc arena.
+            workers = [threading.Thread(target=work) for _ in range(options['workers'] - 1)]
+            for worker in workers:
+                worker.start()
+            work()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+            stop.set()
+            sampler.join()
+            if failures:
+                raise CommandError(f"{len(failures)} of {options['workers']} sweepers failed: {failures[0]!r}")
+
+            expired = sum(result.expired for result in results)
+            checked_out = sum(result.checked_out for result in results)
+            released = sum(result.rooms_released for result in results)
+            self.stdout.write(
+                f"workers={options['workers']} expired={expired} checked_out={checked_out} rooms_released={released} "
+                f"elapsed={elapsed:.2f}s rows/s={(expired + checked_out) / elapsed:.0f} "
+                f"peak_rss={peak / 1e6:.0f}MB rss_growth={(peak - baseline) / 1e6:.1f}MB"
+            )
+            if (expired, checked_out) != (expected['expired'], expected['checked_out']):
+                raise CommandError(f"expected {expected}, swept expired={expired} checked_out={checked_out}")
+            if set(Room.objects.filter(is_available=False).values_list('pk', flat=True)) != held_rooms:
+                raise CommandError("Released rooms do not match the rooms without paid future stays.")
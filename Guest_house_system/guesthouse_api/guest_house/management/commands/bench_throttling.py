@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from rest_framework.test import APIRequestFactory
+
+from guest_house import throttling
+from guest_house.benchmarking import format_summary, isolated_database, summarize
+from guest_house.models import DebitCard
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the token-bucket check on its local and shared-cache paths, then burst deposits "
+        "from many threads and report how throttled and shed requests compare with served ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200000)
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=50, help="Requests per thread.")
+        parser.add_argument('--max-in-flight', type=int, default=16, help="LOAD_SHED_MAX_IN_FLIGHT for the burst.")
+
+    def handle(self, *args, **options):
+        self.checks(options['checks'])
+        # Failed requests are counted below; their tracebacks from django.request would drown the report.
+        logging.disable(logging.ERROR)
+        try:
+            with isolated_database():
+                cards = DebitCard.objects.bulk_create(DebitCard(card_number=f"49100000{i:08d}") for i in range(4))
+                rates = {'DEFAULT_THROTTLE_RATES': {'card': '50/s', 'client': '100000/s'}}
+                with override_settings(THROTTLING_ENABLED=True, REST_FRAMEWORK=rates, LOAD_SHED_MAX_IN_FLIGHT=options['max_in_flight']):
+                    self.burst(cards, options['threads'], options['requests'])
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def checks(self, count):
+        throttling.reset()
+        throttle = throttling.ClientRateThrottle()
+        request = APIRequestFactory().post('/api/deposit_funds/')
+        with override_settings(THROTTLING_ENABLED=True, REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'client': f'{count * 100}/s'}}):
+            for label, lease_fraction in (('local lease', throttling.LEASE_FRACTION), ('shared cache every time', count * 1000)):
+                throttling.reset()
+                throttling.get_cache().clear()
+                saved, throttling.LEASE_FRACTION = throttling.LEASE_FRACTION, lease_fraction
+                try:
+                    started = time.perf_counter()
+                    for _ in range(count):
+                        throttle.allow_request(request, None)
+                    elapsed = time.perf_counter() - started
+                finally:
+                    throttling.LEASE_FRACTION = saved
+                self.stdout.write(f"allow_request via {label}: {elapsed / count * 1e6:.2f}us per check")
+
+    def burst(self, cards, threads, per_thread):
+        throttling.reset()
+        throttling.get_cache().clear()
+        samples, outcomes = defaultdict(list), Counter()
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(index):
+            client = Client(raise_request_exception=False)
+            card = cards[index % len(cards)]
+            local_samples, local = defaultdict(list), Counter()
+            barrier.wait()
+            try:
+                for _ in range(per_thread):
+                    started = time.perf_counter()
+                    try:
+                        outcome = {200: 'ok', 429: 'throttled', 503: 'shed'}.get(
+                            client.post('/api/deposit_funds/', {'card_number': card.card_number, 'amount': '1.00'}, content_type='application/json').status_code,
+                            'error',
+                        )
+                    except OperationalError:
+                        outcome = 'locked'
+                    local_samples[outcome].append(time.perf_counter() - started)
+                    local[outcome] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for outcome, durations in local_samples.items():
+                        samples[outcome].extend(durations)
+                    outcomes.update(local)
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"burst: threads={threads} requests={sum(outcomes.values())} seconds={elapsed:.2f} outcomes={dict(outcomes)}")
+        for outcome in sorted(samples):
+            self.stdout.write(format_summary(f"  {outcome}", summarize(samples[outcome])))
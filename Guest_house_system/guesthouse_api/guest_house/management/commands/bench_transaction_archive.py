@@ -0,0 +1,71 @@
+import itertools
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone as django_timezone
+from rest_framework.test import APIClient
+
+from guest_house import archive, ledger
+from guest_house.benchmarking import chunked, format_summary, isolated_database, measure, summarize
+from guest_house.models import ArchivedTransaction, DebitCard, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Grow the transaction history step by step and time the hot-table queries before and after "
+        "each archive run, to show they stay flat once old rows are archived."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--steps', type=int, default=3)
+        parser.add_argument('--rows-per-step', type=int, default=200_000)
+        parser.add_argument('--hot-days', type=int, default=30, help="History kept in the hot table; rows are a minute apart.")
+        parser.add_argument('--cards', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            DebitCard.objects.bulk_create(DebitCard(card_number=f"44000000{i:08d}", balance=0) for i in range(options['cards']))
+            card_ids = list(DebitCard.objects.values_list('pk', flat=True))
+            # One row a minute, so each step adds real depth to the history.
+            clock = (datetime(2020, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i) for i in itertools.count())
+            client = APIClient()
+            total = 0
+            for step in range(options['steps']):
+                with mock.patch.object(django_timezone, 'now', side_effect=lambda: next(clock)):
+                    for chunk in chunked(range(total, total + options['rows_per_step']), 10000):
+                        Transaction.objects.bulk_create(
+                            Transaction(debit_card_id=card_ids[i % len(card_ids)], amount=1, transaction_type='deposit')
+                            for i in chunk
+                        )
+                total += options['rows_per_step']
+                self.stdout.write(f"step {step}: history={total} transactions")
+                self.report('before archiving', client, card_ids[0], options['iterations'])
+
+                newest = Transaction.objects.order_by('-timestamp', '-id').values_list('timestamp', flat=True).first()
+                started = time.perf_counter()
+                moved = archive.archive_before(newest - timedelta(days=options['hot_days']))
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  archived {moved} in {elapsed:.2f}s ({moved / elapsed if elapsed else 0:.0f} rows/s); "
+                    f"hot={Transaction.objects.count()} archived={ArchivedTransaction.objects.count()}"
+                )
+                self.report('after archiving', client, card_ids[0], options['iterations'])
+
+    def report(self, label, client, card_id, iterations):
+        def first_page():
+            assert client.get('/api/transactions/').status_code == 200
+
+        def card_page():
+            assert client.get('/api/transactions/', {'debit_card': card_id}).status_code == 200
+
+        def balance():
+            ledger.ledger_balance(card_id)
+
+        def hot_count():
+            Transaction.objects.count()
+
+        for name, fn in (('GET first page', first_page), ('GET card page', card_page), ('ledger_balance', balance), ('hot COUNT(*)', hot_count)):
+            self.stdout.write(format_summary(f"  {label} {name}", summarize(measure(fn, iterations))))
@@ -0,0 +1,58 @@
+import itertools
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone as django_timezone
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from guest_house.benchmarking import chunked, format_summary, isolated_database, measure, summarize
+from guest_house.models import DebitCard, Transaction
+from guest_house.pagination import TransactionCursorPagination
+
+
+class Command(BaseCommand):
+    help = "Show that transaction history pages cost the same at any depth."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--cards', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with isolated_database():
+            DebitCard.objects.bulk_create(DebitCard(card_number=f"42000000{i:08d}") for i in range(options['cards']))
+            card_ids = list(DebitCard.objects.values_list('pk', flat=True))
+            # auto_now_add would stamp every row with the same instant; give each row its own minute
+            # so the history has real depth and the cursor never falls back to long offset runs.
+            clock = (datetime(2020, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i) for i in itertools.count())
+            with mock.patch.object(django_timezone, 'now', side_effect=lambda: next(clock)):
+                for chunk in chunked(range(rows), 10000):
+                    Transaction.objects.bulk_create(
+                        Transaction(debit_card_id=card_ids[i % len(card_ids)], amount=1, transaction_type='deposit' if i % 3 else 'payment')
+                        for i in chunk
+                    )
+            self.stdout.write(f"seeded {rows} transactions")
+
+            client = APIClient()
+            paginator = TransactionCursorPagination()
+            paginator.base_url = 'http://testserver/api/transactions/'
+            timestamps = Transaction.objects.order_by('-timestamp', '-id').values_list('timestamp', flat=True)
+
+            for depth in (0, rows // 10, rows // 2, rows - 200):
+                if depth:
+                    position = timestamps[depth].isoformat()
+                    url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+                else:
+                    url = '/api/transactions/'
+
+                def cursor_page(url=url):
+                    assert client.get(url).status_code == 200
+
+                def offset_page(depth=depth):
+                    list(Transaction.objects.order_by('-timestamp', '-id')[depth:depth + 100])
+
+                self.stdout.write(format_summary(f"GET cursor page at row {depth}", summarize(measure(cursor_page, options['iterations']))))
+                self.stdout.write(format_summary(f"ORM OFFSET query at row {depth} (comparison)", summarize(measure(offset_page, options['iterations']))))
@@ -0,0 +1,51 @@
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from guest_house.benchmarking import chunked, isolated_database
+from guest_house.ledger import audit_balances
+from guest_house.models import BalanceCheckpoint, DebitCard, Transaction
+
+
+class Command(BaseCommand):
+    help = "Time the streaming balance audit at growing log sizes and report its peak Python memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100000,1000000', help="Comma-separated transaction counts, e.g. 1000000,10000000.")
+        parser.add_argument('--cards', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with isolated_database():
+            DebitCard.objects.bulk_create(DebitCard(card_number=f"43000000{i:08d}") for i in range(options['cards']))
+            card_ids = list(DebitCard.objects.values_list('pk', flat=True))
+            BalanceCheckpoint.objects.bulk_create(BalanceCheckpoint(debit_card_id=card_id, balance=0) for card_id in card_ids)
+            seeded = 0
+            for size in sizes:
+                for chunk in chunked(range(seeded, size), 10000):
+                    Transaction.objects.bulk_create(
+                        Transaction(debit_card_id=card_ids[i % len(card_ids)], amount=Decimal('1.01'), transaction_type='deposit')
+                        for i in chunk
+                    )
+                seeded = size
+                # Keep stored balances in line with the log so the audit does real comparisons.
+                per_card, extra = divmod(size, len(card_ids))
+                DebitCard.objects.update(balance=Decimal('1.01') * per_card)
+                DebitCard.objects.filter(pk__in=card_ids[:extra]).update(balance=Decimal('1.01') * (per_card + 1))
+
+                started = time.perf_counter()
+                mismatched = sum(1 for audit in audit_balances() if audit.problems)
+                elapsed = time.perf_counter() - started
+
+                tracemalloc.start()
+                for _ in audit_balances():
+                    pass
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f"transactions={size} cards={len(card_ids)} elapsed={elapsed:.3f}s "
+                    f"rows/s={size / elapsed:.0f} peak_python_memory={peak / 1024:.0f}KiB mismatched={mismatched}"
+                )
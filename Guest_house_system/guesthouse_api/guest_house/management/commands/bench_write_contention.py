@@ -0,0 +1,115 @@
+import datetime
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client
+
+from guest_house.benchmarking import format_summary, isolated_database, summarize
+from guest_house.models import DebitCard, Guest, Meal, Reservation, Room
+
+PROFILES = {
+    'dev': {'OPTIONS': {}, 'CONN_MAX_AGE': 0},
+    'sqlite-tuned': {'OPTIONS': settings.SQLITE_TUNED_OPTIONS, 'CONN_MAX_AGE': 600},
+}
+
+
+class Command(BaseCommand):
+    help = "Run a mixed read/write API workload from many threads under each SQLite profile and compare error rates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=100, help="Requests per thread.")
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES), help="Profile to run (repeatable); default all.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark compares SQLite profiles; run it with GUESTHOUSE_DB_PROFILE=dev or sqlite-tuned.")
+        settings_dict = connection.settings_dict
+        saved = {key: settings_dict.get(key) for key in ('OPTIONS', 'CONN_MAX_AGE')}
+        # Locked requests are counted below; their tracebacks from django.request would drown the report.
+        logging.disable(logging.ERROR)
+        try:
+            for name in options['profile'] or ['dev', 'sqlite-tuned']:
+                # Every thread opens its own connection from this shared dict, so the
+                # profile reaches them all; each run gets a fresh file for a fair start.
+                settings_dict.update(PROFILES[name])
+                connection.close()
+                with isolated_database():
+                    self.report(name, *self.run(options['threads'], options['requests']))
+                connection.close()
+        finally:
+            logging.disable(logging.NOTSET)
+            settings_dict.update(saved)
+
+    def seed(self, threads):
+        cards = DebitCard.objects.bulk_create(DebitCard(card_number=f"45000000{i:08d}", balance=1000000) for i in range(threads))
+        rooms = Room.objects.bulk_create(Room(name=f"Room {i}", price_per_night=80) for i in range(threads))
+        meal = Meal.objects.create(name="Breakfast", price=10)
+        guest = Guest.objects.create(name="Seed", email="seed@example.com")
+        reservation = Reservation.objects.create(
+            guest=guest, meal=meal, check_in_date=datetime.date(2030, 1, 1),
+            check_out_date=datetime.date(2030, 1, 2), total_cost=10,
+        )
+        return cards, rooms, reservation
+
+    def run(self, threads, per_thread):
+        cards, rooms, reservation = self.seed(threads)
+        samples, outcomes = [], Counter()
+        lock = threading.Lock()
+
+        def worker(index):
+            client = Client(raise_request_exception=False)
+            card, room = cards[index], rooms[index]
+            local_samples, local = [], Counter()
+            try:
+                for i in range(per_thread):
+                    kind = ('deposit', 'payment', 'reservation', 'read')[i % 4]
+                    started = time.perf_counter()
+                    try:
+                        if kind == 'deposit':
+                            response = client.post('/api/deposit_funds/', {'card_number': card.card_number, 'amount': '5.00'}, content_type='application/json')
+                        elif kind == 'payment':
+                            response = client.post('/api/payments/', {'card_number': card.card_number, 'amount': '1.00', 'reservation_id': reservation.pk}, content_type='application/json')
+                        elif kind == 'reservation':
+                            # Back-to-back stays on the thread's own room: never a clash, but the
+                            # overlap check reads before the insert writes.
+                            check_in = datetime.date(2031, 1, 1) + datetime.timedelta(days=i)
+                            response = client.post('/api/reservations/', {
+                                'guest_name': f"Guest {index}", 'guest_email': f"guest{index}@example.com",
+                                'room_id': room.pk, 'check_in_date': check_in.isoformat(),
+                                'check_out_date': (check_in + datetime.timedelta(days=1)).isoformat(),
+                            }, content_type='application/json')
+                        else:
+                            response = client.get(f'/api/transactions/?debit_card={card.pk}')
+                        local['ok' if response.status_code < 400 else f'http_{response.status_code}'] += 1
+                    except OperationalError:
+                        local['locked'] += 1
+                    local_samples.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+                with lock:
+                    samples.extend(local_samples)
+                    outcomes.update(local)
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return samples, outcomes, elapsed
+
+    def report(self, name, samples, outcomes, elapsed):
+        total = sum(outcomes.values())
+        errors = total - outcomes['ok']
+        self.stdout.write(format_summary(name, summarize(samples)))
+        self.stdout.write(
+            f"  requests={total} ok={outcomes['ok']} errors={errors} error_rate={errors / total:.1%} "
+            f"ok/s={outcomes['ok'] / elapsed:.0f} outcomes={dict(outcomes)}"
+        )
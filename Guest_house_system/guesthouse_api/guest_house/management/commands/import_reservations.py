@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from guest_house.imports import CHUNK_SIZE, import_reservations
+
+
+class Command(BaseCommand):
+    help = "Import reservations from a JSON array or NDJSON file of ReservationCreateSerializer payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path']) as handle:
+                if options['path'].endswith(('.ndjson', '.jsonl')):
+                    rows = [json.loads(line) for line in handle if line.strip()]
+                else:
+                    rows = json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {options['path']}: {exc}")
+
+        results = import_reservations(rows, chunk_size=options['chunk_size'])
+        failed = [result for result in results if result['status'] == 'failed']
+        for result in failed:
+            self.stderr.write(f"row {result['index']}: {result.get('error') or result.get('errors')}")
+        self.stdout.write(f"Imported {len(results) - len(failed)} reservations, {len(failed)} failed.")
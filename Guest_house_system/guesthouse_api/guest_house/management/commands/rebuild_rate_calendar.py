@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from guest_house import pricing
+from guest_house.models import Room
+
+
+class Command(BaseCommand):
+    help = "Regenerate the nightly rate calendar from room prices and rate rules; run after the rules change."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room', type=int, action='append', help="Room id to regenerate (repeatable); default all.")
+        parser.add_argument('--from', dest='start', type=date.fromisoformat, help="First night (YYYY-MM-DD); default today.")
+        parser.add_argument('--days', type=int, help="Nights to precompute; default RATE_CALENDAR_DAYS.")
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.filter(pk__in=options['room']).order_by('pk') if options['room'] else None
+        rows = pricing.regenerate(rooms, start=options['start'], days=options['days'])
+        self.stdout.write(f"wrote {rows} nightly rates")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from guest_house import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily room rollups behind the occupancy reports from reservations and payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows = rollups.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f"rebuilt {rows} daily room rollups")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from guest_house import sweeper
+
+
+class Command(BaseCommand):
+    help = "Expire unpaid holds, check out finished stays and release their rooms; safe to run on several nodes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=sweeper.BATCH_SIZE)
+        parser.add_argument('--interval', type=float, help="Keep running, sweeping every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            result = sweeper.sweep(batch_size=options['batch_size'])
+            self.stdout.write(f"expired={result.expired} checked_out={result.checked_out} rooms_released={result.rooms_released}")
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+            # A worker lives longer than CONN_MAX_AGE; let Django recycle the connection as a request would.
+            close_old_connections()
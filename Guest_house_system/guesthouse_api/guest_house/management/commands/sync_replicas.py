@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from guest_house import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over every REPLICA_DATABASES file, to try the replica "
+        "router locally. Server databases replicate with their own tools."
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError("Only SQLite replicas can be copied; use the database's own replication.")
+        if not replicas.get_replicas():
+            raise CommandError("No replicas configured; set DB_REPLICAS to one or more SQLite files.")
+        for alias in replicas.get_replicas():
+            target = connections[alias]
+            target.close()
+            replicas.copy_sqlite(primary.settings_dict['NAME'], target.settings_dict['NAME'])
+            self.stdout.write(f"copied {primary.settings_dict['NAME']} to {alias} ({target.settings_dict['NAME']})")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from guest_house.ledger import BATCH_SIZE, audit_balances
+from guest_house.models import BalanceCheckpoint
+
+
+class Command(BaseCommand):
+    help = "Recompute every card's balance from the transaction log and compare it with DebitCard.balance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkpoint', action='store_true', help="Record a new checkpoint for every card that verifies.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cards = mismatched = 0
+        pending = []
+        for audit in audit_balances(chunk_size=options['chunk_size']):
+            cards += 1
+            if audit.problems:
+                mismatched += 1
+                for problem in audit.problems:
+                    self.stderr.write(f"card {audit.card_id}: {problem}")
+            elif options['checkpoint'] and audit.last_transaction_id > (audit.checkpointed_through or 0):
+                pending.append(BalanceCheckpoint(debit_card_id=audit.card_id, balance=audit.computed, last_transaction_id=audit.last_transaction_id))
+                if len(pending) >= BATCH_SIZE:
+                    BalanceCheckpoint.objects.bulk_create(pending)
+                    pending = []
+        if pending:
+            BalanceCheckpoint.objects.bulk_create(pending)
+
+        self.stdout.write(f"Verified {cards} cards, {mismatched} mismatched.")
+        if mismatched:
+            raise CommandError(f"{mismatched} card balances disagree with the transaction log.")
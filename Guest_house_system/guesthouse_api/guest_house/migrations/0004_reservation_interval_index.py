@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0003_remove_debitcard_guest_debitcard_cvc'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'check_out_date', 'check_in_date'], name='reservation_room_interval'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0004_reservation_interval_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['timestamp', 'id'], name='transaction_history'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['debit_card', 'timestamp', 'id'], name='transaction_card_history'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_type', 'timestamp', 'id'], name='transaction_type_history'),
+        ),
+        # Dropped only once transaction_card_history, which covers it, exists.
+        migrations.AlterField(
+            model_name='transaction',
+            name='debit_card',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='guest_house.debitcard'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def create_opening_checkpoints(apps, schema_editor):
+    # Existing balances were set directly, not only through the log. Record whatever part of
+    # each balance the log does not explain as the card's opening balance.
+    DebitCard = apps.get_model('guest_house', 'DebitCard')
+    Transaction = apps.get_model('guest_house', 'Transaction')
+    BalanceCheckpoint = apps.get_model('guest_house', 'BalanceCheckpoint')
+    logged = dict(Transaction.objects.values_list('debit_card_id').annotate(total=Sum('amount')).order_by())
+    BalanceCheckpoint.objects.bulk_create(
+        (
+            BalanceCheckpoint(debit_card_id=card_id, balance=balance - (logged.get(card_id) or 0), last_transaction_id=0)
+            for card_id, balance in DebitCard.objects.values_list('pk', 'balance').iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0005_transaction_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['debit_card', 'id'], name='transaction_card_sequence'),
+        ),
+        migrations.AddField(
+            model_name='balancecheckpoint',
+            name='debit_card',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='guest_house.debitcard'),
+        ),
+        migrations.AddIndex(
+            model_name='balancecheckpoint',
+            index=models.Index(fields=['debit_card', 'last_transaction_id'], name='checkpoint_card_sequence'),
+        ),
+        migrations.RunPython(create_opening_checkpoints, migrations.RunPython.noop),
+    ]
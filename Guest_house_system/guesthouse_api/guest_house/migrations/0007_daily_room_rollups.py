@@ -0,0 +1,70 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:28
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same figures as rollups.rebuild(), written against the historical models.
+    Reservation = apps.get_model('guest_house', 'Reservation')
+    Transaction = apps.get_model('guest_house', 'Transaction')
+    DailyRoomRollup = apps.get_model('guest_house', 'DailyRoomRollup')
+    rows = defaultdict(lambda: [0, Decimal('0.00'), Decimal('0.00')])
+    stays = Reservation.objects.filter(room__isnull=False).values_list('room_id', 'check_in_date', 'check_out_date', 'total_cost')
+    for room_id, check_in_date, check_out_date, total_cost in stays.iterator(chunk_size=5000):
+        nights = (check_out_date - check_in_date).days
+        if nights < 1:
+            continue
+        share = (total_cost / nights).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+        for offset in range(nights):
+            row = rows[room_id, check_in_date + timedelta(days=offset)]
+            row[0] += 1
+            row[1] += total_cost - share * (nights - 1) if offset == 0 else share
+    paid = (
+        Transaction.objects.filter(transaction_type='payment', reservation__room__isnull=False)
+        .annotate(day=TruncDate('timestamp'))
+        .values_list('reservation__room_id', 'day')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for room_id, day, total in paid:
+        rows[room_id, day][2] -= total
+    DailyRoomRollup.objects.bulk_create(
+        (
+            DailyRoomRollup(room_id=room_id, day=day, nights_sold=nights, revenue=revenue, payments=payments)
+            for (room_id, day), (nights, revenue, payments) in rows.items()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0006_balance_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRoomRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('nights_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payments', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('room', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='guest_house.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'room', 'nights_sold', 'revenue', 'payments'], name='rollup_day_covering')],
+                'constraints': [models.UniqueConstraint(fields=('room', 'day'), name='rollup_room_day')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:37
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0008_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='email_search',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('email'), output_field=models.CharField(max_length=254)),
+        ),
+        migrations.AddField(
+            model_name='guest',
+            name='name_search',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('name'), output_field=models.CharField(max_length=100)),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['name_search'], name='guest_name_search'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['email_search'], name='guest_email_search'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0009_guest_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        # Existing bookings predate payment tracking: they start out confirmed so the
+        # sweeper does not expire them, and only new rows default to pending.
+        migrations.AddField(
+            model_name='reservation',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('checked_out', 'Checked Out'), ('expired', 'Expired')], default='confirmed', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('checked_out', 'Checked Out'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'created_at'], name='reservation_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'check_out_date'], name='reservation_status_checkout'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:16
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0010_reservation_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('weekdays', models.CharField(blank=True, max_length=7, validators=[django.core.validators.RegexValidator('^[0-6]*$')])),
+                ('min_nights', models.PositiveSmallIntegerField(default=1)),
+                ('multiplier', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rate_rules', to='guest_house.room')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NightlyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('room', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='nightly_rates', to='guest_house.room')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('room', 'day'), name='nightly_rate_room_day')],
+            },
+        ),
+    ]
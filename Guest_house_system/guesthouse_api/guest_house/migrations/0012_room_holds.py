@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0011_rate_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('check_in_date', models.DateField()),
+                ('check_out_date', models.DateField()),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.DateTimeField()),
+                ('room', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='guest_house.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room', 'check_out_date', 'check_in_date'], name='room_hold_room_interval')],
+            },
+        ),
+    ]
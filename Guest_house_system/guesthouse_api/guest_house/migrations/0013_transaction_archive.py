@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0012_room_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('debit_card_id', models.BigIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_type', models.CharField(max_length=20)),
+                ('reservation_id', models.BigIntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['timestamp', 'id'], name='archive_history'), models.Index(fields=['debit_card_id', 'timestamp', 'id'], name='archive_card_history'), models.Index(fields=['debit_card_id', 'id'], name='archive_card_sequence')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_house', '0013_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['check_in_date', 'id'], name='reservation_check_in'),
+        ),
+    ]
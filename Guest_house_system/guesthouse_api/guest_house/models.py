@@ -1,4 +1,66 @@
-from django.db import models
+from django.core.validators import RegexValidator
+from django.db import connection, models
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+# SQLite's lower() only folds ASCII letters.
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+class RoomQuerySet(models.QuerySet):
+    def available_between(self, check_in_date, check_out_date):
+        # Rooms with no reservation or live hold overlapping [check_in_date, check_out_date).
+        return self.exclude(Exists(
+            Reservation.objects.filter(room=OuterRef('pk')).overlapping(check_in_date, check_out_date)
+        )).exclude(Exists(
+            RoomHold.objects.filter(room=OuterRef('pk')).live().overlapping(check_in_date, check_out_date)
+        ))
+
+class ReservationQuerySet(models.QuerySet):
+    def overlapping(self, check_in_date, check_out_date):
+        # Half-open intervals: a stay ending on a day does not block a stay starting on it.
+        # Expired holds no longer block anything.
+        return self.filter(check_out_date__gt=check_in_date, check_in_date__lt=check_out_date).exclude(status=Reservation.Status.EXPIRED)
+
+class RoomHoldQuerySet(models.QuerySet):
+    def live(self, now=None):
+        return self.filter(expires_at__gt=now or timezone.now())
+
+    def overlapping(self, check_in_date, check_out_date):
+        return self.filter(check_out_date__gt=check_in_date, check_in_date__lt=check_out_date)
+
+def _fold(term):
+    return term.translate(_ASCII_LOWER) if connection.vendor == 'sqlite' else term.lower()
+
+def _prefix_lookup(column, term):
+    """Filter kwargs for a lowercase ``column`` starting with the folded ``term``."""
+    # Everything that starts with term sorts in [term, term with its last character bumped).
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    # The range drives the index; startswith keeps the result exact under non-binary collations.
+    return {f'{column}__gte': term, f'{column}__lt': upper, f'{column}__startswith': term}
+
+class GuestQuerySet(models.QuerySet):
+    def name_or_email_prefix(self, term, limit):
+        """Up to ``limit`` guests whose name or email starts with ``term``, ignoring case.
+
+        Name matches come first, each side in index order. Both sides are a range seek
+        on a lowercase column with their own LIMIT, so the cost depends on ``limit``
+        rather than on the size of the table or how common the prefix is.
+        """
+        term = _fold(term)
+        guests = []
+        for column in ('name_search', 'email_search'):
+            matches = self.filter(**_prefix_lookup(column, term)).exclude(pk__in=[guest.pk for guest in guests]).order_by(column, 'pk')
+            guests.extend(matches[:limit - len(guests)])
+            if len(guests) >= limit:
+                break
+        return guests
+
+    def prefix_search(self, term):
+        """Every guest whose name or email starts with ``term``, ignoring case; two range seeks."""
+        term = _fold(term)
+        return self.filter(Q(**_prefix_lookup('name_search', term)) | Q(**_prefix_lookup('email_search', term)))
 
 class Room(models.Model):
     name = models.CharField(max_length=100)
@@ -6,6 +68,8 @@ class Room(models.Model):
     is_available = models.BooleanField(default=True)
     # Add other room-related fields
 
+    objects = RoomQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -20,9 +84,20 @@ class Meal(models.Model):
 class Guest(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
+    # Lowercased copies kept by the database itself, so bulk writes and updates stay in step.
+    name_search = models.GeneratedField(expression=Lower('name'), output_field=models.CharField(max_length=100), db_persist=True)
+    email_search = models.GeneratedField(expression=Lower('email'), output_field=models.CharField(max_length=254), db_persist=True)
 
     # Add other guest-related fields
 
+    objects = GuestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name_search'], name='guest_name_search'),
+            models.Index(fields=['email_search'], name='guest_email_search'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -37,19 +112,66 @@ class DebitCard(models.Model):
         return f"Card: ****-****-****-{self.card_number[-4:]}"
 
 class Reservation(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending'          # booked, not paid yet; expires after RESERVATION_HOLD_SECONDS
+        CONFIRMED = 'confirmed'      # at least one payment received
+        CHECKED_OUT = 'checked_out'  # stay is over
+        EXPIRED = 'expired'          # never paid; no longer holds the room
+
+    ACTIVE = (Status.PENDING, Status.CONFIRMED)
+
     guest = models.ForeignKey(Guest, on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, blank=True)
     meal = models.ForeignKey(Meal, on_delete=models.SET_NULL, null=True, blank=True)
     check_in_date = models.DateField()
     check_out_date = models.DateField()
     total_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    created_at = models.DateTimeField(default=timezone.now)
     # Add other reservation-related fields
 
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Interval index for availability: seek by room, then only stays that end after the
+            # requested check-in are scanned, so past history does not slow the lookup down.
+            models.Index(fields=['room', 'check_out_date', 'check_in_date'], name='reservation_room_interval'),
+            # The sweeper's batches: unpaid holds by age, active stays by check-out.
+            models.Index(fields=['status', 'created_at'], name='reservation_status_created'),
+            models.Index(fields=['status', 'check_out_date'], name='reservation_status_checkout'),
+            # Check-in order: the exports' date ranges and the admin's list and date hierarchy.
+            models.Index(fields=['check_in_date', 'id'], name='reservation_check_in'),
+        ]
+
     def __str__(self):
         return f"Reservation for {self.guest.name}"
 
+class RoomHold(models.Model):
+    """A short claim on a room's nights while a guest completes the booking; see ``holds``.
+
+    Expired holds block nothing and are deleted the next time the room is claimed.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='holds', db_index=False)
+    check_in_date = models.DateField()
+    check_out_date = models.DateField()
+    token = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField()
+
+    objects = RoomHoldQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Same shape as reservation_room_interval, for the overlap checks.
+            models.Index(fields=['room', 'check_out_date', 'check_in_date'], name='room_hold_room_interval'),
+        ]
+
+    def __str__(self):
+        return f"Hold on {self.room} {self.check_in_date}..{self.check_out_date}"
+
 class Transaction(models.Model):
-    debit_card = models.ForeignKey(DebitCard, on_delete=models.CASCADE)
+    # Indexed through transaction_card_history below rather than on its own.
+    debit_card = models.ForeignKey(DebitCard, on_delete=models.CASCADE, db_index=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_type = models.CharField(max_length=20)  # 'deposit', 'payment'
     reservation = models.ForeignKey(Reservation, on_delete=models.SET_NULL, null=True, blank=True)
@@ -57,5 +179,144 @@ class Transaction(models.Model):
     # Add other transaction-related fields
     # Add other transaction-related fields
 
+    class Meta:
+        indexes = [
+            # Keyset pagination walks these with "timestamp < x ORDER BY timestamp, id", so a deep
+            # page is one index seek rather than an OFFSET scan.
+            models.Index(fields=['timestamp', 'id'], name='transaction_history'),
+            models.Index(fields=['debit_card', 'timestamp', 'id'], name='transaction_card_history'),
+            models.Index(fields=['transaction_type', 'timestamp', 'id'], name='transaction_type_history'),
+            # Per-card log order, for "deltas since checkpoint" and the streaming balance audit.
+            models.Index(fields=['debit_card', 'id'], name='transaction_card_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type}: {self.amount} on {self.debit_card}"
+
+class ArchivedTransaction(models.Model):
+    """A ``Transaction`` moved out of the hot table by ``archive.archive_before``.
+
+    Same columns and the same id. The card and reservation are plain ids rather
+    than foreign keys so the archive can live in its own database
+    (``TRANSACTION_ARCHIVE_DATABASE``), and so archived rows outlive them.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    debit_card_id = models.BigIntegerField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(max_length=20)
+    reservation_id = models.BigIntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # The same orders the hot table is read in: history, per-card history and per-card log.
+            models.Index(fields=['timestamp', 'id'], name='archive_history'),
+            models.Index(fields=['debit_card_id', 'timestamp', 'id'], name='archive_card_history'),
+            models.Index(fields=['debit_card_id', 'id'], name='archive_card_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type}: {self.amount} on card {self.debit_card_id} (archived)"
+
+    def as_transaction(self):
+        """An unsaved ``Transaction`` carrying this row's values, for code that renders transactions."""
+        return Transaction(
+            id=self.id, debit_card_id=self.debit_card_id, amount=self.amount, transaction_type=self.transaction_type,
+            reservation_id=self.reservation_id, timestamp=self.timestamp,
+        )
+
+class BalanceCheckpoint(models.Model):
+    """A card's balance as of the transaction log up to and including ``last_transaction_id``.
+
+    The current balance is the latest checkpoint plus the amounts of the card's
+    transactions after it. A card's earliest checkpoint is its opening balance.
+    """
+    debit_card = models.ForeignKey(DebitCard, on_delete=models.CASCADE, related_name='checkpoints', db_index=False)
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+    # A plain id rather than a foreign key so that old transactions can be moved out of the table.
+    last_transaction_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['debit_card', 'last_transaction_id'], name='checkpoint_card_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.debit_card}: {self.balance} at transaction {self.last_transaction_id}"
+
+class DailyRoomRollup(models.Model):
+    """One room's sold nights, booked revenue and payments on one day.
+
+    Maintained incrementally by ``rollups`` as reservations and payments are
+    written; ``manage.py rebuild_rollups`` recomputes it from the raw tables.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='daily_rollups', db_index=False)
+    day = models.DateField()
+    nights_sold = models.PositiveIntegerField(default=0)
+    # The reservation's total_cost spread evenly over its nights.
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Payments taken that day against the room's reservations.
+    payments = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index for per-room date ranges.
+            models.UniqueConstraint(fields=['room', 'day'], name='rollup_room_day'),
+        ]
+        indexes = [
+            # Covers the all-rooms report: a date range is answered from the index alone.
+            models.Index(fields=['day', 'room', 'nights_sold', 'revenue', 'payments'], name='rollup_day_covering'),
+        ]
+
+    def __str__(self):
+        return f"{self.room} on {self.day}: {self.nights_sold} sold"
+
+class RateRule(models.Model):
+    """Scales a room's ``price_per_night`` on the nights it matches; see ``pricing``."""
+    name = models.CharField(max_length=100)
+    # None: every room.
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, null=True, blank=True, related_name='rate_rules')
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)  # exclusive
+    # Digits of the nights it covers, Monday=0 ('45' is Friday and Saturday night); blank: every night.
+    weekdays = models.CharField(max_length=7, blank=True, validators=[RegexValidator(r'^[0-6]*$')])
+    # Above 1, a length-of-stay rule: it only applies to stays of at least this many nights.
+    min_nights = models.PositiveSmallIntegerField(default=1)
+    multiplier = models.DecimalField(max_digits=6, decimal_places=4)
+
+    def __str__(self):
+        return f"{self.name}: x{self.multiplier}"
+
+class NightlyRate(models.Model):
+    """A room's price for one night, precomputed from its base price and rate rules."""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='nightly_rates', db_index=False)
+    day = models.DateField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            # Also the index that prices a stay with one range scan.
+            models.UniqueConstraint(fields=['room', 'day'], name='nightly_rate_room_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.room} on {self.day}: {self.price}"
+
+class IdempotencyKey(models.Model):
+    """The stored outcome of a request sent with an ``Idempotency-Key`` header.
+
+    The row is inserted in the same transaction as the request's own writes, so
+    it exists exactly when they were committed; see ``idempotency``.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    # sha256 of method, path and body: the same key with a different request is refused.
+    fingerprint = models.CharField(max_length=64)
+    # Inserted empty to claim the key, filled in before the same transaction commits.
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
     def __str__(self):
-        return f"{self.transaction_type}: {self.amount} on {self.debit_card}"
\ No newline at end of file
+        return f"{self.key} -> {self.status_code}"
@@ -0,0 +1,65 @@
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, router
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class TransactionCursorPagination(CursorPagination):
+    # Newest first; served by the (…, timestamp, id) indexes on Transaction.
+    ordering = ('-timestamp', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+def estimated_rows(model):
+    """The table's row count from the planner's statistics, or ``None`` if there are none.
+
+    PostgreSQL keeps ``reltuples`` up to date through autovacuum; SQLite only has
+    ``sqlite_stat1`` after ``ANALYZE``. Other backends get ``None``.
+    """
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql, params = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [connection.ops.quote_name(table)]
+    elif connection.vendor == 'sqlite':
+        # The first number of any of the table's rows is its row count.
+        sql, params = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 does not exist until the first ANALYZE.
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL says -1 for a table that was never analyzed.
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """A ``Paginator`` for admin changelists over tables too big to ``COUNT(*)``.
+
+    Rows are counted up to ``COUNT_LIMIT`` and no further. Past that, an
+    unfiltered list takes its total from the planner's statistics
+    (``estimated_rows``), and a filtered one reports ``COUNT_LIMIT``, so its pages
+    beyond that are out of reach: narrow the filter instead.
+    """
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        # COUNT(*) over a LIMITed subquery: stops after COUNT_LIMIT rows.
+        counted = queryset[:self.COUNT_LIMIT].count()
+        if counted < self.COUNT_LIMIT:
+            return counted
+        if not queryset.query.has_filters():
+            estimate = estimated_rows(queryset.model)
+            if estimate is not None:
+                return max(estimate, counted)
+        return counted
@@ -0,0 +1,141 @@
+"""Room pricing: rate rules, the precomputed rate calendar and stay totals.
+
+A ``RateRule`` scales a room's ``price_per_night`` on the nights it matches (a
+season, some weekdays, or both); every matching rule's multiplier applies.
+Rules with ``min_nights`` above 1 are length-of-stay rules: whether they apply
+depends on the stay, so they are left out of the calendar and applied when a
+stay is priced.
+
+``NightlyRate`` is the calendar: one row per room and night, written by
+``regenerate`` (on every room save, and from ``manage.py rebuild_rate_calendar``
+after the rules change). ``load`` reads the calendar for some rooms over a date
+range with one range query, plus one query for the rules, and keeps each
+room's nights as prefix sums, so any stay inside the range costs a
+subtraction to price however long it is. Nights the calendar does not cover
+yet are priced from the rules on the fly.
+"""
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NightlyRate, RateRule, Room
+
+BATCH_SIZE = 500
+# Rooms regenerated per transaction.
+ROOMS_PER_CHUNK = 50
+CENT = Decimal('0.01')
+
+
+def get_horizon_days():
+    return getattr(settings, 'RATE_CALENDAR_DAYS', 730)
+
+
+def _matches(rule, room_id, day):
+    return (
+        (rule.room_id is None or rule.room_id == room_id)
+        and (rule.start_date is None or rule.start_date <= day)
+        and (rule.end_date is None or day < rule.end_date)
+        and (not rule.weekdays or str(day.weekday()) in rule.weekdays)
+    )
+
+
+def _apply(price, rules, room_id, day):
+    for rule in rules:
+        if _matches(rule, room_id, day):
+            price *= rule.multiplier
+    return price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def nightly_price(base_price, room_id, day, rules):
+    """One night's calendar price: the base price scaled by every matching nightly rule."""
+    return _apply(Decimal(base_price), [rule for rule in rules if rule.min_nights <= 1], room_id, day)
+
+
+def _rules_for(room_ids):
+    return RateRule.objects.filter(Q(room__isnull=True) | Q(room_id__in=room_ids)).order_by('pk')
+
+
+def regenerate(rooms=None, start=None, days=None):
+    """Rewrite the calendar from ``start`` (default today) for ``days`` nights; returns rows written.
+
+    ``rooms`` defaults to every room. Rows from ``start`` on are replaced, so
+    nights past a shortened horizon go too.
+    """
+    start = start or timezone.localdate()
+    days = [start + timedelta(days=offset) for offset in range(get_horizon_days() if days is None else days)]
+    rooms = iter(Room.objects.order_by('pk').iterator(chunk_size=ROOMS_PER_CHUNK) if rooms is None else rooms)
+    rules = list(RateRule.objects.filter(min_nights__lte=1).order_by('pk'))
+    written = 0
+    while chunk := list(islice(rooms, ROOMS_PER_CHUNK)):
+        with transaction.atomic():
+            NightlyRate.objects.filter(room_id__in=[room.pk for room in chunk], day__gte=start).delete()
+            rows = NightlyRate.objects.bulk_create(
+                (NightlyRate(room=room, day=day, price=nightly_price(room.price_per_night, room.pk, day, rules)) for room in chunk for day in days),
+                batch_size=BATCH_SIZE,
+            )
+        written += len(rows)
+    return written
+
+
+class Rates:
+    """Stay totals for some rooms over ``[start, end)``; build one with ``load`` or ``aload``."""
+
+    def __init__(self, rooms, start, end, calendar, rules):
+        self.start, self.end = start, end
+        self._stay_rules = [rule for rule in rules if rule.min_nights > 1]
+        self._nightly = {}
+        self._prefix = {}
+        days = [start + timedelta(days=offset) for offset in range((end - start).days)]
+        for room in rooms:
+            known = calendar.get(room.pk, {})
+            prices = [known[day] if day in known else nightly_price(room.price_per_night, room.pk, day, rules) for day in days]
+            self._nightly[room.pk] = prices
+            self._prefix[room.pk] = [Decimal(0), *accumulate(prices)]
+
+    def total(self, room_id, check_in_date, check_out_date):
+        first, last = self._offsets(check_in_date, check_out_date)
+        nights = last - first
+        stay_rules = [
+            rule for rule in self._stay_rules
+            if rule.min_nights <= nights and rule.room_id in (None, room_id)
+        ]
+        if not stay_rules:
+            prefix = self._prefix[room_id]
+            return prefix[last] - prefix[first]
+        return sum(
+            _apply(price, stay_rules, room_id, check_in_date + timedelta(days=offset))
+            for offset, price in enumerate(self._nightly[room_id][first:last])
+        )
+
+    def _offsets(self, check_in_date, check_out_date):
+        if not self.start <= check_in_date < check_out_date <= self.end:
+            raise ValueError(f"{check_in_date}..{check_out_date} is outside the loaded range {self.start}..{self.end}.")
+        return (check_in_date - self.start).days, (check_out_date - self.start).days
+
+
+def _calendar_query(room_ids, start, end):
+    return NightlyRate.objects.filter(room_id__in=room_ids, day__gte=start, day__lt=end).values_list('room_id', 'day', 'price')
+
+
+def _by_room(rows):
+    calendar = {}
+    for room_id, day, price in rows:
+        calendar.setdefault(room_id, {})[day] = price
+    return calendar
+
+
+def load(rooms, start, end):
+    """``Rates`` for ``rooms`` (Room instances) covering stays inside ``[start, end)``."""
+    room_ids = [room.pk for room in rooms]
+    return Rates(rooms, start, end, _by_room(_calendar_query(room_ids, start, end)), list(_rules_for(room_ids)))
+
+
+async def aload(rooms, start, end):
+    room_ids = [room.pk for room in rooms]
+    calendar = _by_room([row async for row in _calendar_query(room_ids, start, end)])
+    return Rates(rooms, start, end, calendar, [rule async for rule in _rules_for(room_ids)])
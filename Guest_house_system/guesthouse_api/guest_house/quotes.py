@@ -0,0 +1,97 @@
+"""Side-effect-free price and availability quotes for many rooms and stays at once.
+
+``quote`` answers a matrix of rooms x date ranges with a fixed number of
+queries however large the matrix is: one for the rooms, one for the meals,
+one range query for the reservations and room holds overlapping the whole
+window, and the two of ``pricing.load``. Availability uses the same trick as
+pricing: each room's booked nights become prefix counts over the window, so
+every cell is a subtraction.
+
+Results are cached for ``QUOTE_CACHE_TIMEOUT`` seconds under a key that embeds
+the room and meal catalog generations, so a booking or hold (which bump the
+room generation) or a catalog change is reflected at once; rate rule edits
+show up once the entry expires.
+"""
+import hashlib
+from contextlib import nullcontext
+from itertools import accumulate
+
+from django.conf import settings
+
+from . import booking, cache, pricing, replicas
+from .models import Meal, Room
+
+
+def get_timeout():
+    return getattr(settings, 'QUOTE_CACHE_TIMEOUT', 15)
+
+
+def _cache_key(room_ids, ranges, meal_ids):
+    request = f"{room_ids}|{ranges}|{meal_ids}"
+    return f"quotes:{cache.generation(Room)}:{cache.generation(Meal)}:{hashlib.sha1(request.encode()).hexdigest()}"
+
+
+def _booked(room_ids, start, end):
+    """Per room, how many of the window's first n nights are booked or held, for every n."""
+    days = (end - start).days
+    booked = {room_id: [0] * days for room_id in room_ids}
+    existing = booking.taken(room_ids, start, end)
+    for room_id, check_in_date, check_out_date in existing.iterator(chunk_size=2000):
+        nights = booked[room_id]
+        for offset in range(max((check_in_date - start).days, 0), min((check_out_date - start).days, days)):
+            nights[offset] = 1
+    return {room_id: [0, *accumulate(nights)] for room_id, nights in booked.items()}
+
+
+def quote(room_ids, ranges, meal_ids=()):
+    """Quote every room in ``room_ids`` for every ``(check_in_date, check_out_date)`` in ``ranges``.
+
+    Returns ``{"quotes": [...]}`` with one cell per room and range, rooms outer,
+    both in the order given (duplicates dropped).
+    Each ``meal_ids`` entry adds a ``meals`` list giving the cell's total with
+    that meal, the way a reservation takes one meal. Ranges must be non-empty
+    and valid (check-out after check-in).
+    """
+    room_ids, ranges, meal_ids = list(dict.fromkeys(room_ids)), list(dict.fromkeys(ranges)), list(dict.fromkeys(meal_ids))
+    timeout = get_timeout()
+    key = _cache_key(room_ids, ranges, meal_ids) if timeout > 0 else None
+    if key is not None:
+        cached = cache.get_cache().get(key)
+        if cached is not None:
+            return cached
+
+    # What is cached is read from the primary, or a lagging replica's answer would outlive the lag.
+    with replicas.primary() if key is not None else nullcontext():
+        result = _quote(room_ids, ranges, meal_ids)
+    if key is not None:
+        cache.get_cache().set(key, result, timeout=timeout)
+    return result
+
+
+def _quote(room_ids, ranges, meal_ids):
+    rooms = Room.objects.in_bulk(room_ids)
+    meals = Meal.objects.in_bulk(meal_ids) if meal_ids else {}
+    start = min(check_in_date for check_in_date, _ in ranges)
+    end = max(check_out_date for _, check_out_date in ranges)
+    booked = _booked(list(rooms), start, end) if rooms else {}
+    rates = pricing.load(list(rooms.values()), start, end) if rooms else None
+
+    cells = []
+    for room_id in room_ids:
+        for check_in_date, check_out_date in ranges:
+            cell = {"room_id": room_id, "check_in_date": check_in_date, "check_out_date": check_out_date}
+            if room_id not in rooms:
+                cell.update(available=False, total_cost=None, error=booking.room_missing(room_id).message)
+            else:
+                first, last = (check_in_date - start).days, (check_out_date - start).days
+                total_cost = rates.total(room_id, check_in_date, check_out_date)
+                cell.update(available=booked[room_id][last] == booked[room_id][first], total_cost=str(total_cost))
+                if meal_ids:
+                    cell["meals"] = [
+                        {"meal_id": meal_id, "total_cost": str(total_cost + meals[meal_id].price)} if meal_id in meals
+                        else {"meal_id": meal_id, "total_cost": None, "error": booking.meal_missing(meal_id).message}
+                        for meal_id in meal_ids
+                    ]
+            cells.append(cell)
+
+    return {"quotes": cells}
@@ -0,0 +1,27 @@
+"""A drop-in ``JSONRenderer`` that encodes with orjson when it is installed.
+
+orjson is optional (``pip install orjson``); without it this renderer is
+DRF's own. Output matches DRF's compact JSON: anything orjson does not encode
+the way DRF would (datetimes, Decimals, lazy strings, ...) is handed to DRF's
+encoder, and indented output (``Accept: application/json; indent=4``) is left
+to DRF entirely.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # DRF writes UTC as "Z" and trims microseconds; let its encoder do datetimes.
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    _default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_default, option=_OPTIONS)
@@ -0,0 +1,103 @@
+"""Sends safe reads to read replicas, and everything else to the primary.
+
+``REPLICA_DATABASES`` names the aliases of read-only copies of ``default``.
+``ReplicaRoutingMiddleware`` picks one of them for each GET, HEAD or OPTIONS
+request, and ``routers.ReadReplicaRouter`` sends that request's reads there.
+Writes always go to the primary, and so does every read made during an unsafe
+request, inside a transaction, or outside a request (commands, the sweeper,
+tests), so a request reads its own writes.
+
+A replica lags the primary, so a client that has just written is pinned to the
+primary for a while: every unsafe request sets the ``REPLICA_PIN_COOKIE``
+cookie for ``REPLICA_PIN_SECONDS``, and a safe request carrying it reads from
+the primary. Set ``REPLICA_PIN_SECONDS`` above the replicas' usual lag.
+"""
+import random
+import sqlite3
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The replica this request reads from, or None for the primary.
+_read_alias = ContextVar('replica_read_alias', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'REPLICA_DATABASES', ())
+
+
+def get_pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def read_alias():
+    """Where a read should go now: a replica alias, or ``None`` for the primary."""
+    alias = _read_alias.get()
+    if alias is not None and connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        # A transaction on the primary must see its own work.
+        return None
+    return alias
+
+
+@contextmanager
+def primary():
+    """Read from the primary for the rest of the block, e.g. right after a write in a GET."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def choose(request):
+    replicas = get_replicas()
+    if not replicas or request.method not in SAFE_METHODS or REPLICA_PIN_COOKIE in request.COOKIES:
+        return None
+    return random.choice(replicas)
+
+
+def pin(request, response):
+    if get_replicas() and request.method not in SAFE_METHODS:
+        response.set_cookie(REPLICA_PIN_COOKIE, '1', max_age=get_pin_seconds(), httponly=True, samesite='Lax')
+    return response
+
+
+def copy_sqlite(source, target):
+    """Copy SQLite database ``source`` over ``target``; SQLite's backup API copes with a source in use."""
+    with closing(sqlite3.connect(source)) as source_db, closing(sqlite3.connect(target)) as target_db:
+        source_db.backup(target_db)
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _read_alias.set(choose(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return pin(request, response)
+
+    async def __acall__(self, request):
+        token = _read_alias.set(choose(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return pin(request, response)
@@ -0,0 +1,212 @@
+"""Daily per-room rollups for the occupancy and revenue reports.
+
+A ``DailyRoomRollup`` row holds one room's sold nights, booked revenue and
+payments for one day, so a report over any date range aggregates at most
+rooms × days small rows instead of expanding every reservation. The writers
+(``booking``, ``imports``, ``ledger``, ``sweeper`` and the reservation views)
+call ``apply`` with *deltas* in the same transaction as the change itself, and
+deleted reservations and payments are taken out by ``post_delete`` receivers
+in ``signals``, cascades included; the ``rebuild_rollups`` command recomputes
+the table from scratch.
+
+Deltas are dicts of ``(room_id, day) -> [nights_sold, revenue, payments]``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import chain
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Round, TruncDate
+from django.utils import timezone
+
+from .models import ArchivedTransaction, DailyRoomRollup, Reservation, Room, Transaction
+
+BATCH_SIZE = 500
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def stay_revenue(total_cost, check_in_date, check_out_date):
+    """``(day, revenue)`` for each night, splitting total_cost evenly; the first night takes the odd cents."""
+    nights = (check_out_date - check_in_date).days
+    if nights < 1:
+        return []
+    total_cost = Decimal(total_cost)
+    share = (total_cost / nights).quantize(CENT, rounding=ROUND_DOWN)
+    first = total_cost - share * (nights - 1)
+    return [(check_in_date + timedelta(days=offset), first if offset == 0 else share) for offset in range(nights)]
+
+
+def _deltas():
+    return defaultdict(lambda: [0, ZERO, ZERO])
+
+
+def reservation_deltas(reservations, sign=1):
+    deltas = _deltas()
+    for reservation in reservations:
+        if reservation.room_id is None or reservation.status == Reservation.Status.EXPIRED:
+            continue
+        for day, revenue in stay_revenue(reservation.total_cost, reservation.check_in_date, reservation.check_out_date):
+            delta = deltas[reservation.room_id, day]
+            delta[0] += sign
+            delta[1] += sign * revenue
+    return deltas
+
+
+def payment_deltas(payments):
+    """``payments`` are ``(room_id, day, amount)`` with amount as a positive sum paid."""
+    deltas = _deltas()
+    for room_id, day, amount in payments:
+        if room_id is not None:
+            deltas[room_id, day][2] += Decimal(amount)
+    return deltas
+
+
+def apply(*deltas):
+    merged = _deltas()
+    for part in deltas:
+        for key, (nights, revenue, payments) in part.items():
+            total = merged[key]
+            total[0] += nights
+            total[1] += revenue
+            total[2] += payments
+    merged = {key: delta for key, delta in merged.items() if any(delta)}
+    if not merged:
+        return
+
+    # Nights of one stay (or of stays at one price) share a delta, so grouping by room and
+    # delta turns a batch into a handful of UPDATEs however many days it touches.
+    groups = defaultdict(list)
+    for (room_id, day), (nights, revenue, payments) in merged.items():
+        groups[room_id, nights, revenue, payments].append(day)
+    # Callers are usually inside their own transaction already; no savepoint needed then.
+    with transaction.atomic(savepoint=False):
+        # Make sure every row exists, then let the database do the arithmetic: concurrent
+        # writers to the same room and day queue on the row lock instead of losing each
+        # other's updates, and nothing is read first.
+        DailyRoomRollup.objects.bulk_create(
+            [DailyRoomRollup(room_id=room_id, day=day) for room_id, day in merged],
+            ignore_conflicts=True, batch_size=BATCH_SIZE,
+        )
+        for (room_id, nights, revenue, payments), days in groups.items():
+            for chunk in (days[i:i + BATCH_SIZE] for i in range(0, len(days), BATCH_SIZE)):
+                DailyRoomRollup.objects.filter(room_id=room_id, day__in=chunk).update(
+                    nights_sold=F('nights_sold') + nights,
+                    revenue=Round(F('revenue') + revenue, 2),
+                    payments=Round(F('payments') + payments, 2),
+                )
+
+
+def record_payments(payments):
+    apply(payment_deltas((room_id, timezone.localdate(), amount) for room_id, amount in payments))
+
+
+def rebuild(chunk_size=5000):
+    """Recompute every rollup row from reservations and payment transactions, archived ones included."""
+    deltas = reservation_deltas(
+        Reservation.objects.filter(room__isnull=False)
+        .only('room_id', 'check_in_date', 'check_out_date', 'total_cost', 'status')
+        .iterator(chunk_size=chunk_size)
+    )
+    paid = (
+        Transaction.objects.filter(transaction_type='payment', reservation__room__isnull=False)
+        .annotate(day=TruncDate('timestamp'))
+        .values_list('reservation__room_id', 'day')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for room_id, day, total in chain(paid, _archived_payments()):
+        # Payments are logged as negative amounts.
+        deltas[room_id, day][2] -= total
+
+    with transaction.atomic():
+        DailyRoomRollup.objects.all().delete()
+        DailyRoomRollup.objects.bulk_create(
+            (
+                DailyRoomRollup(room_id=room_id, day=day, nights_sold=nights, revenue=revenue, payments=payments)
+                for (room_id, day), (nights, revenue, payments) in deltas.items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    return len(deltas)
+
+
+def _archived_payments():
+    """``(room_id, day, total)`` for archived payments; the archive may be in another database, so no join."""
+    by_reservation = defaultdict(list)
+    paid = (
+        ArchivedTransaction.objects.filter(transaction_type='payment', reservation_id__isnull=False)
+        .annotate(day=TruncDate('timestamp'))
+        .values_list('reservation_id', 'day')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for reservation_id, day, total in paid:
+        by_reservation[reservation_id].append((day, total))
+    reservation_ids = list(by_reservation)
+    for offset in range(0, len(reservation_ids), BATCH_SIZE):
+        rooms = Reservation.objects.filter(pk__in=reservation_ids[offset:offset + BATCH_SIZE], room__isnull=False).values_list('pk', 'room_id')
+        for reservation_id, room_id in rooms:
+            for day, total in by_reservation[reservation_id]:
+                yield room_id, day, total
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def _money(value):
+    return str(Decimal(value or 0).quantize(CENT))
+
+
+def _figures(nights_sold, available, revenue, payments):
+    revenue = Decimal(revenue or 0)
+    return {
+        'nights_sold': nights_sold,
+        'nights_available': available,
+        'occupancy': _ratio(nights_sold, available),
+        'revenue': _money(revenue),
+        'adr': _money(revenue / nights_sold) if nights_sold else None,
+        'revpar': _money(revenue / available) if available else None,
+        'payments': _money(payments),
+    }
+
+
+def occupancy_report(start, end, room_ids=None, group_by='room'):
+    """Occupancy, ADR, RevPAR, revenue and payments over ``[start, end)``, per room or per day.
+
+    Every room counts as sellable every night of the range.
+    """
+    days = (end - start).days
+    rows = DailyRoomRollup.objects.filter(day__gte=start, day__lt=end)
+    rooms = Room.objects.order_by('pk')
+    if room_ids:
+        rows = rows.filter(room_id__in=room_ids)
+        rooms = rooms.filter(pk__in=room_ids)
+    room_ids = list(rooms.values_list('pk', flat=True))
+
+    key = 'room_id' if group_by == 'room' else 'day'
+    totals = {
+        row[key]: row for row in
+        rows.values(key).annotate(nights=Sum('nights_sold'), revenue=Sum('revenue'), payments=Sum('payments')).order_by()
+    }
+    if group_by == 'room':
+        groups = [(room_id, days) for room_id in room_ids]
+    else:
+        groups = [(start + timedelta(days=offset), len(room_ids)) for offset in range(days)]
+
+    results = []
+    for group, available in groups:
+        row = totals.get(group, {})
+        results.append({key.removesuffix('_id'): group, **_figures(row.get('nights') or 0, available, row.get('revenue'), row.get('payments'))})
+
+    nights_sold = sum(row['nights'] or 0 for row in totals.values())
+    revenue = sum((row['revenue'] or ZERO for row in totals.values()), ZERO)
+    payments = sum((row['payments'] or ZERO for row in totals.values()), ZERO)
+    return {
+        'from': start, 'to': end, 'group_by': group_by,
+        'totals': _figures(nights_sold, days * len(room_ids), revenue, payments),
+        'results': results,
+    }
@@ -0,0 +1,48 @@
+"""Database routers (``DATABASE_ROUTERS``)."""
+from django.db import DEFAULT_DB_ALIAS
+
+from . import archive, replicas
+
+
+class TransactionArchiveRouter:
+    """Sends ``ArchivedTransaction`` to ``TRANSACTION_ARCHIVE_DATABASE`` and nothing else there."""
+
+    def _is_archive(self, model):
+        return model._meta.label == 'guest_house.ArchivedTransaction'
+
+    def db_for_read(self, model, **hints):
+        return archive.get_database() if self._is_archive(model) else None
+
+    def db_for_write(self, model, **hints):
+        return archive.get_database() if self._is_archive(model) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label != 'guest_house':
+            return None
+        archive_db = archive.get_database()
+        if model_name == 'archivedtransaction':
+            return db == archive_db
+        if archive_db != DEFAULT_DB_ALIAS and db == archive_db:
+            return False
+        return None
+
+
+class ReadReplicaRouter:
+    """Reads go where ``replicas.read_alias()`` says; writes always go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return replicas.read_alias()
+
+    def db_for_write(self, model, **hints):
+        # Explicitly, or Django would write an instance back to the replica it was read from.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replicas.get_replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas copy the primary's schema along with its data.
+        return False if db in replicas.get_replicas() else None
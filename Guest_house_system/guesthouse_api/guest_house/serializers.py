@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import Room, Meal, Guest, Reservation, DebitCard, Transaction
 
@@ -14,12 +16,14 @@ class MealSerializer(serializers.ModelSerializer):
 class GuestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Guest
-        fields = '__all__'
+        exclude = ('name_search', 'email_search')
 
 class DebitCardSerializer(serializers.ModelSerializer):
     class Meta:
         model = DebitCard
         fields = '__all__'
+        # Balances only move through deposits and payments, so the transaction log can explain them.
+        read_only_fields = ('balance',)
 
     def to_representation(self, instance):
         serialized_data = super(DebitCardSerializer, self).to_representation(instance)
@@ -33,9 +37,23 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ('timestamp',)
 
 class ReservationSerializer(serializers.ModelSerializer):
+    # Related objects that ?expand= may inline in place of their ids.
+    EXPANDABLE = {
+        'guest': GuestSerializer,
+        'room': RoomSerializer,
+        'meal': MealSerializer,
+    }
+
     class Meta:
         model = Reservation
         fields = '__all__'
+        # Status is moved by payments and the sweeper only; total_cost is priced by booking.
+        read_only_fields = ('status', 'created_at', 'total_cost')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.context.get('expand', ()):
+            self.fields[name] = self.EXPANDABLE[name](read_only=True)
 
 class ReservationCreateSerializer(serializers.Serializer):
     guest_name = serializers.CharField(max_length=100)
@@ -45,11 +63,21 @@ class ReservationCreateSerializer(serializers.Serializer):
     check_in_date = serializers.DateField()
     check_out_date = serializers.DateField()
 
+class RoomHoldSerializer(serializers.Serializer):
+    room_id = serializers.IntegerField()
+    check_in_date = serializers.DateField()
+    check_out_date = serializers.DateField()
+
+class HoldConfirmSerializer(serializers.Serializer):
+    guest_name = serializers.CharField(max_length=100)
+    guest_email = serializers.EmailField()
+    meal_id = serializers.IntegerField(required=False, allow_null=True)
+
 class PaymentSerializer(serializers.Serializer):
     card_number = serializers.CharField(max_length=20)
-    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
     reservation_id = serializers.IntegerField()
 
 class DepositSerializer(serializers.Serializer):
     card_number = serializers.CharField(max_length=20)
-    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
\ No newline at end of file
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
\ No newline at end of file
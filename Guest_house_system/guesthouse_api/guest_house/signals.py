@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, pricing, rollups, sweeper
+from .models import Meal, Reservation, Room, Transaction
+
+
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=Meal)
+def invalidate_catalog(sender, **kwargs):
+    cache.invalidate_on_commit(sender)
+
+
+@receiver(pre_save, sender=Room)
+def note_price_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Only the base price feeds the calendar; renames and availability flips leave it alone.
+    if raw or (update_fields is not None and 'price_per_night' not in update_fields):
+        instance._price_changed = False
+    elif instance.pk is None:
+        instance._price_changed = True
+    else:
+        stored = Room.objects.filter(pk=instance.pk).values_list('price_per_night', flat=True).first()
+        instance._price_changed = stored != sender._meta.get_field('price_per_night').to_python(instance.price_per_night)
+
+
+@receiver(post_save, sender=Room)
+def regenerate_rate_calendar(sender, instance, raw=False, **kwargs):
+    # After commit, so the room's write transaction stays short; until then its nights
+    # are priced from the rules. Fixtures load rooms before their rules, so they are left
+    # to rebuild_rate_calendar.
+    if not raw and getattr(instance, '_price_changed', True):
+        transaction.on_commit(lambda: pricing.regenerate([instance]))
+
+
+# Deletes are the one change the rollups learn about from signals rather than from the writer:
+# a reservation or payment can go in a cascade (a guest or card deleted) that no writer sees.
+# Having receivers also makes Django fetch the cascaded rows instead of fast-deleting them.
+@receiver(post_delete, sender=Reservation)
+def remove_reservation_rollups(sender, instance, **kwargs):
+    rollups.apply(rollups.reservation_deltas([instance], sign=-1))
+    sweeper.release_rooms([instance.room_id], timezone.localdate())
+
+
+# Set while transactions are moved to the archive rather than deleted.
+_archiving = ContextVar('guest_house_archiving', default=False)
+
+
+@contextmanager
+def archiving():
+    """Deletes of transactions inside the block are moves: their payments stay in the rollups."""
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_payment_rollups(sender, instance, **kwargs):
+    if _archiving.get() or instance.transaction_type != 'payment' or instance.reservation_id is None:
+        return
+    room_id = Reservation.objects.filter(pk=instance.reservation_id).values_list('room_id', flat=True).first()
+    # Payments are logged as negative amounts, so this takes the payment back out.
+    rollups.apply(rollups.payment_deltas([(room_id, timezone.localdate(instance.timestamp), instance.amount)]))
@@ -0,0 +1,112 @@
+"""Expires unpaid holds, checks out finished stays and gives rooms back to inventory.
+
+``Room.is_available`` is what the catalog shows; bookings are decided by date
+overlap alone and never read it. Booking clears the flag, and ``release_rooms``
+sets it again once no pending or confirmed stay on the room ends after today:
+here for the rooms of swept reservations, and from ``booking.amend`` and the
+delete receiver in ``signals`` for a room a reservation leaves. Other rooms are
+left alone, so a room taken out of inventory by hand stays out.
+
+A sweep works in batches of primary keys read from the ``(status, created_at)``
+and ``(status, check_out_date)`` indexes, so each batch is a short transaction
+and memory stays flat however many reservations are due. The batch's rooms
+are released in the same transaction with one set-based UPDATE.
+
+Several sweepers may run at once. Batches are claimed with
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the backend has it, so nodes take
+disjoint rows. SQLite serializes writers anyway; run several sweepers there
+under the ``sqlite-tuned`` profile, whose IMMEDIATE transactions wait for the
+write lock instead of failing with "database is locked". Every status change is
+guarded by the status it expects, and an expiry batch that does not find all
+of its rows still pending is rolled back and re-read, so no hold's revenue is
+taken off the rollups twice.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import cache, rollups
+from .models import Reservation, Room
+
+BATCH_SIZE = 1000
+
+SweepResult = namedtuple('SweepResult', 'expired checked_out rooms_released')
+BatchResult = namedtuple('BatchResult', 'reservations rooms_released')
+
+
+class _Conflict(Exception):
+    # Another sweeper changed part of the batch first.
+    pass
+
+
+def get_hold_seconds():
+    return getattr(settings, 'RESERVATION_HOLD_SECONDS', 30 * 60)
+
+
+def _claim(queryset, fields, batch_size):
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    return list(queryset.select_for_update(skip_locked=skip_locked).only(*fields)[:batch_size])
+
+
+def release_rooms(room_ids, today):
+    """Make these rooms available again if nothing active is booked on them past ``today``."""
+    room_ids = {room_id for room_id in room_ids if room_id is not None}
+    if not room_ids:
+        return 0
+    booked = Reservation.objects.filter(room=OuterRef('pk'), status__in=Reservation.ACTIVE, check_out_date__gt=today)
+    released = Room.objects.filter(pk__in=room_ids, is_available=False).exclude(Exists(booked)).update(is_available=True)
+    if released:
+        # Queryset updates skip post_save, so the catalog cache is told directly.
+        cache.invalidate_on_commit(Room)
+    return released
+
+
+def expire_unpaid_batch(now, batch_size=BATCH_SIZE):
+    """Expire one batch of pending holds older than the hold period."""
+    deadline = now - timedelta(seconds=get_hold_seconds())
+    while True:
+        try:
+            with transaction.atomic():
+                due = Reservation.objects.filter(status=Reservation.Status.PENDING, created_at__lt=deadline)
+                batch = _claim(due, ('room_id', 'check_in_date', 'check_out_date', 'total_cost', 'status'), batch_size)
+                if not batch:
+                    return BatchResult(0, 0)
+                expired = Reservation.objects.filter(pk__in=[reservation.pk for reservation in batch], status=Reservation.Status.PENDING)
+                if expired.update(status=Reservation.Status.EXPIRED) != len(batch):
+                    raise _Conflict
+                rollups.apply(rollups.reservation_deltas(batch, sign=-1))
+                released = release_rooms((reservation.room_id for reservation in batch), timezone.localdate(now))
+            return BatchResult(len(batch), released)
+        except _Conflict:
+            continue
+
+
+def check_out_batch(today, batch_size=BATCH_SIZE):
+    """Mark one batch of active stays ending on or before ``today`` as checked out."""
+    with transaction.atomic():
+        due = Reservation.objects.filter(status__in=Reservation.ACTIVE, check_out_date__lte=today)
+        batch = _claim(due, ('room_id',), batch_size)
+        if not batch:
+            return BatchResult(0, 0)
+        # Checking out twice is harmless, so no conflict handling is needed here.
+        Reservation.objects.filter(pk__in=[reservation.pk for reservation in batch], status__in=Reservation.ACTIVE).update(status=Reservation.Status.CHECKED_OUT)
+        released = release_rooms((reservation.room_id for reservation in batch), today)
+    return BatchResult(len(batch), released)
+
+
+def sweep(now=None, batch_size=BATCH_SIZE):
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    expired = checked_out = released = 0
+    # Expiry first, so an unpaid stay that is also over is expired rather than checked out.
+    while (batch := expire_unpaid_batch(now, batch_size)).reservations:
+        expired += batch.reservations
+        released += batch.rooms_released
+    while (batch := check_out_batch(today, batch_size)).reservations:
+        checked_out += batch.reservations
+        released += batch.rooms_released
+    return SweepResult(expired, checked_out, released)
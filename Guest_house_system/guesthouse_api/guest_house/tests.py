@@ -1,8 +1,40 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.db.models import QuerySet, Sum
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
-from .models import Room, Meal, Guest, Reservation, DebitCard, Transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+from . import archive, booking, cache as catalog_cache, exports, holds, idempotency, instrumentation, ledger, pricing, replicas, rollups, sweeper, throttling
+from .pagination import EstimatedCountPaginator
+from .renderers import FastJSONRenderer
+from .models import Room, Meal, Guest, Reservation, DebitCard, Transaction, ArchivedTransaction, BalanceCheckpoint, DailyRoomRollup, IdempotencyKey, NightlyRate, RateRule, RoomHold
+
+# The whole suite comes from one client address, so the write throttles are off except
+# where ThrottlingTests turns them on.
+_throttling_off = override_settings(THROTTLING_ENABLED=False)
+
+def setUpModule():
+    _throttling_off.enable()
+
+def tearDownModule():
+    _throttling_off.disable()
 
 class GuestModelTest(TestCase):
     def test_create_guest(self):
@@ -14,13 +46,11 @@ class GuestModelTest(TestCase):
 
 class RoomModelTest(TestCase):
     def test_create_room(self):
-        room = Room.objects.create(number='101', type='single', capacity=1, price_per_night=50.00)
-        self.assertEqual(room.number, '101')
-        self.assertEqual(room.type, 'single')
-        self.assertEqual(room.capacity, 1)
+        room = Room.objects.create(name="Room 101", price_per_night=50.00)
+        self.assertEqual(room.name, "Room 101")
         self.assertEqual(room.price_per_night, 50.00)
         self.assertTrue(room.is_available)
-        self.assertEqual(str(room), "Room 101 (Single)")
+        self.assertEqual(str(room), "Room 101")
 
 class MealModelTest(TestCase):
     def test_create_meal(self):
@@ -31,15 +61,15 @@ class MealModelTest(TestCase):
 
 class DebitCardModelTest(TestCase):
     def test_create_debit_card(self):
-        card = DebitCard.objects.create(card_number="1234567890123456", cardholder_name="Jane Doe", expiry_date="2026-12-31", cvv="789", balance=100.00)
+        card = DebitCard.objects.create(card_number="1234567890123456", cvc="789", balance=100.00)
         self.assertEqual(card.card_number, "1234567890123456")
-        self.assertEqual(card.cardholder_name, "Jane Doe")
-        self.assertEqual(str(card), "Card ending in 3456 (Jane Doe)")
+        self.assertEqual(card.balance, 100.00)
+        self.assertEqual(str(card), "Card: ****-****-****-3456")
 
 class ReservationAPITests(APITestCase):
     def setUp(self):
         self.guest = Guest.objects.create(name="Test Guest", email="test@example.com")
-        self.room_single = Room.objects.create(number="101", type="single", capacity=1, price_per_night=50.00, is_available=True)
+        self.room_single = Room.objects.create(name="Room 101", price_per_night=50.00, is_available=True)
         self.meal_breakfast = Meal.objects.create(name="Breakfast", price=10.00)
 
     def test_create_reservation_room_only(self):
@@ -66,6 +96,8 @@ class ReservationAPITests(APITestCase):
             'guest_name': 'Another Guest',
             'guest_email': 'another.guest@example.com',
             'meal_id': self.meal_breakfast.id,
+            'check_in_date': '2025-04-28',
+            'check_out_date': '2025-04-29'
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -86,88 +118,1381 @@ class ReservationAPITests(APITestCase):
 class PaymentAPITests(APITestCase):
     def setUp(self):
         self.guest = Guest.objects.create(name="Payment Guest", email="payment@example.com")
-        self.room = Room.objects.create(number="201", type="double", capacity=2, price_per_night=100.00, is_available=True)
+        self.room = Room.objects.create(name="Room 201", price_per_night=100.00, is_available=True)
         self.reservation = Reservation.objects.create(guest=self.guest, room=self.room, check_in_date="2025-04-25", check_out_date="2025-04-27", total_cost=200.00)
-        self.debit_card_sufficient = DebitCard.objects.create(card_number="1111222233334444", cardholder_name="Rich Guy", expiry_date="2026-12-31", cvv="111", balance=500.00)
-        self.debit_card_insufficient = DebitCard.objects.create(card_number="5555666677778888", cardholder_name="Poor Guy", expiry_date="2026-12-31", cvv="222", balance=50.00)
+        self.debit_card_sufficient = DebitCard.objects.create(card_number="1111222233334444", balance=500.00)
+        self.debit_card_insufficient = DebitCard.objects.create(card_number="5555666677778888", balance=50.00)
         self.payment_url = reverse('process-payment')
 
     def test_successful_payment(self):
         data = {
             'reservation_id': self.reservation.id,
             'card_number': self.debit_card_sufficient.card_number,
-            'expiry_date': '2026-12-31',
-            'cvv': '111'
+            'amount': '200.00'
         }
         response = self.client.post(self.payment_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(Reservation.objects.get(id=self.reservation.id).payment_status, 'paid')
         self.assertEqual(DebitCard.objects.get(id=self.debit_card_sufficient.id).balance, 300.00)
         self.assertEqual(Transaction.objects.count(), 1)
-        self.assertEqual(Transaction.objects.get().status, 'success')
-        self.assertEqual(Transaction.objects.get().transaction_type, 'withdrawal')
-        self.assertEqual(float(Transaction.objects.get().amount), 200.00)
+        transaction = Transaction.objects.get()
+        self.assertEqual(transaction.transaction_type, 'payment')
+        self.assertEqual(transaction.amount, Decimal('-200.00'))
+        self.assertEqual(transaction.reservation, self.reservation)
 
     def test_payment_insufficient_funds(self):
         data = {
             'reservation_id': self.reservation.id,
             'card_number': self.debit_card_insufficient.card_number,
-            'expiry_date': '2026-12-31',
-            'cvv': '222'
+            'amount': '200.00'
         }
         response = self.client.post(self.payment_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(Reservation.objects.get(id=self.reservation.id).payment_status, 'failed')
+        self.assertEqual(response.data['error'], ledger.InsufficientFunds.message)
         self.assertEqual(DebitCard.objects.get(id=self.debit_card_insufficient.id).balance, 50.00)
-        self.assertEqual(Transaction.objects.count(), 1)
-        self.assertEqual(Transaction.objects.get().status, 'failed')
-        self.assertEqual(Transaction.objects.get().transaction_type, 'withdrawal')
-        self.assertEqual(float(Transaction.objects.get().amount), 200.00)
+        self.assertEqual(Transaction.objects.count(), 0)
 
     def test_payment_invalid_card(self):
         data = {
             'reservation_id': self.reservation.id,
             'card_number': '9999999999999999',  # Non-existent card
-            'expiry_date': '2027-01-01',
-            'cvv': '333'
+            'amount': '200.00'
         }
         response = self.client.post(self.payment_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(Reservation.objects.get(id=self.reservation.id).payment_status, 'failed')
-        self.assertEqual(Transaction.objects.count(), 1)
-        self.assertEqual(Transaction.objects.get().status, 'failed')
-        self.assertIsNone(Transaction.objects.get().card)
+        self.assertEqual(response.data['error'], ledger.InvalidCard.message)
+        self.assertEqual(Transaction.objects.count(), 0)
 
     def test_payment_invalid_reservation(self):
         invalid_reservation_id = 999
         data = {
             'reservation_id': invalid_reservation_id,
             'card_number': self.debit_card_sufficient.card_number,
-            'expiry_date': '2026-12-31',
-            'cvv': '111'
+            'amount': '200.00'
         }
         response = self.client.post(self.payment_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(Transaction.objects.count(), 0) # No transaction should be created
+        self.assertEqual(DebitCard.objects.get(id=self.debit_card_sufficient.id).balance, 500.00)
 
 class TransactionAPITests(APITestCase):
     def setUp(self):
         self.guest = Guest.objects.create(name="Transaction Guest", email="transaction@example.com")
-        self.room = Room.objects.create(number="401", type="single", capacity=1, price_per_night=60.00)
-        self.reservation = Reservation.objects.create(guest=self.guest, room=self.room, check_in_date="2025-05-01", check_out_date="2025-05-02", total_cost=60.00, payment_status='paid')
-        self.debit_card = DebitCard.objects.create(card_number="1234000056780000", cardholder_name="Bill Gates", expiry_date="2027-06-30", cvv="456", balance=1000.00)
-        self.transaction = Transaction.objects.create(card=self.debit_card, reservation=self.reservation, amount=60.00, transaction_type='withdrawal', status='success')
+        self.room = Room.objects.create(name="Room 401", price_per_night=60.00)
+        self.reservation = Reservation.objects.create(guest=self.guest, room=self.room, check_in_date="2025-05-01", check_out_date="2025-05-02", total_cost=60.00)
+        self.debit_card = DebitCard.objects.create(card_number="1234000056780000", balance=1000.00)
+        self.transaction = Transaction.objects.create(debit_card=self.debit_card, reservation=self.reservation, amount=-60.00, transaction_type='payment')
         self.list_url = reverse('transaction-list')
         self.detail_url = reverse('transaction-detail', kwargs={'pk': self.transaction.id})
 
     def test_get_transaction_list(self):
         response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['amount'], '60.00')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['amount'], '-60.00')
 
     def test_get_transaction_detail(self):
         response = self.client.get(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['amount'], '60.00')
-        self.assertEqual(response.data['transaction_type'], 'withdrawal')
\ No newline at end of file
+        self.assertEqual(response.data['amount'], '-60.00')
+        self.assertEqual(response.data['transaction_type'], 'payment')
+
+class RoomAvailabilityAPITests(APITestCase):
+    def setUp(self):
+        self.guest = Guest.objects.create(name="Availability Guest", email="availability@example.com")
+        self.booked_room = Room.objects.create(name="Booked", price_per_night=80.00)
+        self.free_room = Room.objects.create(name="Free", price_per_night=60.00)
+        Reservation.objects.create(guest=self.guest, room=self.booked_room, check_in_date="2025-06-10", check_out_date="2025-06-12", total_cost=160.00)
+        self.url = reverse('room-availability')
+
+    def test_overlapping_reservation_excludes_room(self):
+        response = self.client.get(self.url, {'from': '2025-06-11', 'to': '2025-06-13'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([room['id'] for room in response.data], [self.free_room.id])
+
+    def test_back_to_back_stays_do_not_overlap(self):
+        response = self.client.get(self.url, {'from': '2025-06-12', 'to': '2025-06-14'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([room['id'] for room in response.data], [self.booked_room.id, self.free_room.id])
+
+    def test_availability_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'from': '2025-06-01', 'to': '2025-06-30'})
+
+    def test_invalid_range(self):
+        response = self.client.get(self.url, {'from': '2025-06-12', 'to': '2025-06-12'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'from': 'tomorrow'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_rejects_overlapping_stay(self):
+        data = {
+            'guest_name': 'Late Guest',
+            'guest_email': 'late@example.com',
+            'room_id': self.booked_room.id,
+            'check_in_date': '2025-06-11',
+            'check_out_date': '2025-06-14'
+        }
+        response = self.client.post(reverse('reservation-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_create_stores_stay_dates(self):
+        data = {
+            'guest_name': 'Next Guest',
+            'guest_email': 'next@example.com',
+            'room_id': self.booked_room.id,
+            'check_in_date': '2025-06-12',
+            'check_out_date': '2025-06-14'
+        }
+        response = self.client.post(reverse('reservation-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reservation = Reservation.objects.get(pk=response.data['reservation_id'])
+        self.assertEqual(str(reservation.check_in_date), '2025-06-12')
+        self.assertEqual(reservation.total_cost, Decimal('160.00'))
+
+class LedgerAPITests(APITestCase):
+    def setUp(self):
+        self.guest = Guest.objects.create(name="Ledger Guest", email="ledger@example.com")
+        self.reservation = Reservation.objects.create(guest=self.guest, check_in_date="2025-07-01", check_out_date="2025-07-02", total_cost=0.30)
+        self.card = DebitCard.objects.create(card_number="4000000000000001", balance="0.30")
+
+    def test_payments_use_exact_decimal_arithmetic(self):
+        for _ in range(3):
+            response = self.client.post(reverse('process-payment'), {'card_number': self.card.card_number, 'amount': '0.10', 'reservation_id': self.reservation.id}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('0.00'))
+        self.assertEqual(Transaction.objects.filter(transaction_type='payment').count(), 3)
+
+    def test_insufficient_funds_leaves_balance_untouched(self):
+        response = self.client.post(reverse('process-payment'), {'card_number': self.card.card_number, 'amount': '0.31', 'reservation_id': self.reservation.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Insufficient funds.")
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('0.30'))
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_unknown_card(self):
+        response = self.client.post(reverse('deposit-funds'), {'card_number': '9999', 'amount': '5.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Invalid card number.")
+
+    def test_non_positive_amounts_are_rejected(self):
+        response = self.client.post(reverse('deposit-funds'), {'card_number': self.card.card_number, 'amount': '-5.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('0.30'))
+
+    def test_deposit(self):
+        response = self.client.post(reverse('deposit-funds'), {'card_number': self.card.card_number, 'amount': '10.05'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('10.35'))
+        self.assertEqual(Transaction.objects.get().amount, Decimal('10.05'))
+
+class BatchPaymentAPITests(APITestCase):
+    def setUp(self):
+        self.guest = Guest.objects.create(name="Batch Guest", email="batch@example.com")
+        self.reservation = Reservation.objects.create(guest=self.guest, check_in_date="2025-07-01", check_out_date="2025-07-02", total_cost=10.00)
+        self.card = DebitCard.objects.create(card_number="4000000000000002", balance="25.00")
+        self.other_card = DebitCard.objects.create(card_number="4000000000000003", balance="5.00")
+        self.url = reverse('process-payment-batch')
+
+    def payment(self, card_number, amount, reservation_id=None):
+        return {'card_number': card_number, 'amount': amount, 'reservation_id': reservation_id or self.reservation.id}
+
+    def test_partial_failure_is_reported_per_item(self):
+        data = [
+            self.payment(self.card.card_number, '10.00'),
+            self.payment(self.card.card_number, '10.00'),
+            self.payment(self.card.card_number, '10.00'),  # only 5.00 left
+            self.payment(self.other_card.card_number, '5.00'),
+            self.payment('0000', '1.00'),
+            self.payment(self.other_card.card_number, '1.00', reservation_id=999),
+        ]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['succeeded'], 3)
+        self.assertEqual(response.data['failed'], 3)
+        self.assertEqual([result['status'] for result in response.data['results']], ['success', 'success', 'failed', 'success', 'failed', 'failed'])
+        self.assertEqual(response.data['results'][2]['error'], "Insufficient funds.")
+        self.assertEqual(response.data['results'][4]['error'], "Invalid card number.")
+        self.assertEqual(response.data['results'][5]['error'], "Invalid reservation.")
+        self.card.refresh_from_db()
+        self.other_card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('5.00'))
+        self.assertEqual(self.other_card.balance, Decimal('0.00'))
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        data = [self.payment(self.card.card_number, '0.01') for _ in range(150)]
+        # Savepoint, cards, reservations, balance update, transaction insert, confirming the
+        # pending reservation, release.
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.data['succeeded'], 150)
+
+    def test_invalid_payload(self):
+        response = self.client.post(self.url, [{'card_number': self.card.card_number}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ReservationImportAPITests(APITestCase):
+    def setUp(self):
+        self.existing_guest = Guest.objects.create(name="Returning Guest", email="returning@example.com")
+        self.room = Room.objects.create(name="Import Room", price_per_night=40.00)
+        self.meal = Meal.objects.create(name="Import Meal", price=7.50)
+        Reservation.objects.create(guest=self.existing_guest, room=self.room, check_in_date="2025-08-01", check_out_date="2025-08-03", total_cost=80.00)
+        self.url = reverse('reservation-import')
+
+    def row(self, email, check_in, check_out, **extra):
+        return {'guest_name': email.split('@')[0], 'guest_email': email, 'room_id': self.room.id, 'check_in_date': check_in, 'check_out_date': check_out, **extra}
+
+    def test_import_validates_against_existing_and_earlier_rows(self):
+        data = [
+            self.row('returning@example.com', '2025-08-03', '2025-08-05', meal_id=self.meal.id),
+            self.row('clash-existing@example.com', '2025-08-02', '2025-08-04'),
+            self.row('clash-batch@example.com', '2025-08-04', '2025-08-06'),
+            self.row('new@example.com', '2025-08-05', '2025-08-06'),
+            self.row('bad-dates@example.com', '2025-08-10', '2025-08-10'),
+            {'guest_email': 'not-an-email'},
+        ]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'failed', 'failed', 'created', 'failed', 'failed'])
+        self.assertEqual(response.data['created'], 2)
+        self.assertIn('guest_email', response.data['results'][5]['errors'])
+
+        first = Reservation.objects.get(pk=response.data['results'][0]['reservation_id'])
+        self.assertEqual(first.guest, self.existing_guest)
+        self.assertEqual(first.total_cost, Decimal('87.50'))
+        self.assertTrue(Guest.objects.filter(email='new@example.com').exists())
+        self.assertFalse(Guest.objects.filter(email='clash-existing@example.com').exists())
+
+    def test_query_count_is_per_chunk_not_per_row(self):
+        data = [self.row(f'guest{i}@example.com', f'2025-09-{i + 1:02d}', f'2025-09-{i + 2:02d}') for i in range(20)]
+        # Rooms, savepoint, room lock, booked nights, rate calendar, rate rules, guest insert,
+        # guest fetch, reservation insert, rollup insert, rollup update (one per room and price),
+        # room update, release.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(len(queries), 13)
+        self.assertEqual(response.data['created'], 20)
+        # The rooms are locked before their booked nights are read.
+        self.assertTrue(queries[2]['sql'].startswith('UPDATE "guest_house_room"'))
+
+    def test_rejects_non_list_payload(self):
+        response = self.client.post(self.url, {'guest_email': 'a@example.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TransactionHistoryAPITests(APITestCase):
+    def setUp(self):
+        self.card = DebitCard.objects.create(card_number="4000000000000004", balance=100.00)
+        self.other_card = DebitCard.objects.create(card_number="4000000000000005", balance=100.00)
+        for i in range(5):
+            Transaction.objects.create(debit_card=self.card, amount=10 + i, transaction_type='deposit')
+        Transaction.objects.create(debit_card=self.card, amount=-5, transaction_type='payment')
+        Transaction.objects.create(debit_card=self.other_card, amount=20, transaction_type='deposit')
+        self.url = reverse('transaction-list')
+
+    def test_pages_follow_the_cursor_without_gaps(self):
+        seen = []
+        response = self.client.get(self.url, {'page_size': 3})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, list(Transaction.objects.order_by('-timestamp', '-id').values_list('id', flat=True)))
+
+    def test_filters(self):
+        response = self.client.get(self.url, {'debit_card': self.card.id, 'transaction_type': 'deposit'})
+        self.assertEqual(len(response.data['results']), 5)
+        response = self.client.get(self.url, {'debit_card': self.other_card.id})
+        self.assertEqual([row['amount'] for row in response.data['results']], ['20.00'])
+        response = self.client.get(self.url, {'debit_card': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class BalanceCheckpointTests(TestCase):
+    def setUp(self):
+        self.card = DebitCard.objects.create(card_number="4000000000000006")
+        ledger.credit(self.card.card_number, '100.00')
+        ledger.debit(self.card.card_number, '30.25')
+
+    def test_ledger_balance_is_checkpoint_plus_deltas(self):
+        self.assertEqual(ledger.ledger_balance(self.card.id), Decimal('69.75'))
+        call_command('verify_balances', '--checkpoint', stdout=StringIO())
+        checkpoint = BalanceCheckpoint.objects.get(debit_card=self.card)
+        self.assertEqual(checkpoint.balance, Decimal('69.75'))
+        self.assertEqual(checkpoint.last_transaction_id, Transaction.objects.latest('pk').pk)
+
+        ledger.credit(self.card.card_number, '0.25')
+        self.assertEqual(ledger.ledger_balance(self.card.id), Decimal('70.00'))
+        # Only the transactions after the checkpoint are summed.
+        with self.assertNumQueries(2):
+            ledger.ledger_balance(self.card.id)
+
+    def test_checkpoint_is_not_repeated_without_new_transactions(self):
+        call_command('verify_balances', '--checkpoint', stdout=StringIO())
+        call_command('verify_balances', '--checkpoint', stdout=StringIO())
+        self.assertEqual(BalanceCheckpoint.objects.count(), 1)
+
+    def test_verify_reports_drift(self):
+        out = StringIO()
+        call_command('verify_balances', stdout=out)
+        self.assertIn("1 cards, 0 mismatched", out.getvalue())
+
+        DebitCard.objects.filter(pk=self.card.pk).update(balance=Decimal('80.00'))
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_balances', stdout=StringIO(), stderr=err)
+        self.assertIn("stored balance 80.00, log says 69.75", err.getvalue())
+
+    def test_verify_checks_intermediate_checkpoints(self):
+        BalanceCheckpoint.objects.create(debit_card=self.card, balance=0, last_transaction_id=0)
+        BalanceCheckpoint.objects.create(debit_card=self.card, balance=Decimal('99.00'), last_transaction_id=Transaction.objects.earliest('pk').pk)
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_balances', stdout=StringIO(), stderr=err)
+        self.assertIn("says 99.00, log says 100.00", err.getvalue())
+
+class CatalogCacheAPITests(APITestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        catalog_cache.reset_stats()
+        self.room = Room.objects.create(name="Cached Room", price_per_night=70.00)
+        self.meal = Meal.objects.create(name="Cached Meal", price=9.00)
+
+    def test_second_read_is_served_from_cache(self):
+        url = reverse('room-list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['name'], "Cached Room")
+        self.assertEqual(catalog_cache.stats(), {'guest_house.room.misses': 1, 'guest_house.room.hits': 1})
+
+    def test_save_and_delete_invalidate(self):
+        detail = reverse('meal-detail', kwargs={'pk': self.meal.id})
+        self.client.get(detail)
+        self.meal.price = 11.00
+        self.meal.save()
+        self.assertEqual(self.client.get(detail).json()['price'], '11.00')
+
+        self.client.get(reverse('room-list'))
+        self.room.delete()
+        self.assertEqual(self.client.get(reverse('room-list')).json(), [])
+
+    def test_if_none_match_returns_304(self):
+        url = reverse('room-detail', kwargs={'pk': self.room.id})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_indented_and_compact_responses_are_cached_apart(self):
+        url = reverse('room-list')
+        compact = self.client.get(url).content
+        indented = self.client.get(url, HTTP_ACCEPT='application/json; indent=4').content
+        self.assertIn(b'\n    ', indented)
+        self.assertEqual(self.client.get(url).content, compact)
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/json; indent=4').content, indented)
+
+    def test_stats_endpoint(self):
+        self.client.get(reverse('meal-list'))
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.data, {'guest_house.meal.misses': 1})
+
+class ReservationExpandAPITests(APITestCase):
+    def setUp(self):
+        self.meal = Meal.objects.create(name="Expand Meal", price=12.00)
+        for i in range(5):
+            guest = Guest.objects.create(name=f"Expand Guest {i}", email=f"expand{i}@example.com")
+            room = Room.objects.create(name=f"Expand Room {i}", price_per_night=50.00)
+            Reservation.objects.create(guest=guest, room=room, meal=self.meal if i % 2 else None, check_in_date="2025-10-01", check_out_date="2025-10-02", total_cost=50.00)
+        self.list_url = reverse('reservation-list')
+
+    def test_ids_by_default(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+        self.assertIsInstance(response.data[0]['guest'], int)
+
+    def test_expanded_list_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, {'expand': 'guest,room,meal'})
+        self.assertEqual(len(response.data), 5)
+        first, second = response.data[0], response.data[1]
+        self.assertEqual(first['guest']['email'], 'expand0@example.com')
+        self.assertEqual(first['room']['name'], 'Expand Room 0')
+        self.assertIsNone(first['meal'])
+        self.assertEqual(second['meal']['name'], 'Expand Meal')
+
+    def test_expanded_detail_is_a_single_query(self):
+        reservation = Reservation.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('reservation-detail', kwargs={'pk': reservation.id}), {'expand': 'guest'})
+        self.assertEqual(response.data['guest']['id'], reservation.guest_id)
+        self.assertIsInstance(response.data['room'], int)
+
+    def test_unknown_expansion(self):
+        response = self.client.get(self.list_url, {'expand': 'guest,debit_card'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class AsyncEndpointTests(TestCase):
+    def setUp(self):
+        self.card = DebitCard.objects.create(card_number="4000000000000007")
+        self.room = Room.objects.create(name="Async Room", price_per_night=45.00)
+
+    async def test_deposit_then_payment(self):
+        response = await self.async_client.post(reverse('async-deposit-funds'), {'card_number': self.card.card_number, 'amount': '50.00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": "Deposit of 50.00 successful."})
+
+        guest = await Guest.objects.acreate(name="Async Guest", email="async@example.com")
+        reservation = await Reservation.objects.acreate(guest=guest, check_in_date="2025-11-01", check_out_date="2025-11-02", total_cost=45.00)
+        response = await self.async_client.post(reverse('async-process-payment'), {'card_number': self.card.card_number, 'amount': '45.00', 'reservation_id': reservation.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.post(reverse('async-process-payment'), {'card_number': self.card.card_number, 'amount': '45.00', 'reservation_id': reservation.id}, content_type='application/json')
+        self.assertEqual(response.json(), {"error": "Insufficient funds."})
+        await self.card.arefresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('5.00'))
+
+    async def test_create_reservation(self):
+        data = {'guest_name': 'Async Guest', 'guest_email': 'async@example.com', 'room_id': self.room.id, 'check_in_date': '2025-11-01', 'check_out_date': '2025-11-03'}
+        response = await self.async_client.post(reverse('async-reservation-create'), data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        reservation = await Reservation.objects.aget(pk=response.json()['reservation_id'])
+        self.assertEqual(reservation.total_cost, Decimal('90.00'))
+
+        response = await self.async_client.post(reverse('async-reservation-create'), data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("not available for those dates", response.json()['error'])
+
+    async def test_validation_and_method(self):
+        response = await self.async_client.post(reverse('async-deposit-funds'), {'card_number': self.card.card_number}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.json())
+        response = await self.async_client.get(reverse('async-deposit-funds'))
+        self.assertEqual(response.status_code, 405)
+
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        instrumentation.reset_stats()
+        self.card = DebitCard.objects.create(card_number="4000000000000090", balance=10.00)
+        for i in range(3):
+            Transaction.objects.create(debit_card=self.card, amount=1, transaction_type='deposit')
+
+    def test_header_and_metrics(self):
+        response = self.client.get(reverse('transaction-list'))
+        timing = dict(part.strip().split(';', 1) for part in response['Server-Timing'].split(','))
+        self.assertEqual(set(timing), {'db', 'serialize', 'view', 'total'})
+        self.assertIn('desc="1 queries"', timing['db'])
+
+        self.client.get(reverse('transaction-list'))
+        stats = self.client.get(reverse('metrics')).data['routes']['transaction-list']
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['mean_queries'], 1)
+        self.assertGreater(stats['mean_serialize_ms'], 0)
+
+    def test_async_view_queries_are_counted(self):
+        response = self.client.post(reverse('async-deposit-funds'), {'card_number': self.card.card_number, 'amount': '5.00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        # Card lookup, then the guarded update and the log insert inside a savepoint.
+        self.assertIn('desc="5 queries"', response['Server-Timing'])
+        self.assertEqual(instrumentation.route_stats()['async-deposit-funds']['mean_queries'], 5)
+
+class OccupancyReportAPITests(APITestCase):
+    def setUp(self):
+        self.room = Room.objects.create(name="Room 1", price_per_night=100.00)
+        self.other_room = Room.objects.create(name="Room 2", price_per_night=60.00)
+        self.card = DebitCard.objects.create(card_number="4000000000000100", balance=1000.00)
+        self.url = reverse('occupancy-report')
+
+    def book(self, room, check_in, check_out):
+        data = {'guest_name': 'Guest', 'guest_email': 'guest@example.com', 'room_id': room.id, 'check_in_date': check_in, 'check_out_date': check_out}
+        response = self.client.post(reverse('reservation-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['reservation_id']
+
+    def snapshot(self):
+        return sorted(DailyRoomRollup.objects.values_list('room_id', 'day', 'nights_sold', 'revenue', 'payments'))
+
+    def test_report_from_incremental_rollups(self):
+        reservation_id = self.book(self.room, '2025-06-01', '2025-06-04')
+        self.book(self.other_room, '2025-06-02', '2025-06-03')
+        self.client.post(reverse('process-payment'), {'card_number': self.card.card_number, 'amount': '150.00', 'reservation_id': reservation_id}, format='json')
+
+        response = self.client.get(self.url, {'from': '2025-06-01', 'to': '2025-06-11'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first, second = response.data['results']
+        self.assertEqual((first['room'], first['nights_sold'], first['occupancy']), (self.room.id, 3, 0.3))
+        self.assertEqual((first['revenue'], first['adr']), ('300.00', '100.00'))
+        self.assertEqual(second['nights_sold'], 1)
+        self.assertEqual(response.data['totals']['nights_available'], 20)
+        self.assertEqual(response.data['totals']['occupancy'], 0.2)
+        self.assertEqual(response.data['totals']['revenue'], '360.00')
+
+        # Payments land on the day they are taken.
+        today = timezone.localdate()
+        paid = self.client.get(self.url, {'from': today, 'to': today + timedelta(days=1)}).data['totals']['payments']
+        self.assertEqual(paid, '150.00')
+
+        by_day = self.client.get(self.url, {'from': '2025-06-01', 'to': '2025-06-04', 'group_by': 'day'}).data['results']
+        self.assertEqual([day['nights_sold'] for day in by_day], [1, 2, 1])
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_update_and_delete_adjust_rollups(self):
+        reservation_id = self.book(self.room, '2025-07-01', '2025-07-03')
+        detail = reverse('reservation-detail', args=[reservation_id])
+        response = self.client.patch(detail, {'room': self.other_room.id, 'check_out_date': '2025-07-02'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        incremental = [row for row in self.snapshot() if row[2]]
+        rollups.rebuild()
+        self.assertEqual([row for row in self.snapshot() if row[2]], incremental)
+        # Repriced at the new room's rate.
+        self.assertEqual(incremental, [(self.other_room.id, date(2025, 7, 1), 1, Decimal('60.00'), Decimal('0.00'))])
+
+        self.client.delete(detail)
+        report = self.client.get(self.url, {'from': '2025-07-01', 'to': '2025-08-01'}).data
+        self.assertEqual(report['totals']['nights_sold'], 0)
+
+    def test_edits_cannot_double_book(self):
+        self.book(self.room, '2025-09-05', '2025-09-08')
+        reservation_id = self.book(self.other_room, '2025-09-01', '2025-09-03')
+        detail = reverse('reservation-detail', args=[reservation_id])
+
+        response = self.client.patch(detail, {'room': self.room.id, 'check_out_date': '2025-09-06'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.patch(detail, {'check_out_date': '2025-09-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Reservation.objects.get(pk=reservation_id).room_id, self.other_room.id)
+
+        # Its own nights do not block it, and a move is priced at the new rate.
+        response = self.client.patch(detail, {'room': self.room.id, 'check_out_date': '2025-09-05', 'total_cost': '1.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_cost'], '400.00')
+        incremental = [row for row in self.snapshot() if row[2]]
+        rollups.rebuild()
+        self.assertEqual([row for row in self.snapshot() if row[2]], incremental)
+
+    def test_cascade_deletes_adjust_rollups(self):
+        reservation_id = self.book(self.room, '2025-08-01', '2025-08-03')
+        self.client.post(reverse('process-payment'), {'card_number': self.card.card_number, 'amount': '50.00', 'reservation_id': reservation_id}, format='json')
+        self.assertEqual(DailyRoomRollup.objects.aggregate(paid=Sum('payments'))['paid'], Decimal('50.00'))
+
+        # Deleting the card takes its payments with it.
+        self.client.delete(reverse('debitcard-detail', args=[self.card.id]))
+        self.assertEqual(DailyRoomRollup.objects.aggregate(paid=Sum('payments'))['paid'], Decimal('0.00'))
+
+        # Deleting the guest takes their reservations with it.
+        guest_id = Reservation.objects.get(pk=reservation_id).guest_id
+        self.assertEqual(self.client.delete(reverse('guest-detail', args=[guest_id])).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Reservation.objects.exists())
+        incremental = [row for row in self.snapshot() if any(row[2:])]
+        self.assertEqual(incremental, [])
+        rollups.rebuild()
+        self.assertEqual([row for row in self.snapshot() if any(row[2:])], incremental)
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'from': '2025-01-01'}, {'from': '2025-01-02', 'to': '2025-01-01'}, {'from': '2025-01-01', 'to': '2025-02-01', 'group_by': 'week'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_year_report_reads_only_rollups(self):
+        self.book(self.room, '2025-01-01', '2025-12-31')
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'from': '2025-01-01', 'to': '2026-01-01'})
+        self.assertEqual(response.data['totals']['nights_sold'], 364)
+
+class ExportAPITests(APITestCase):
+    def setUp(self):
+        self.card = DebitCard.objects.create(card_number="4000000000000200", balance=0)
+        self.other_card = DebitCard.objects.create(card_number="4000000000000201", balance=0)
+        for amount in ('10.50', '20.00', '-5.25'):
+            Transaction.objects.create(debit_card=self.card, amount=amount, transaction_type='deposit' if amount[0] != '-' else 'payment')
+        Transaction.objects.create(debit_card=self.other_card, amount='1.00', transaction_type='deposit')
+        guest = Guest.objects.create(name="Export Guest", email="export@example.com")
+        room = Room.objects.create(name="Room 1", price_per_night=80)
+        for day in (1, 10, 20):
+            Reservation.objects.create(guest=guest, room=room, check_in_date=date(2025, 3, day), check_out_date=date(2025, 3, day + 1), total_cost=80)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_transactions_csv(self):
+        response = self.client.get(reverse('export-transactions', args=['csv']), {'debit_card': self.card.id})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = self.content(response).splitlines()
+        self.assertEqual(lines[0], 'id,timestamp,debit_card_id,card_number,transaction_type,amount,reservation_id')
+        self.assertEqual([line.split(',')[5] for line in lines[1:]], ['10.50', '20.00', '-5.25'])
+        self.assertEqual(lines[1].split(',')[6], '')
+
+    def test_transactions_ndjson_filters(self):
+        today = timezone.localdate()
+        response = self.client.get(reverse('export-transactions', args=['ndjson']), {'transaction_type': 'deposit', 'from': today, 'to': today + timedelta(days=1)})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['amount'] for row in rows], ['10.50', '20.00', '1.00'])
+        self.assertEqual(rows[0]['card_number'], self.card.card_number)
+        self.assertIsNone(rows[0]['reservation_id'])
+
+        response = self.client.get(reverse('export-transactions', args=['ndjson']), {'to': today})
+        self.assertEqual(self.content(response), '')
+
+    def test_reservations_date_range(self):
+        response = self.client.get(reverse('export-reservations', args=['ndjson']), {'from': '2025-03-05', 'to': '2025-03-20'})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['check_in_date'] for row in rows], ['2025-03-10'])
+        self.assertEqual((rows[0]['guest_email'], rows[0]['total_cost']), ('export@example.com', '80.00'))
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(reverse('export-transactions', args=['xml'])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('export-transactions', args=['csv']), {'debit_card': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('export-reservations', args=['csv']), {'from': '2025-02-30'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+class IdempotencyAPITests(APITestCase):
+    def setUp(self):
+        idempotency.get_cache().clear()
+        self.card = DebitCard.objects.create(card_number="4000000000000200", balance=100.00)
+        self.url = reverse('deposit-funds')
+        self.data = {'card_number': self.card.card_number, 'amount': '10.00'}
+
+    def deposit(self, key, data=None):
+        # The replay cache is filled on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, data or self.data, format='json', headers={'Idempotency-Key': key})
+
+    def test_retry_is_replayed_without_a_second_deposit(self):
+        first = self.deposit('deposit-1')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Idempotent-Replayed', first)
+        with self.assertNumQueries(0):
+            second = self.deposit('deposit-1')
+        self.assertEqual((second.status_code, second.data), (first.status_code, first.data))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+        # Without the cache the replay comes from the table.
+        idempotency.get_cache().clear()
+        self.assertEqual(self.deposit('deposit-1')['Idempotent-Replayed'], 'true')
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('110.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_key_reused_for_a_different_body(self):
+        self.deposit('deposit-2')
+        response = self.deposit('deposit-2', {'card_number': self.card.card_number, 'amount': '20.00'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('110.00'))
+
+    def test_client_errors_are_stored_and_expired_keys_run_again(self):
+        response = self.deposit('deposit-3', {'card_number': '9999', 'amount': '10.00'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.deposit('deposit-3', {'card_number': '9999', 'amount': '10.00'})['Idempotent-Replayed'], 'true')
+
+        self.deposit('deposit-4')
+        record = IdempotencyKey.objects.get(key='deposit-4')
+        IdempotencyKey.objects.filter(key='deposit-4').update(expires_at=timezone.now() - timedelta(seconds=1))
+        idempotency.get_cache().clear()
+        self.assertNotIn('Idempotent-Replayed', self.deposit('deposit-4'))
+        self.assertEqual(Transaction.objects.count(), 2)
+        # Reclaimed in place, and a request racing for it now replays.
+        self.assertEqual(IdempotencyKey.objects.get(key='deposit-4').pk, record.pk)
+        idempotency.get_cache().clear()
+        self.assertEqual(self.deposit('deposit-4')['Idempotent-Replayed'], 'true')
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_invalid_key(self):
+        response = self.deposit('x' * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_batch_payment_is_replayed(self):
+        guest = Guest.objects.create(name="Idempotent Guest", email="idempotent@example.com")
+        reservation = Reservation.objects.create(guest=guest, check_in_date="2025-08-01", check_out_date="2025-08-02", total_cost=30.00)
+        data = [{'card_number': self.card.card_number, 'amount': '30.00', 'reservation_id': reservation.id}]
+        first = self.client.post(reverse('process-payment-batch'), data, format='json', headers={'Idempotency-Key': 'batch-1'})
+        second = self.client.post(reverse('process-payment-batch'), data, format='json', headers={'Idempotency-Key': 'batch-1'})
+        self.assertEqual(second.data, first.data)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('70.00'))
+
+    async def test_async_payment_is_replayed(self):
+        guest = await Guest.objects.acreate(name="Async Guest", email="async@example.com")
+        reservation = await Reservation.objects.acreate(guest=guest, check_in_date="2025-11-01", check_out_date="2025-11-02", total_cost=45.00)
+        data = {'card_number': self.card.card_number, 'amount': '45.00', 'reservation_id': reservation.id}
+        first = await self.async_client.post(reverse('async-process-payment'), data, content_type='application/json', headers={'Idempotency-Key': 'async-1'})
+        second = await self.async_client.post(reverse('async-process-payment'), data, content_type='application/json', headers={'Idempotency-Key': 'async-1'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((second.json(), second['Idempotent-Replayed']), (first.json(), 'true'))
+        await self.card.arefresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('55.00'))
+
+class GuestSearchAPITests(APITestCase):
+    def setUp(self):
+        self.url = reverse('guest-search')
+        Guest.objects.bulk_create([
+            Guest(name="Anna Berg", email="anna.berg@example.com"),
+            Guest(name="annabel Lee", email="lee@example.com"),
+            Guest(name="Bob Stone", email="ANNIE@example.com"),
+            Guest(name="Carl Ann", email="carl@example.com"),
+        ])
+
+    def names(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [guest['name'] for guest in response.data['results']]
+
+    def test_prefix_of_name_or_email_ignoring_case(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'q': 'ANN'})
+        # Name matches first, then email-only matches; infix matches are not returned.
+        self.assertEqual(self.names(response), ["Anna Berg", "annabel Lee", "Bob Stone"])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'email'})
+        self.assertEqual(self.names(self.client.get(self.url, {'q': 'lee@'})), ["annabel Lee"])
+        self.assertEqual(self.names(self.client.get(self.url, {'q': 'zz'})), [])
+
+    def test_limit(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'q': 'ann', 'limit': 2})
+        self.assertEqual(self.names(response), ["Anna Berg", "annabel Lee"])
+        self.assertEqual(self.client.get(self.url, {'q': 'ann', 'limit': 51}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_columns_follow_updates(self):
+        Guest.objects.filter(name="Carl Ann").update(name="Annika Carl")
+        self.assertIn("Annika Carl", self.names(self.client.get(self.url, {'q': 'annik'})))
+
+class SweeperTests(APITestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.guest = Guest.objects.create(name="Sweep Guest", email="sweep@example.com")
+        self.room = Room.objects.create(name="Room 1", price_per_night=50.00)
+        self.other_room = Room.objects.create(name="Room 2", price_per_night=50.00)
+        self.card = DebitCard.objects.create(card_number="4000000000000300", balance=500.00)
+
+    def book(self, room, check_in, nights, age=timedelta(0)):
+        reservation = Reservation(guest=self.guest, check_in_date=check_in, check_out_date=check_in + timedelta(days=nights), created_at=timezone.now() - age)
+        return booking.confirm(booking.price(reservation, room=room))
+
+    def test_moving_or_deleting_a_stay_frees_the_room_it_leaves(self):
+        reservation = self.book(self.room, self.today + timedelta(days=10), 2)
+        detail = reverse('reservation-detail', args=[reservation.pk])
+        self.assertEqual(self.client.patch(detail, {'room': self.other_room.id}, format='json').status_code, status.HTTP_200_OK)
+        self.assertEqual(list(Room.objects.order_by('pk').values_list('is_available', flat=True)), [True, False])
+
+        self.client.delete(detail)
+        self.assertEqual(list(Room.objects.order_by('pk').values_list('is_available', flat=True)), [True, True])
+
+    def test_unpaid_hold_expires_and_frees_the_room(self):
+        check_in = self.today + timedelta(days=10)
+        hold = self.book(self.room, check_in, 2, age=timedelta(hours=1))
+        paid = self.book(self.other_room, check_in, 2, age=timedelta(hours=1))
+        self.client.post(reverse('process-payment'), {'card_number': self.card.card_number, 'amount': '10.00', 'reservation_id': paid.id}, format='json')
+        fresh = self.book(self.other_room, check_in + timedelta(days=5), 1)
+
+        self.assertEqual(sweeper.sweep(), sweeper.SweepResult(expired=1, checked_out=0, rooms_released=1))
+        statuses = dict(Reservation.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {hold.pk: 'expired', paid.pk: 'confirmed', fresh.pk: 'pending'})
+        self.room.refresh_from_db()
+        self.assertTrue(self.room.is_available)
+        self.assertEqual(DailyRoomRollup.objects.filter(room=self.room).exclude(nights_sold=0).count(), 0)
+        # The expired hold no longer blocks the dates, and cannot be paid for any more.
+        self.book(self.room, check_in, 2)
+        response = self.client.post(reverse('process-payment'), {'card_number': self.card.card_number, 'amount': '10.00', 'reservation_id': hold.id}, format='json')
+        self.assertEqual(response.data['error'], "Invalid reservation.")
+
+    def test_finished_stays_are_checked_out(self):
+        self.book(self.room, self.today - timedelta(days=3), 3)
+        self.book(self.other_room, self.today - timedelta(days=3), 2)
+        self.book(self.other_room, self.today + timedelta(days=3), 2)
+        Reservation.objects.update(status=Reservation.Status.CONFIRMED)
+        unused = Room.objects.create(name="Closed for repairs", price_per_night=50.00, is_available=False)
+
+        # Two batches of claim, check-out and room release (each in a savepoint), plus one
+        # empty claim to end each phase.
+        with self.assertNumQueries(16):
+            result = sweeper.sweep(batch_size=1)
+        self.assertEqual(result, sweeper.SweepResult(expired=0, checked_out=2, rooms_released=1))
+        self.assertEqual(list(Room.objects.filter(is_available=True).values_list('pk', flat=True)), [self.room.pk])
+        self.assertFalse(Room.objects.get(pk=unused.pk).is_available)
+        self.assertEqual(Reservation.objects.filter(status=Reservation.Status.CHECKED_OUT).count(), 2)
+        self.assertEqual(sweeper.sweep(), sweeper.SweepResult(0, 0, 0))
+
+class PricingTests(APITestCase):
+    def setUp(self):
+        self.room = Room.objects.create(name="Priced Room", price_per_night=100.00)
+        self.other_room = Room.objects.create(name="Plain Room", price_per_night=80.00)
+        # 2030-01-01 is a Tuesday.
+        RateRule.objects.create(name="Weekend", room=self.room, weekdays='45', multiplier='1.5')
+        RateRule.objects.create(name="Peak", start_date=date(2030, 1, 6), end_date=date(2030, 1, 8), multiplier='2')
+        RateRule.objects.create(name="Weekly", min_nights=7, multiplier='0.9')
+
+    def test_calendar_and_stay_totals(self):
+        call_command('rebuild_rate_calendar', '--from', '2030-01-01', '--days', '30', stdout=StringIO())
+        self.assertEqual(NightlyRate.objects.filter(room=self.room).count(), 30)
+        self.assertEqual(NightlyRate.objects.get(room=self.room, day=date(2030, 1, 4)).price, Decimal('150.00'))
+
+        with self.assertNumQueries(2):
+            rates = pricing.load([self.room, self.other_room], date(2030, 1, 1), date(2030, 1, 31))
+        # 100, 100, 100, 150, 150, 200; the seventh night brings the weekly rate on every night.
+        self.assertEqual(rates.total(self.room.pk, date(2030, 1, 1), date(2030, 1, 7)), Decimal('800.00'))
+        self.assertEqual(rates.total(self.room.pk, date(2030, 1, 1), date(2030, 1, 8)), Decimal('900.00'))
+        self.assertEqual(rates.total(self.other_room.pk, date(2030, 1, 6), date(2030, 1, 8)), Decimal('320.00'))
+        with self.assertRaises(ValueError):
+            rates.total(self.room.pk, date(2029, 12, 31), date(2030, 1, 2))
+
+        # Nights the calendar does not cover are priced from the rules instead.
+        NightlyRate.objects.all().delete()
+        rates = pricing.load([self.room], date(2030, 1, 1), date(2030, 1, 8))
+        self.assertEqual(rates.total(self.room.pk, date(2030, 1, 1), date(2030, 1, 8)), Decimal('900.00'))
+
+    def test_bookings_use_the_engine(self):
+        data = {'guest_name': 'Priced Guest', 'guest_email': 'priced@example.com', 'room_id': self.room.id, 'check_in_date': '2030-01-01', 'check_out_date': '2030-01-08'}
+        response = self.client.post(reverse('reservation-list'), data, format='json')
+        self.assertEqual(Reservation.objects.get(pk=response.data['reservation_id']).total_cost, Decimal('900.00'))
+
+    async def test_async_bookings_use_the_engine(self):
+        data = {'guest_name': 'Priced Guest', 'guest_email': 'priced@example.com', 'room_id': self.room.id, 'check_in_date': '2030-01-04', 'check_out_date': '2030-01-06'}
+        response = await self.async_client.post(reverse('async-reservation-create'), data, content_type='application/json')
+        reservation = await Reservation.objects.aget(pk=response.json()['reservation_id'])
+        self.assertEqual(reservation.total_cost, Decimal('300.00'))
+
+    @override_settings(RATE_CALENDAR_DAYS=10)
+    def test_saving_a_room_regenerates_its_calendar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_room.price_per_night = Decimal('90.00')
+            self.other_room.save()
+        prices = set(NightlyRate.objects.filter(room=self.other_room, day__gte=timezone.localdate()).values_list('price', flat=True))
+        self.assertEqual((NightlyRate.objects.filter(room=self.other_room).count(), prices), (10, {Decimal('90.00')}))
+
+        # Changes that leave the price alone leave the calendar alone.
+        with mock.patch.object(pricing, 'regenerate') as regenerate, self.captureOnCommitCallbacks(execute=True):
+            self.other_room.name = "Renamed"
+            self.other_room.save()
+            self.other_room.price_per_night = 90
+            self.other_room.save()
+            self.other_room.is_available = False
+            self.other_room.save(update_fields=['is_available'])
+        regenerate.assert_not_called()
+
+class QuoteAPITests(APITestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.guest = Guest.objects.create(name="Quote Guest", email="quote@example.com")
+        self.room = Room.objects.create(name="Quoted Room", price_per_night=100.00)
+        self.other_room = Room.objects.create(name="Other Room", price_per_night=80.00)
+        self.meal = Meal.objects.create(name="Breakfast", price=15.00)
+        Reservation.objects.create(guest=self.guest, room=self.room, check_in_date="2030-01-03", check_out_date="2030-01-05", total_cost=200.00)
+        RateRule.objects.create(name="Weekend", room=self.room, weekdays='45', multiplier='1.5')
+        self.url = reverse('quotes')
+
+    def params(self, **extra):
+        return {'room': [self.room.id, self.other_room.id], 'range': ['2030-01-01/2030-01-03', '2030-01-04/2030-01-06'], **extra}
+
+    def test_matrix(self):
+        response = self.client.get(self.url, self.params(meal=[self.meal.id, 999]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cells = [(cell['room_id'], str(cell['check_in_date']), cell['available'], cell['total_cost']) for cell in response.data['quotes']]
+        self.assertEqual(cells, [
+            (self.room.id, '2030-01-01', True, '200.00'),
+            (self.room.id, '2030-01-04', False, '300.00'),
+            (self.other_room.id, '2030-01-01', True, '160.00'),
+            (self.other_room.id, '2030-01-04', True, '160.00'),
+        ])
+        meals = response.data['quotes'][0]['meals']
+        self.assertEqual([meal['total_cost'] for meal in meals], ['215.00', None])
+
+    def test_missing_room_is_reported_per_cell(self):
+        response = self.client.get(self.url, {'room': [999], 'range': ['2030-01-01/2030-01-03']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [cell] = response.data['quotes']
+        self.assertEqual((cell['available'], cell['total_cost']), (False, None))
+
+    def test_quote_has_no_side_effects(self):
+        self.client.get(self.url, self.params())
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertTrue(Room.objects.get(pk=self.other_room.pk).is_available)
+
+    def test_query_count_does_not_grow_with_the_matrix(self):
+        rooms = Room.objects.bulk_create(Room(name=f"Extra {i}", price_per_night=50.00) for i in range(20))
+        params = {
+            'room': [room.id for room in rooms],
+            'range': [f"2030-02-{day:02d}/2030-02-{day + 3:02d}" for day in range(1, 20)],
+            'meal': [self.meal.id],
+        }
+        # Rooms, meals, overlapping reservations, rate calendar, rate rules.
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data['quotes']), 20 * 19)
+        # Served from the cache while it is fresh.
+        with self.assertNumQueries(0):
+            self.client.get(self.url, params)
+
+    def test_booking_invalidates_cached_quotes(self):
+        params = {'room': [self.other_room.id], 'range': ['2030-01-01/2030-01-03']}
+        self.assertTrue(self.client.get(self.url, params).data['quotes'][0]['available'])
+        data = {'guest_name': 'Quote Guest', 'guest_email': 'quote@example.com', 'room_id': self.other_room.id, 'check_in_date': '2030-01-02', 'check_out_date': '2030-01-03'}
+        self.client.post(reverse('reservation-list'), data, format='json')
+        self.assertFalse(self.client.get(self.url, params).data['quotes'][0]['available'])
+
+    def test_invalid_requests(self):
+        for params in (
+            {'room': [self.room.id]},
+            {'room': ['x'], 'range': ['2030-01-01/2030-01-03']},
+            {'room': [self.room.id], 'range': ['2030-01-03/2030-01-03']},
+            {'room': [self.room.id], 'range': ['2030-01-01']},
+            {'room': [self.room.id], 'range': ['2030-01-01/2030-01-03', '2033-01-01/2033-01-03']},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+class SparseFieldsetAPITests(APITestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.guest = Guest.objects.create(name="Sparse Guest", email="sparse@example.com")
+        self.room = Room.objects.create(name="Sparse Room", price_per_night=75.50)
+        self.meal = Meal.objects.create(name="Lunch", price=12.25)
+        self.card = DebitCard.objects.create(card_number="4800000000000000", balance=10)
+        self.reservation = Reservation.objects.create(guest=self.guest, room=self.room, meal=self.meal, check_in_date="2030-01-01", check_out_date="2030-01-03", total_cost=163.25)
+        Reservation.objects.create(guest=self.guest, check_in_date="2030-01-01", check_out_date="2030-01-02", total_cost=0)
+
+    def test_fast_lists_match_the_serializers(self):
+        from .serializers import DebitCardSerializer, GuestSerializer, MealSerializer, ReservationSerializer, RoomSerializer
+        for url, serializer, queryset in (
+            (reverse('room-list'), RoomSerializer, Room.objects.all()),
+            (reverse('meal-list'), MealSerializer, Meal.objects.all()),
+            (reverse('guest-list'), GuestSerializer, Guest.objects.all()),
+            (reverse('debitcard-list'), DebitCardSerializer, DebitCard.objects.all()),
+            (reverse('reservation-list'), ReservationSerializer, Reservation.objects.all()),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.content, JSONRenderer().render(serializer(queryset, many=True).data), url)
+
+    def test_fields_trim_the_response_and_the_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('room-list'), {'fields': 'name,id'})
+        self.assertEqual(response.json(), [{'name': "Sparse Room", 'id': self.room.id}])
+        self.assertNotIn('price_per_night', queries.captured_queries[-1]['sql'])
+
+        response = self.client.get(reverse('reservation-detail', args=[self.reservation.id]), {'fields': 'total_cost,status'})
+        self.assertEqual(response.json(), {'total_cost': '163.25', 'status': 'pending'})
+
+    def test_fields_with_expand(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('reservation-list'), {'fields': 'id,room', 'expand': 'room,guest'})
+        rows = sorted(response.json(), key=lambda row: row['id'])
+        self.assertEqual(rows, [
+            {'id': self.reservation.id, 'room': {'id': self.room.id, 'name': "Sparse Room", 'price_per_night': '75.50', 'is_available': True}},
+            {'id': self.reservation.id + 1, 'room': None},
+        ])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('guest-list'), {'fields': 'name,name_search'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('guest-list'), {'fields': ','})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post(reverse('meal-list') + '?fields=id', {'name': "Tea", 'price': '3.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data), {'id', 'name', 'price'})
+
+    def test_renderer_matches_drf(self):
+        data = {'when': timezone.now(), 'day': date(2030, 1, 1), 'amount': Decimal('1.50'), 'text': "caf\u00e9", 1: [None, True, 2.5]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+class RoomHoldAPITests(APITestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.room = Room.objects.create(name="Last Room", price_per_night=100.00)
+        self.meal = Meal.objects.create(name="Dinner", price=20.00)
+        self.url = reverse('hold-create')
+
+    def claim(self, check_in='2030-03-01', check_out='2030-03-03', room=None):
+        return self.client.post(self.url, {'room_id': room or self.room.id, 'check_in_date': check_in, 'check_out_date': check_out}, format='json')
+
+    def confirm(self, token, **extra):
+        data = {'guest_name': 'Holder', 'guest_email': 'holder@example.com', **extra}
+        return self.client.post(reverse('hold-confirm', args=[token]), data, format='json')
+
+    def test_only_one_client_holds_the_nights(self):
+        first = self.claim()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.claim('2030-03-02', '2030-03-04').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.claim('2030-03-03', '2030-03-04').status_code, status.HTTP_201_CREATED)
+
+        # Held nights are not bookable, available or quotable by anyone else.
+        data = {'guest_name': 'Other', 'guest_email': 'other@example.com', 'room_id': self.room.id, 'check_in_date': '2030-03-01', 'check_out_date': '2030-03-02'}
+        self.assertEqual(self.client.post(reverse('reservation-list'), data, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('room-availability'), {'from': '2030-03-01', 'to': '2030-03-02'}).data, [])
+        quote = self.client.get(reverse('quotes'), {'room': [self.room.id], 'range': ['2030-03-01/2030-03-02']})
+        self.assertFalse(quote.data['quotes'][0]['available'])
+
+    def test_confirm_books_the_held_nights_once(self):
+        token = self.claim().data['token']
+        response = self.confirm(token, meal_id=self.meal.id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reservation = Reservation.objects.get(pk=response.data['reservation_id'])
+        self.assertEqual((str(reservation.check_in_date), reservation.total_cost, reservation.status), ('2030-03-01', Decimal('220.00'), 'pending'))
+        self.assertFalse(RoomHold.objects.exists())
+
+        self.assertEqual(self.confirm(token).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.claim().status_code, status.HTTP_409_CONFLICT)
+
+    def test_expired_holds_stop_counting_and_are_reclaimed(self):
+        stale = holds.claim(self.room.id, date(2030, 3, 1), date(2030, 3, 3), now=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.confirm(stale.token).status_code, status.HTTP_404_NOT_FOUND)
+        fresh = self.claim()
+        self.assertEqual(fresh.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(list(RoomHold.objects.values_list('token', flat=True)), [fresh.data['token']])
+
+    def test_release(self):
+        token = self.claim().data['token']
+        self.assertEqual(self.client.delete(reverse('hold-release', args=[token])).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(reverse('hold-release', args=[token])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.claim().status_code, status.HTTP_201_CREATED)
+
+    def test_invalid_claims(self):
+        self.assertEqual(self.claim('2030-03-03', '2030-03-03').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.claim(room=999).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.confirm(self.claim().data['token'], meal_id=999).status_code, status.HTTP_400_BAD_REQUEST)
+
+@override_settings(THROTTLING_ENABLED=True, REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'card': '3/min', 'client': '5/min'}})
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        throttling.get_cache().clear()
+        throttling.reset()
+        self.card = DebitCard.objects.create(card_number="4900000000000001", balance=0)
+        self.other_card = DebitCard.objects.create(card_number="4900000000000002", balance=0)
+
+    def deposit(self, card, url='deposit-funds'):
+        return self.client.post(reverse(url), {'card_number': card.card_number, 'amount': '1.00'}, format='json')
+
+    def test_per_card_bucket(self):
+        self.assertEqual([self.deposit(self.card).status_code for _ in range(3)], [200] * 3)
+        throttled = self.deposit(self.card)
+        self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(throttled['Retry-After'], '20')
+        self.assertEqual(self.deposit(self.other_card).status_code, status.HTTP_200_OK)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('3.00'))
+
+    async def test_async_views_share_the_buckets(self):
+        for _ in range(3):
+            await self.async_client.post(reverse('async-deposit-funds'), {'card_number': self.card.card_number, 'amount': '1.00'}, content_type='application/json')
+        response = await self.async_client.post(reverse('async-process-payment'), {'card_number': self.card.card_number, 'amount': '1.00', 'reservation_id': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_per_client_bucket_spans_the_write_endpoints(self):
+        room = Room.objects.create(name="Busy Room", price_per_night=50.00)
+        for card in (self.card, self.card, self.other_card, self.other_card):
+            self.assertEqual(self.deposit(card).status_code, status.HTTP_200_OK)
+        data = {'guest_name': 'Busy', 'guest_email': 'busy@example.com', 'room_id': room.id, 'check_in_date': '2030-05-01', 'check_out_date': '2030-05-02'}
+        self.assertEqual(self.client.post(reverse('reservation-list'), data, format='json').status_code, status.HTTP_201_CREATED)
+        data.update(check_in_date='2030-05-02', check_out_date='2030-05-03')
+        self.assertEqual(self.client.post(reverse('reservation-list'), data, format='json').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Reads are never throttled.
+        self.assertEqual(self.client.get(reverse('reservation-list')).status_code, status.HTTP_200_OK)
+
+    def test_bucket_refills_and_leases_locally(self):
+        self.assertEqual([throttling.take('bucket', 2, 1.0, now=100.0)[0] for _ in range(3)], [True, True, False])
+        self.assertEqual(throttling.take('bucket', 2, 1.0, now=100.0), (False, 1.0))
+        self.assertTrue(throttling.take('bucket', 2, 1.0, now=101.0)[0])
+
+        # A roomy bucket is leased a tenth at a time; spending the lease never touches the cache.
+        self.assertTrue(throttling.take('roomy', 100, 10.0, now=100.0)[0])
+        with mock.patch.object(throttling, 'get_cache') as get_cache:
+            for _ in range(9):
+                self.assertTrue(throttling.take('roomy', 100, 10.0, now=100.5)[0])
+        get_cache.assert_not_called()
+        self.assertEqual(throttling.get_cache().get('roomy'), (90, 100.0))
+
+    @override_settings(LOAD_SHED_MAX_IN_FLIGHT=0)
+    def test_sheds_writes_when_too_many_are_in_flight(self):
+        response = self.deposit(self.card)
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '1'))
+        self.assertEqual(self.client.get(reverse('debitcard-list')).status_code, status.HTTP_200_OK)
+
+    def test_sheds_writes_while_queries_are_slow(self):
+        with mock.patch.object(throttling, '_db_latency', 1.0), mock.patch.object(throttling, '_db_sampled_at', time.monotonic()):
+            self.assertEqual(self.deposit(self.card).status_code, 503)
+        # A stale reading no longer counts.
+        with mock.patch.object(throttling, '_db_latency', 1.0), mock.patch.object(throttling, '_db_sampled_at', time.monotonic() - 5):
+            self.assertEqual(self.deposit(self.card).status_code, 200)
+
+class TransactionArchiveTests(APITestCase):
+    def setUp(self):
+        self.card = DebitCard.objects.create(card_number="4300000000000001", balance=0)
+        self.other_card = DebitCard.objects.create(card_number="4300000000000002", balance=0)
+        room = Room.objects.create(name="Archive Room", price_per_night=40)
+        guest = Guest.objects.create(name="Archive Guest", email="archive@example.com")
+        self.reservation = Reservation.objects.create(guest=guest, room=room, check_in_date=date(2024, 1, 10), check_out_date=date(2024, 1, 11), total_cost=40)
+        ledger.credit(self.card.card_number, '100.00')
+        ledger.debit(self.card.card_number, '40.00', reservation_id=self.reservation.id)
+        ledger.credit(self.other_card.card_number, '5.00')
+        ledger.credit(self.card.card_number, '1.50')
+        self.old_ids = list(Transaction.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        # The first three are two years old; the last one is recent.
+        Transaction.objects.filter(pk__in=self.old_ids).update(timestamp=timezone.now() - timedelta(days=730))
+        self.cutoff = archive.default_cutoff()
+
+    def test_moves_old_transactions_and_keeps_balances(self):
+        self.assertEqual(archive.archive_before(self.cutoff, batch_size=2), 3)
+        self.assertEqual(list(ArchivedTransaction.objects.order_by('pk').values_list('pk', flat=True)), self.old_ids)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(ledger.ledger_balance(self.card.id), Decimal('61.50'))
+        self.assertEqual(ledger.ledger_balance(self.other_card.id), Decimal('5.00'))
+        # An opening checkpoint plus one covering the archived rows, recorded once although two batches touched the card.
+        self.assertEqual(list(BalanceCheckpoint.objects.filter(debit_card=self.card).order_by('pk').values_list('balance', 'last_transaction_id')), [(0, 0), (Decimal('60.00'), self.old_ids[1])])
+        self.assertEqual([audit.problems for audit in ledger.audit_balances()], [[], []])
+        self.assertEqual(archive.archive_before(self.cutoff), 0)
+
+    def test_audit_still_checks_archived_history(self):
+        archive.archive_before(self.cutoff)
+        ArchivedTransaction.objects.filter(pk=self.old_ids[0]).update(amount='90.00')
+        audit = next(ledger.audit_balances())
+        self.assertIn(f"checkpoint at transaction {self.old_ids[1]} says 60.00, log says 50.00", audit.problems)
+
+    def test_interrupted_batch_is_finished_and_read_once(self):
+        # As if a run copied the first row and died before deleting it.
+        ArchivedTransaction.objects.create(**dict(zip(archive.COLUMNS, Transaction.objects.filter(pk=self.old_ids[0]).values_list(*archive.COLUMNS).get())))
+        response = self.client.get(reverse('export-transactions', args=['ndjson']), {'debit_card': self.card.id})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['amount'] for row in rows], ['100.00', '-40.00', '1.50'])
+        self.assertEqual(archive.archive_before(self.cutoff), 3)
+        self.assertEqual(ArchivedTransaction.objects.count(), 3)
+
+    def test_exports_span_the_archive_only_when_the_range_needs_it(self):
+        archive.archive_before(self.cutoff)
+        response = self.client.get(reverse('export-transactions', args=['ndjson']))
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], sorted(self.old_ids) + [Transaction.objects.get().pk])
+        self.assertEqual(rows[0]['card_number'], self.card.card_number)
+        self.assertEqual(rows[1]['reservation_id'], self.reservation.id)
+
+        today = timezone.localdate()
+        # A range after everything archived costs one look at the archive and stays a hot-table queryset.
+        with self.assertNumQueries(1):
+            self.assertIsInstance(exports.transaction_rows(start=today), QuerySet)
+
+    def test_detail_falls_back_to_the_archive(self):
+        archive.archive_before(self.cutoff)
+        response = self.client.get(reverse('transaction-detail', args=[self.old_ids[1]]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['amount'], response.data['reservation']), ('-40.00', self.reservation.id))
+        self.assertEqual(self.client.get(reverse('transaction-detail', args=[999999])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(self.client.get(reverse('transaction-list')).data['results']), 1)
+
+    def test_rollup_rebuild_counts_archived_payments(self):
+        archive.archive_before(self.cutoff)
+        # Moving a payment to the archive does not take it out of the rollups.
+        self.assertEqual(DailyRoomRollup.objects.aggregate(total=Sum('payments'))['total'], Decimal('40.00'))
+        rollups.rebuild()
+        self.assertEqual(DailyRoomRollup.objects.aggregate(total=Sum('payments'))['total'], Decimal('40.00'))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_transactions', '--older-than-days', '30', stdout=out)
+        self.assertIn("archived 3 transactions", out.getvalue())
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReadReplicaRoutingTests(SimpleTestCase):
+    def route(self, request):
+        seen = []
+
+        def view(request):
+            seen.append((router.db_for_read(Room), router.db_for_write(Room)))
+            return HttpResponse()
+
+        response = replicas.ReplicaRoutingMiddleware(view)(request)
+        return seen[0], response
+
+    def test_safe_requests_read_from_a_replica(self):
+        (read, write), response = self.route(RequestFactory().get('/api/rooms/'))
+        self.assertEqual((read, write), ('replica', 'default'))
+        self.assertNotIn(replicas.REPLICA_PIN_COOKIE, response.cookies)
+        # Outside a request everything is on the primary.
+        self.assertEqual(router.db_for_read(Room), 'default')
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        (read, _), response = self.route(RequestFactory().post('/api/deposit_funds/'))
+        self.assertEqual(read, 'default')
+        self.assertEqual(response.cookies[replicas.REPLICA_PIN_COOKIE]['max-age'], 5)
+
+        pinned = RequestFactory().get('/api/transactions/')
+        pinned.COOKIES[replicas.REPLICA_PIN_COOKIE] = '1'
+        self.assertEqual(self.route(pinned)[0][0], 'default')
+
+    def test_transactions_and_primary_blocks_read_from_the_primary(self):
+        def view(request):
+            with replicas.primary():
+                seen.append(router.db_for_read(Room))
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                seen.append(router.db_for_read(Room))
+            seen.append(router.db_for_read(Room))
+            return HttpResponse()
+
+        seen = []
+        replicas.ReplicaRoutingMiddleware(view)(RequestFactory().get('/api/rooms/'))
+        self.assertEqual(seen, ['default', 'default', 'replica'])
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas_no_cookie(self):
+        (read, _), response = self.route(RequestFactory().post('/api/deposit_funds/'))
+        self.assertEqual(read, 'default')
+        self.assertNotIn(replicas.REPLICA_PIN_COOKIE, response.cookies)
+
+@override_settings(REPLICA_DATABASES=['replica_file'])
+class ReadReplicaFileTests(APITransactionTestCase):
+    """Routing against a second SQLite file holding different rows; not a TestCase, whose open transaction keeps reads on the primary."""
+
+    def setUp(self):
+        fd, path = tempfile.mkstemp(prefix='guesthouse-test-replica-', suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        # A connection for this thread only: an alias added to DATABASES would need a test database of its own.
+        replica = load_backend(connection.settings_dict['ENGINE']).DatabaseWrapper({**connection.settings_dict, 'NAME': path}, 'replica_file')
+        connections['replica_file'] = replica
+        self.addCleanup(connections.__delitem__, 'replica_file')
+        self.addCleanup(replica.close)
+        with replica.schema_editor() as editor:
+            editor.create_model(Guest)
+        self.guest = Guest.objects.create(name="On the primary", email="primary@example.com")
+        Guest.objects.using('replica_file').create(pk=self.guest.pk, name="On the replica", email="replica@example.com")
+        self.url = reverse('guest-detail', args=[self.guest.pk])
+
+    def test_reads_come_from_the_replica_until_the_client_writes(self):
+        self.assertEqual(self.client.get(self.url).json()['name'], "On the replica")
+
+        # The POST checks the email is unused on the primary, where it is, and writes there.
+        response = self.client.post(reverse('guest-list'), {'name': 'New', 'email': 'replica@example.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Guest.objects.filter(email='replica@example.com').exists())
+        self.assertEqual(Guest.objects.using('replica_file').count(), 1)
+
+        # Pinned by the cookie the POST set.
+        self.assertIn(replicas.REPLICA_PIN_COOKIE, self.client.cookies)
+        self.assertEqual(self.client.get(self.url).json()['name'], "On the primary")
+        self.assertEqual(self.client_class().get(self.url).json()['name'], "On the replica")
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.seed(5)
+
+    def seed(self, count):
+        offset = Guest.objects.count()
+        room = Room.objects.create(name=f"Room {offset}", price_per_night=80)
+        meal = Meal.objects.create(name=f"Meal {offset}", price=10)
+        guests = Guest.objects.bulk_create(Guest(name=f"Guest {offset + i}", email=f"guest{offset + i}@example.com") for i in range(count))
+        cards = DebitCard.objects.bulk_create(DebitCard(card_number=f"47{offset + i:014d}", balance=10) for i in range(count))
+        reservations = Reservation.objects.bulk_create(
+            Reservation(guest=guest, room=room, meal=meal, check_in_date=date(2030, 1, 1) + timedelta(days=i), check_out_date=date(2030, 1, 2) + timedelta(days=i), total_cost=90)
+            for i, guest in enumerate(guests)
+        )
+        Transaction.objects.bulk_create(
+            Transaction(debit_card=card, amount=-90, transaction_type='payment', reservation=reservation)
+            for card, reservation in zip(cards, reservations)
+        )
+
+    def queries(self, name, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:guest_house_{name}_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_changelists_do_not_grow_with_the_table(self):
+        pages = (
+            ('reservation', {}), ('reservation', {'status': 'pending', 'check_in_date__year': '2030'}),
+            ('transaction', {}), ('transaction', {'transaction_type': 'payment'}),
+            ('guest', {'q': 'Guest 1'}), ('debitcard', {'q': '4700000000000001'}),
+            ('room', {}), ('meal', {}),
+        )
+        before = [len(self.queries(name, params)) for name, params in pages]
+        self.seed(40)
+        self.assertEqual([len(self.queries(name, params)) for name, params in pages], before)
+
+    def test_big_tables_count_and_date_drilldown_with_index_seeks(self):
+        # Session, user, a COUNT capped at EstimatedCountPaginator.COUNT_LIMIT, the page with its
+        # cards joined in, and the first and last timestamps for the date hierarchy.
+        queries = self.queries('transaction')
+        self.assertEqual(len(queries), 6)
+        self.assertIn(f"LIMIT {EstimatedCountPaginator.COUNT_LIMIT}", queries[2])
+        self.assertIn('"guest_house_debitcard"', queries[3])
+        self.assertNotIn('DISTINCT', ' '.join(queries))
+
+        queries = self.queries('reservation', {'check_in_date__year': '2030', 'check_in_date__month': '1'})
+        self.assertEqual(len(queries), 6)
+        self.assertNotIn('DISTINCT', ' '.join(queries))
+
+    def test_guest_search_uses_the_prefix_indexes(self):
+        response = self.client.get(reverse('admin:guest_house_guest_changelist'), {'q': 'GUEST3@'})
+        self.assertEqual([guest.email for guest in response.context['cl'].result_list], ['guest3@example.com'])
+
+    def test_change_forms_do_not_list_every_related_row(self):
+        reservation = Reservation.objects.first()
+        url = reverse('admin:guest_house_reservation_change', args=[reservation.pk])
+        self.client.get(url)  # The first request after login also updates the session.
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.seed(40)
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(after), len(before))
+
+        transaction_url = reverse('admin:guest_house_transaction_change', args=[Transaction.objects.first().pk])
+        response = self.client.get(transaction_url)
+        # Read-only: the ledger is the only writer of the transaction log.
+        self.assertNotContains(response, 'name="_save"')
+
+    def test_reservation_edits_keep_the_booking_rules(self):
+        room = Room.objects.create(name="Admin Room", price_per_night=50)
+        booked = booking.confirm(booking.price(Reservation(guest=Guest.objects.first(), check_in_date=date(2031, 5, 3), check_out_date=date(2031, 5, 5)), room=room))
+        reservation = Reservation.objects.exclude(pk=booked.pk).first()
+        rollups.rebuild()
+        url = reverse('admin:guest_house_reservation_change', args=[reservation.pk])
+        form = {'guest': reservation.guest_id, 'room': room.pk, 'meal': '', 'check_in_date': '2031-05-01', 'check_out_date': '2031-05-04', 'status': 'checked_out', 'total_cost': '1.00'}
+
+        response = self.client.post(url, form)
+        self.assertContains(response, f"Room with ID {room.pk} is not available for those dates.")
+        self.assertNotEqual(Reservation.objects.get(pk=reservation.pk).room_id, room.pk)
+
+        response = self.client.post(url, {**form, 'check_out_date': '2031-05-03'})
+        self.assertEqual(response.status_code, 302)
+        reservation.refresh_from_db()
+        self.assertEqual((reservation.room_id, reservation.status, reservation.total_cost), (room.pk, Reservation.Status.PENDING, Decimal('100.00')))
+        incremental = [row for row in DailyRoomRollup.objects.values_list('room_id', 'day', 'nights_sold', 'revenue').order_by('room_id', 'day') if row[2]]
+        rollups.rebuild()
+        self.assertEqual([row for row in DailyRoomRollup.objects.values_list('room_id', 'day', 'nights_sold', 'revenue').order_by('room_id', 'day') if row[2]], incremental)
+
+        # Adding books through the same rules, and deleting gives the nights back.
+        response = self.client.post(reverse('admin:guest_house_reservation_add'), {**form, 'check_in_date': '2031-05-05', 'check_out_date': '2031-05-06'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(DailyRoomRollup.objects.filter(room=room).aggregate(nights=Sum('nights_sold'))['nights'], 5)
+        self.client.post(reverse('admin:guest_house_reservation_delete', args=[reservation.pk]), {'post': 'yes'})
+        self.assertEqual(DailyRoomRollup.objects.filter(room=room).aggregate(nights=Sum('nights_sold'))['nights'], 3)
+
+    def test_card_balances_are_not_editable(self):
+        card = DebitCard.objects.first()
+        response = self.client.post(reverse('admin:guest_house_debitcard_change', args=[card.pk]), {'card_number': card.card_number, 'balance': '999.00'})
+        self.assertEqual(response.status_code, 302)
+        card.refresh_from_db()
+        self.assertEqual(card.balance, Decimal('10.00'))
+
+    def test_estimated_count_past_the_limit(self):
+        with mock.patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 3):
+            with mock.patch('guest_house.pagination.estimated_rows', return_value=1_000_000):
+                self.assertEqual(EstimatedCountPaginator(Transaction.objects.order_by('pk'), 100).count, 1_000_000)
+                # A filtered list is not estimated; it stops at the limit.
+                self.assertEqual(EstimatedCountPaginator(Transaction.objects.filter(amount__lt=0).order_by('pk'), 100).count, 3)
+            self.assertEqual(EstimatedCountPaginator(Meal.objects.order_by('pk'), 100).count, 1)
@@ -0,0 +1,253 @@
+"""Token-bucket throttles and load shedding for the write endpoints.
+
+``CardRateThrottle`` (per card number) and ``ClientRateThrottle`` (per client
+address) are DRF throttles over token buckets. A scope's rate in
+``DEFAULT_THROTTLE_RATES``, say ``'10/s'``, is a bucket of 10 tokens refilled
+evenly over a second. Buckets live in the shared cache (``THROTTLE_CACHE_ALIAS``)
+so every process draws on the same budget, but a process does not visit the
+cache for every request: it leases a slice of the bucket at once and spends it
+from a local dict, which takes no lock and no I/O. Leases lapse after
+``LEASE_SECONDS`` so unspent tokens do not pile up in one process. Like DRF's
+own throttles the cache update is a read-modify-write, so under contention
+processes may over-admit slightly; that is the price of not locking.
+
+``LoadSheddingMiddleware`` turns writes to ``LOAD_SHED_PATHS`` away with an
+immediate 503 while the process already has ``LOAD_SHED_MAX_IN_FLIGHT``
+requests in flight, or while recent queries have averaged more than
+``LOAD_SHED_DB_LATENCY_MS``, instead of queueing them behind a saturated
+database. Query latency comes from the request timings in ``instrumentation``,
+so that check needs ``REQUEST_TIMING_ENABLED``.
+"""
+import itertools
+import json
+import math
+import time
+from functools import lru_cache, wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from . import instrumentation
+
+LEASE_SECONDS = 1.0
+# A lease is at most this fraction of the bucket, so other processes still get a share.
+LEASE_FRACTION = 10
+# Local leases kept before lapsed ones are dropped.
+MAX_LEASES = 10000
+# Query latency samples older than this no longer count towards shedding.
+LATENCY_WINDOW_SECONDS = 1.0
+# Weight of each new sample in the query latency average.
+LATENCY_SMOOTHING = 0.2
+
+_DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# key -> [tokens left, lease expiry]
+_leases = {}
+
+
+def get_cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+
+def is_enabled():
+    return getattr(settings, 'THROTTLING_ENABLED', True)
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``'10/s'`` -> ``(capacity, tokens per second)``; the period may be spelled out ('10/min')."""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / _DURATIONS[period[0]]
+
+
+def take(key, capacity, refill_rate, now=None):
+    """Spend one token from the bucket; returns ``(allowed, seconds until the next token)``."""
+    now = time.time() if now is None else now
+    lease = _leases.get(key)
+    if lease is not None and lease[0] > 0 and lease[1] > now:
+        lease[0] -= 1
+        return True, 0.0
+    return _lease(key, capacity, refill_rate, now)
+
+
+def _lease(key, capacity, refill_rate, now):
+    cache = get_cache()
+    tokens, updated = cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill_rate)
+    if tokens < 1:
+        return False, (1 - tokens) / refill_rate
+    granted = min(int(tokens), max(1, capacity // LEASE_FRACTION))
+    # Kept until the bucket would have refilled anyway.
+    cache.set(key, (tokens - granted, now), timeout=int(capacity / refill_rate) + 1)
+    if len(_leases) >= MAX_LEASES:
+        for stale in [name for name, (_, expires) in list(_leases.items()) if expires <= now]:
+            _leases.pop(stale, None)
+    _leases[key] = [granted - 1, now + LEASE_SECONDS]
+    return True, 0.0
+
+
+def reset():
+    _leases.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_bucket_key(self, request, view):
+        """The bucket this request draws on, or ``None`` to let it through."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if rate is None or not is_enabled():
+            return True
+        key = self.get_bucket_key(request, view)
+        if key is None:
+            return True
+        allowed, self.wait_seconds = take(f"throttle:{self.scope}:{key}", *parse_rate(rate))
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ClientRateThrottle(TokenBucketThrottle):
+    scope = 'client'
+
+    def get_bucket_key(self, request, view):
+        return self.get_ident(request)
+
+
+class CardRateThrottle(TokenBucketThrottle):
+    scope = 'card'
+
+    def get_bucket_key(self, request, view):
+        data = getattr(request, 'data', None)
+        if data is None:
+            # A plain Django request (the async views): the body has not been parsed yet.
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return None
+        card_number = data.get('card_number') if isinstance(data, dict) else None
+        return card_number if isinstance(card_number, str) and card_number else None
+
+
+WRITE_THROTTLES = (ClientRateThrottle, CardRateThrottle)
+
+
+def _throttled(wait):
+    response = JsonResponse({"detail": "Request was throttled."}, status=429)
+    if wait is not None:
+        response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def athrottled(*throttle_classes):
+    """``throttle_classes`` for the plain async views in ``async_views``."""
+    def decorator(view):
+        def refusal(request):
+            for throttle in (throttle_class() for throttle_class in throttle_classes):
+                if not throttle.allow_request(request, None):
+                    return _throttled(throttle.wait())
+            return None
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            # Off the event loop: refilling a lease is a blocking call to the shared cache.
+            refused = await sync_to_async(refusal, thread_sensitive=False)(request)
+            if refused is not None:
+                return refused
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Requests in flight = started - finished. next() on itertools.count is atomic, so the
+# counters need no lock; the last values are stored without one and may briefly lag.
+_started = itertools.count(1)
+_finished = itertools.count(1)
+_last_started = _last_finished = 0
+# Mean seconds per query, and when it was last sampled.
+_db_latency = 0.0
+_db_sampled_at = 0.0
+
+
+def in_flight():
+    return _last_started - _last_finished
+
+
+def _enter():
+    global _last_started
+    _last_started = started = next(_started)
+    return started - _last_finished
+
+
+def _exit():
+    global _last_finished, _db_latency, _db_sampled_at
+    _last_finished = next(_finished)
+    timing = instrumentation.current_timing()
+    if timing is not None and timing.queries:
+        _db_latency += (timing.db / timing.queries - _db_latency) * LATENCY_SMOOTHING
+        _db_sampled_at = time.monotonic()
+
+
+def shed_reason(request, depth):
+    """Why this request should be turned away, or ``None``."""
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or request.path not in get_shed_paths():
+        return None
+    max_in_flight = getattr(settings, 'LOAD_SHED_MAX_IN_FLIGHT', None)
+    if max_in_flight is not None and depth > max_in_flight:
+        return "Too many requests in progress; try again shortly."
+    limit_ms = getattr(settings, 'LOAD_SHED_DB_LATENCY_MS', None)
+    if limit_ms is not None and _db_latency * 1000 > limit_ms and time.monotonic() - _db_sampled_at < LATENCY_WINDOW_SECONDS:
+        return "The database is overloaded; try again shortly."
+    return None
+
+
+def get_shed_paths():
+    return _shed_paths(tuple(getattr(settings, 'LOAD_SHED_PATHS', ())))
+
+
+@lru_cache(maxsize=4)
+def _shed_paths(paths):
+    return frozenset(paths)
+
+
+def _shed(reason):
+    response = JsonResponse({"error": reason}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+class LoadSheddingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        reason = shed_reason(request, _enter())
+        try:
+            return self.get_response(request) if reason is None else _shed(reason)
+        finally:
+            _exit()
+
+    async def __acall__(self, request):
+        reason = shed_reason(request, _enter())
+        try:
+            return (await self.get_response(request)) if reason is None else _shed(reason)
+        finally:
+            _exit()
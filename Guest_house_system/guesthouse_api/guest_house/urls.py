@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 router = DefaultRouter()
 router.register(r'rooms', views.RoomViewSet)
 router.register(r'meals', views.MealViewSet)
@@ -13,5 +13,18 @@ urlpatterns = [
     path('transactions/', views.TransactionListView.as_view(), name='transaction-list'),
     path('transactions/<int:pk>/', views.TransactionDetailView.as_view(), name='transaction-detail'),
     path('payments/', views.process_payment, name='process-payment'),
+    path('payments/batch/', views.process_payment_batch, name='process-payment-batch'),
     path('deposit_funds/', views.deposit_funds, name='deposit-funds'),
+    path('cache_stats/', views.cache_stats, name='cache-stats'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('quotes/', views.quote, name='quotes'),
+    path('holds/', views.create_hold, name='hold-create'),
+    path('holds/<str:token>/', views.release_hold, name='hold-release'),
+    path('holds/<str:token>/confirm/', views.confirm_hold, name='hold-confirm'),
+    path('reports/occupancy/', views.occupancy_report, name='occupancy-report'),
+    path('exports/transactions.<str:fmt>', views.export_transactions, name='export-transactions'),
+    path('exports/reservations.<str:fmt>', views.export_reservations, name='export-reservations'),
+    path('async/payments/', async_views.process_payment, name='async-process-payment'),
+    path('async/deposit_funds/', async_views.deposit_funds, name='async-deposit-funds'),
+    path('async/reservations/', async_views.create_reservation, name='async-reservation-create'),
 ]
\ No newline at end of file
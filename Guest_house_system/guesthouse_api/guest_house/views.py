@@ -1,123 +1,368 @@
+from copy import copy
+
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, action, throttle_classes
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
 from django.db import transaction
-from .models import Room, Meal, Guest, Reservation, DebitCard, Transaction
+from . import booking, cache, exports, holds, instrumentation, ledger, quotes, rollups
+from .idempotency import idempotent
+from .cache import CatalogCacheMixin
+from .fieldsets import SparseFieldsetMixin
+from .imports import import_reservations
+from .pagination import TransactionCursorPagination
+from .throttling import ClientRateThrottle, WRITE_THROTTLES
+from .models import Room, Meal, Guest, Reservation, DebitCard, Transaction, ArchivedTransaction
 from .serializers import (
     RoomSerializer, MealSerializer, GuestSerializer, DebitCardSerializer,
     TransactionSerializer, ReservationSerializer, ReservationCreateSerializer,
-    PaymentSerializer, DepositSerializer
+    RoomHoldSerializer, HoldConfirmSerializer, PaymentSerializer, DepositSerializer
 )
 
-class RoomViewSet(viewsets.ModelViewSet):
+PAYMENT_BATCH_MAX_ITEMS = 10000
+RESERVATION_IMPORT_MAX_ITEMS = 50000
+REPORT_MAX_DAYS = 3660
+GUEST_SEARCH_DEFAULT_LIMIT = 10
+GUEST_SEARCH_MAX_LIMIT = 50
+QUOTE_MAX_ROOMS = 200
+QUOTE_MAX_MEALS = 200
+QUOTE_MAX_RANGES = 50
+QUOTE_MAX_DAYS = 731
+
+class RoomViewSet(CatalogCacheMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
 
-class MealViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        try:
+            check_in_date = parse_date(request.query_params.get('from', ''))
+            check_out_date = parse_date(request.query_params.get('to', ''))
+        except ValueError:
+            check_in_date = check_out_date = None
+        if not check_in_date or not check_out_date:
+            return Response({"error": "Query parameters 'from' and 'to' must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        if check_out_date <= check_in_date:
+            return Response({"error": "'to' must be after 'from'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rooms = Room.objects.available_between(check_in_date, check_out_date).order_by('pk')
+        serializer = self.get_serializer(rooms, many=True)
+        return Response(serializer.data)
+
+class MealViewSet(CatalogCacheMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Meal.objects.all()
     serializer_class = MealSerializer
 
-class GuestViewSet(viewsets.ModelViewSet):
+class GuestViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Guest.objects.all()
     serializer_class = GuestSerializer
 
-class DebitCardViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', GUEST_SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= GUEST_SEARCH_MAX_LIMIT:
+            return Response({"error": f"'limit' must be between 1 and {GUEST_SEARCH_MAX_LIMIT}."}, status=status.HTTP_400_BAD_REQUEST)
+        guests = Guest.objects.name_or_email_prefix(term, limit)
+        return Response({"results": self.get_serializer(guests, many=True).data})
+
+class DebitCardViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = DebitCard.objects.all()
     serializer_class = DebitCardSerializer
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
 
+    def get_expand(self):
+        # Only reads are expanded: writes keep taking plain ids.
+        if self.request.method not in ('GET', 'HEAD'):
+            return []
+        expand = [name for name in self.request.query_params.get('expand', '').split(',') if name]
+        unknown = set(expand) - set(ReservationSerializer.EXPANDABLE)
+        if unknown:
+            raise ValidationError({"expand": f"Cannot expand {', '.join(sorted(unknown))}."})
+        return expand
+
+    def get_queryset(self):
+        fields = self.get_sparse_fields()
+        # An expanded relation left out by ?fields= is not rendered, so it is not joined either.
+        expand = [name for name in self.get_expand() if fields is None or name in fields]
+        queryset = super().get_queryset()
+        # One JOIN per expanded relation keeps a page at a single query however long it is.
+        return queryset.select_related(*expand) if expand else queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
+
+    def get_throttles(self):
+        # Bookings are the write that bursts; reads and edits stay unthrottled.
+        return [ClientRateThrottle()] if self.action == 'create' else super().get_throttles()
+
     def create(self, request, *args, **kwargs):
         serializer = ReservationCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
         guest, _ = Guest.objects.get_or_create(email=data['guest_email'], defaults={'name': data['guest_name']})
+        reservation = Reservation(guest=guest, check_in_date=data['check_in_date'], check_out_date=data['check_out_date'])
 
+        try:
+            room = meal = None
+            if data.get('room_id'):
+                room = Room.objects.filter(pk=data['room_id']).first()
+                if room is None:
+                    raise booking.room_missing(data['room_id'])
+            if data.get('meal_id'):
+                meal = Meal.objects.filter(pk=data['meal_id']).first()
+                if meal is None:
+                    raise booking.meal_missing(data['meal_id'])
+            booking.confirm(booking.price(reservation, room=room, meal=meal))
+        except booking.BookingError as exc:
+            return Response({"error": exc.message}, status=status.HTTP_400_BAD_REQUEST)
 
-        reservation = Reservation(guest=guest)
-        total_cost = 0
+        payment_url = "/api/payments/"  # Simulate redirection URL
+        return Response({"message": "Reservation created. Redirecting to payment...", "payment_url": payment_url, "reservation_id": reservation.id}, status=status.HTTP_201_CREATED)
 
-        if data.get('room_id'):
-            try:
-                room = Room.objects.get(pk=data['room_id'], is_available=True)
-                reservation.room = room
-                time_difference = (data['check_out_date'] - data['check_in_date']).days
-                if time_difference < 1:
-                    return Response({"error": "Check-out date must be after check-in date."}, status=status.HTTP_400_BAD_REQUEST)
-                total_cost += room.price_per_night * time_difference
-                room.is_available = False
-                room.save()
-            except Room.DoesNotExist:
-                return Response({"error": f"Room with ID {data['room_id']} is not available or does not exist."}, status=status.HTTP_400_BAD_REQUEST)
-
-        if data.get('meal_id'):
-            try:
-                meal = Meal.objects.get(pk=data['meal_id'])
-                reservation.meal = meal
-                total_cost += meal.price
-            except Meal.DoesNotExist:
-                return Response({"error": f"Meal with ID {data['meal_id']} does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except booking.RoomUnavailable as exc:
+            return Response({"error": exc.message}, status=status.HTTP_409_CONFLICT)
+        except booking.BookingError as exc:
+            return Response({"error": exc.message}, status=status.HTTP_400_BAD_REQUEST)
 
-        if total_cost == 0:
-            return Response({"error": "Reservation must include at least a room or a meal."}, status=status.HTTP_400_BAD_REQUEST)
+    def perform_update(self, serializer):
+        # Not serializer.save(): the edit is checked and repriced by booking.amend before it is written.
+        reservation = serializer.instance
+        previous = copy(reservation)
+        for name, value in serializer.validated_data.items():
+            setattr(reservation, name, value)
+        booking.amend(reservation, previous)
 
-        reservation.total_cost = total_cost
-        reservation.save()
+    @action(detail=False, methods=['post'], url_path='import', url_name='import')
+    def bulk_import(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"error": "Expected a non-empty list of reservations."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > RESERVATION_IMPORT_MAX_ITEMS:
+            return Response({"error": f"At most {RESERVATION_IMPORT_MAX_ITEMS} reservations per request."}, status=status.HTTP_400_BAD_REQUEST)
 
-        payment_url = "/api/payments/"  # Simulate redirection URL
-        return Response({"message": "Reservation created. Redirecting to payment...", "payment_url": payment_url, "reservation_id": reservation.id}, status=status.HTTP_201_CREATED)
+        results = import_reservations(request.data)
+        failed = sum(1 for result in results if result["status"] == "failed")
+        return Response({"created": len(results) - failed, "failed": failed, "results": results}, status=status.HTTP_200_OK)
 
 class TransactionListView(generics.ListAPIView):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        debit_card = self.request.query_params.get('debit_card')
+        if debit_card is not None:
+            if not debit_card.isdigit():
+                raise ValidationError({"debit_card": "Must be a card id."})
+            queryset = queryset.filter(debit_card_id=debit_card)
+        transaction_type = self.request.query_params.get('transaction_type')
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        return queryset
 
 class TransactionDetailView(generics.RetrieveAPIView):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
 
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Moved out of the hot table by archive_transactions.
+            return get_object_or_404(ArchivedTransaction, pk=self.kwargs['pk']).as_transaction()
+
+@api_view(['GET'])
+def cache_stats(request):
+    return Response(cache.stats())
+
+@api_view(['GET'])
+def occupancy_report(request):
+    try:
+        start = parse_date(request.query_params.get('from', ''))
+        end = parse_date(request.query_params.get('to', ''))
+    except ValueError:
+        start = end = None
+    if not start or not end:
+        return Response({"error": "Query parameters 'from' and 'to' must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+    if end <= start:
+        return Response({"error": "'to' must be after 'from'."}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days > REPORT_MAX_DAYS:
+        return Response({"error": f"At most {REPORT_MAX_DAYS} days per report."}, status=status.HTTP_400_BAD_REQUEST)
+    group_by = request.query_params.get('group_by', 'room')
+    if group_by not in ('room', 'day'):
+        return Response({"error": "'group_by' must be 'room' or 'day'."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        room_ids = [int(room_id) for room_id in request.query_params.getlist('room')]
+    except ValueError:
+        return Response({"error": "'room' must be a room id."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(rollups.occupancy_report(start, end, room_ids=room_ids, group_by=group_by))
+
+@api_view(['GET'])
+def quote(request):
+    try:
+        room_ids = [int(room_id) for room_id in request.query_params.getlist('room')]
+        meal_ids = [int(meal_id) for meal_id in request.query_params.getlist('meal')]
+    except ValueError:
+        return Response({"error": "'room' and 'meal' must be integer ids."}, status=status.HTTP_400_BAD_REQUEST)
+    ranges = []
+    for value in request.query_params.getlist('range'):
+        check_in, _, check_out = value.partition('/')
+        try:
+            stay = (parse_date(check_in), parse_date(check_out))
+        except ValueError:
+            stay = (None, None)
+        if not all(stay):
+            return Response({"error": "Each 'range' must be two dates, FROM/TO (YYYY-MM-DD/YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        if stay[1] <= stay[0]:
+            return Response({"error": f"Range {value} must end after it starts."}, status=status.HTTP_400_BAD_REQUEST)
+        ranges.append(stay)
+    if not room_ids or not ranges:
+        return Response({"error": "At least one 'room' and one 'range' are required."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(set(room_ids)) > QUOTE_MAX_ROOMS or len(set(ranges)) > QUOTE_MAX_RANGES or len(set(meal_ids)) > QUOTE_MAX_MEALS:
+        return Response({"error": f"At most {QUOTE_MAX_ROOMS} rooms, {QUOTE_MAX_RANGES} ranges and {QUOTE_MAX_MEALS} meals per quote."}, status=status.HTTP_400_BAD_REQUEST)
+    if (max(end for _, end in ranges) - min(start for start, _ in ranges)).days > QUOTE_MAX_DAYS:
+        return Response({"error": f"All ranges must fall within {QUOTE_MAX_DAYS} days of each other."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(quotes.quote(room_ids, ranges, meal_ids))
+
+def _export_filters(request, fmt, **integer_params):
+    """Parses the shared export parameters; returns ``(filters, None)`` or ``(None, error_response)``."""
+    if fmt not in exports.CONTENT_TYPES:
+        return None, Response({"error": f"Format must be one of: {', '.join(exports.CONTENT_TYPES)}."}, status=status.HTTP_404_NOT_FOUND)
+    filters = {}
+    try:
+        filters['start'] = parse_date(request.query_params.get('from', ''))
+        filters['end'] = parse_date(request.query_params.get('to', ''))
+    except ValueError:
+        return None, Response({"error": "'from' and 'to' must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+    for name, param in integer_params.items():
+        value = request.query_params.get(param)
+        if value:
+            try:
+                filters[name] = int(value)
+            except ValueError:
+                return None, Response({"error": f"'{param}' must be an integer id."}, status=status.HTTP_400_BAD_REQUEST)
+    return filters, None
+
+@api_view(['GET'])
+def export_transactions(request, fmt):
+    filters, error = _export_filters(request, fmt, debit_card='debit_card')
+    if error:
+        return error
+    rows = exports.transaction_rows(transaction_type=request.query_params.get('transaction_type'), **filters)
+    return exports.stream(rows, exports.TRANSACTION_COLUMNS, fmt, 'transactions')
+
+@api_view(['GET'])
+def export_reservations(request, fmt):
+    filters, error = _export_filters(request, fmt, room='room')
+    if error:
+        return error
+    return exports.stream(exports.reservation_rows(**filters), exports.RESERVATION_COLUMNS, fmt, 'reservations')
+
+@api_view(['GET'])
+def metrics(request):
+    return Response({"enabled": settings.REQUEST_TIMING_ENABLED, "routes": instrumentation.route_stats()})
+
 @api_view(['POST'])
-def process_payment(request):
-    # All the function code for processing payment will go here
-    card_number = request.data.get('card_number')
-    amount = request.data.get('amount')
-    reservation_id = request.data.get('reservation_id')
+def create_hold(request):
+    serializer = RoomHoldSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
 
-    if not card_number or not amount or not reservation_id:
-        return Response({"error": "Card number, amount, and reservation ID are required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        hold = holds.claim(data['room_id'], data['check_in_date'], data['check_out_date'])
+    except booking.RoomUnavailable as exc:
+        # Someone else has the nights: a retry will not help until they let go.
+        return Response({"error": exc.message}, status=status.HTTP_409_CONFLICT)
+    except booking.BookingError as exc:
+        return Response({"error": exc.message}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"token": hold.token, "expires_at": hold.expires_at, "room_id": hold.room_id, "check_in_date": hold.check_in_date, "check_out_date": hold.check_out_date}, status=status.HTTP_201_CREATED)
 
+@api_view(['DELETE'])
+def release_hold(request, token):
+    if not holds.release(token):
+        return Response({"error": holds.HoldNotFound().message}, status=status.HTTP_404_NOT_FOUND)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST'])
+def confirm_hold(request, token):
+    serializer = HoldConfirmSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    meal = None
+    if data.get('meal_id'):
+        meal = Meal.objects.filter(pk=data['meal_id']).first()
+        if meal is None:
+            return Response({"error": booking.meal_missing(data['meal_id']).message}, status=status.HTTP_400_BAD_REQUEST)
+    guest, _ = Guest.objects.get_or_create(email=data['guest_email'], defaults={'name': data['guest_name']})
     try:
-        debit_card = DebitCard.objects.get(card_number=card_number)
-    except DebitCard.DoesNotExist:
-        return Response({"error": "Invalid card number."}, status=status.HTTP_400_BAD_REQUEST)
-
-    amount = float(amount)
-    if debit_card.balance >= amount:
-        debit_card.balance -= amount
-        debit_card.save()
-        Transaction.objects.create(debit_card=debit_card, amount=-amount, transaction_type='payment', reservation_id=reservation_id)
-        return Response({"message": f"Payment of {amount} successful."}, status=status.HTTP_200_OK)
-    else:
-        return Response({"error": "Insufficient funds."}, status=status.HTTP_400_BAD_REQUEST)
+        reservation = holds.confirm(token, guest, meal=meal)
+    except holds.HoldNotFound as exc:
+        return Response({"error": exc.message}, status=status.HTTP_404_NOT_FOUND)
+    except booking.BookingError as exc:
+        return Response({"error": exc.message}, status=status.HTTP_400_BAD_REQUEST)
+    payment_url = "/api/payments/"  # Simulate redirection URL
+    return Response({"message": "Reservation created. Redirecting to payment...", "payment_url": payment_url, "reservation_id": reservation.id}, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
-def deposit_funds(request):
-    card_number = request.data.get('card_number')
-    amount = request.data.get('amount')
+@throttle_classes(WRITE_THROTTLES)
+@idempotent
+def process_payment(request):
+    serializer = PaymentSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    try:
+        ledger.debit(data['card_number'], data['amount'], reservation_id=data['reservation_id'])
+    except ledger.LedgerError as exc:
+        return Response({"error": exc.message}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"message": f"Payment of {data['amount']} successful."}, status=status.HTTP_200_OK)
 
-    if not card_number or not amount:
-        return Response({"error": "Card number and amount are required."}, status=status.HTTP_400_BAD_REQUEST)
+@api_view(['POST'])
+@throttle_classes(WRITE_THROTTLES)
+@idempotent
+def process_payment_batch(request):
+    serializer = PaymentSerializer(data=request.data, many=True, max_length=PAYMENT_BATCH_MAX_ITEMS, allow_empty=False)
+    serializer.is_valid(raise_exception=True)
+
+    results = []
+    for index, (row, error) in enumerate(ledger.debit_many(serializer.validated_data)):
+        if error is None:
+            results.append({"index": index, "status": "success", "transaction_id": row.pk})
+        else:
+            results.append({"index": index, "status": "failed", "error": error.message})
+    failed = sum(1 for result in results if result["status"] == "failed")
+    return Response({"succeeded": len(results) - failed, "failed": failed, "results": results}, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@throttle_classes(WRITE_THROTTLES)
+@idempotent
+def deposit_funds(request):
+    serializer = DepositSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
 
     try:
-        debit_card = DebitCard.objects.get(card_number=card_number)
-    except DebitCard.DoesNotExist:
-        return Response({"error": "Invalid card number."}, status=status.HTTP_400_BAD_REQUEST)
-
-    amount = float(amount)
-    debit_card.balance += amount
-    debit_card.save()
-    Transaction.objects.create(debit_card=debit_card, amount=amount, transaction_type='deposit')
-    return Response({"message": f"Deposit of {amount} successful."}, status=status.HTTP_200_OK)
\ No newline at end of file
+        ledger.credit(data['card_number'], data['amount'])
+    except ledger.LedgerError as exc:
+        return Response({"error": exc.message}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"message": f"Deposit of {data['amount']} successful."}, status=status.HTTP_200_OK)
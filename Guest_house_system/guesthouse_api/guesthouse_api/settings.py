@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +45,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack.
+    'guest_house.instrumentation.ServerTimingMiddleware',
+    # Next, so a shed request costs as little as possible and still shows up in the timings.
+    'guest_house.throttling.LoadSheddingMiddleware',
+    # Before anything that reads the database (sessions, auth).
+    'guest_house.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,13 +83,149 @@ WSGI_APPLICATION = 'guesthouse_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# GUESTHOUSE_DB_PROFILE picks one of:
+#   dev           plain SQLite file, one connection per request (the default)
+#   sqlite-tuned  SQLite in WAL mode with a busy timeout, IMMEDIATE write transactions
+#                 and persistent connections, for single-host deployments
+#   server        a server database (PostgreSQL by default) configured from DB_* variables,
+#                 using psycopg's connection pool unless DB_POOL=0
+DB_PROFILE = os.environ.get('GUESTHOUSE_DB_PROFILE', 'dev')
+
+# WAL lets readers run alongside the single writer; synchronous=NORMAL is durable in WAL mode
+# except on power loss. IMMEDIATE makes a write transaction take the lock up front, so it waits
+# on busy_timeout instead of failing with "database is locked" when it upgrades from a read.
+SQLITE_TUNED_OPTIONS = {
+    'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA busy_timeout=20000',
+    'transaction_mode': 'IMMEDIATE',
+}
+
+if DB_PROFILE == 'dev':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+elif DB_PROFILE == 'sqlite-tuned':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': SQLITE_TUNED_OPTIONS,
+        }
+    }
+elif DB_PROFILE == 'server':
+    DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.postgresql')
+    # Django's pool is PostgreSQL-only and replaces persistent connections.
+    DB_POOL = DB_ENGINE == 'django.db.backends.postgresql' and os.environ.get('DB_POOL', '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.environ.get('DB_NAME', 'guesthouse'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': not DB_POOL,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown GUESTHOUSE_DB_PROFILE {DB_PROFILE!r}; use dev, sqlite-tuned or server.")
+
+# `manage.py archive_transactions` moves transactions older than TRANSACTION_ARCHIVE_AFTER_DAYS
+# out of the hot table into ArchivedTransaction, which lives in TRANSACTION_ARCHIVE_DATABASE.
+# ARCHIVE_DB_NAME puts the archive in its own database (same engine and credentials as
+# 'default'); create its table with `manage.py migrate --database archive`.
+TRANSACTION_ARCHIVE_DATABASE = 'default'
+TRANSACTION_ARCHIVE_AFTER_DAYS = 365
+if os.environ.get('ARCHIVE_DB_NAME'):
+    DATABASES['archive'] = {**DATABASES['default'], 'NAME': os.environ['ARCHIVE_DB_NAME']}
+    TRANSACTION_ARCHIVE_DATABASE = 'archive'
+
+# Read replicas (see guest_house/replicas.py): DB_REPLICAS is a comma-separated list of replica
+# hosts under the server profile, or of SQLite files under the others, each a read-only copy of
+# 'default' kept in sync outside Django. For local testing with SQLite files,
+# `manage.py sync_replicas` copies the primary into them.
+REPLICA_DATABASES = []
+for replica_index, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{replica_index}'] = {
+        **DATABASES['default'],
+        'HOST' if DB_PROFILE == 'server' else 'NAME': replica.strip(),
+        # Tests read their own writes from the primary.
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{replica_index}')
+# Seconds a client's reads stay on the primary after it writes; keep it above the replicas' lag.
+REPLICA_PIN_SECONDS = 5
+
+DATABASE_ROUTERS = ['guest_house.routers.TransactionArchiveRouter', 'guest_house.routers.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Point this at a shared backend (Redis, Memcached) when running more than one process,
+# otherwise catalog invalidations only reach the process that made the change.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Seconds a cached room/meal response may live; 0 turns the catalog cache off.
+CATALOG_CACHE_TIMEOUT = 300
+
+# Seconds a /api/quotes/ answer may be reused; bookings and catalog changes invalidate it sooner.
+QUOTE_CACHE_TIMEOUT = 15
+
+# Server-Timing header, request log (logger "guest_house.requests") and /api/metrics/.
+REQUEST_TIMING_ENABLED = os.environ.get('GUESTHOUSE_REQUEST_TIMING', '1') == '1'
+# Requests per route kept for the /api/metrics/ percentiles.
+REQUEST_TIMING_WINDOW = 1024
+
+# Seconds an Idempotency-Key's stored response is replayed for payments and deposits.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Seconds an unpaid reservation holds its room before sweep_reservations expires it.
+RESERVATION_HOLD_SECONDS = 30 * 60
+
+# Seconds a /api/holds/ token keeps a room's nights before it has to be confirmed.
+ROOM_HOLD_SECONDS = 5 * 60
+
+# Nights ahead the rate calendar is precomputed for; later nights are priced on the fly.
+RATE_CALENDAR_DAYS = 730
+
+# Token buckets for the payment, deposit and booking endpoints (see guest_house/throttling.py):
+# 'N/period' is N tokens, refilled evenly over the period. Buckets are kept in THROTTLE_CACHE_ALIAS,
+# which must be a shared backend for the limits to hold across processes.
+THROTTLING_ENABLED = os.environ.get('GUESTHOUSE_THROTTLING', '1') == '1'
+REST_FRAMEWORK = {
+    'DEFAULT_THROTTLE_RATES': {
+        'card': '10/s',
+        'client': '100/s',
+    },
+}
+
+# Writes to these paths get an immediate 503 while the process has more than
+# LOAD_SHED_MAX_IN_FLIGHT requests in flight or queries average over LOAD_SHED_DB_LATENCY_MS;
+# None turns a check off.
+LOAD_SHED_PATHS = (
+    '/api/payments/', '/api/payments/batch/', '/api/deposit_funds/', '/api/reservations/',
+    '/api/async/payments/', '/api/async/deposit_funds/', '/api/async/reservations/',
+)
+LOAD_SHED_MAX_IN_FLIGHT = 64
+LOAD_SHED_DB_LATENCY_MS = 250
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators